@@ -0,0 +1,151 @@
+"""
+Shared API client: one DynamicClient per kubeconfig, with client side rate limiting and request coalescing.
+
+The kubernetes/openshift client packages are imported and the kubeconfig is loaded on first API use, importing
+this module is cheap.
+"""
+
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+QPS = 20
+BURST = 40
+MAX_429_RETRIES = 3
+READ_METHODS = ("get", "head")
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter, writes get the tokens before reads.
+    """
+    def __init__(self, qps=QPS, burst=BURST):
+        """
+        Args:
+            qps (float): Tokens added per second.
+            burst (int): Bucket size.
+        """
+        self.qps = qps
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._pending_writes = 0
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        """
+        Add the tokens accumulated since the last refill
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.qps)
+        self._last = now
+
+    def acquire(self, write=False):
+        """
+        Take one token, block until one is available
+
+        Args:
+            write (bool): True for write requests, reads wait while writes are pending.
+
+        Returns:
+            float: Seconds spent waiting for the token.
+        """
+        start = time.monotonic()
+        with self._cond:
+            if write:
+                self._pending_writes += 1
+            try:
+                while True:
+                    self._refill()
+                    if self._tokens >= 1 and (write or not self._pending_writes):
+                        self._tokens -= 1
+                        return time.monotonic() - start
+
+                    self._cond.wait(timeout=max((1 - self._tokens) / self.qps, 0.001))
+            finally:
+                if write:
+                    self._pending_writes -= 1
+                    self._cond.notify_all()
+
+
+class SingleFlight(object):
+    """
+    Coalesce identical concurrent calls: the first caller runs the call, the others wait for its result.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        Run func, or wait for the in-flight call with the same key
+
+        Args:
+            key (hashable): Call identity.
+            func (function): Call to run.
+
+        Returns:
+            tuple: func result, True if the result was shared from another caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+
+        if not leader:
+            call["done"].wait()
+            if call["error"]:
+                raise call["error"]
+            return call["result"], True
+
+        try:
+            call["result"] = func()
+            return call["result"], False
+        except Exception as exp:
+            call["error"] = exp
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
+
+
+def get_client(kubeconfig=None):
+    """
+    Get the shared API client of the kubeconfig, create it on first use
+
+    Args:
+        kubeconfig (str): kubeconfig path, None for the default kubeconfig.
+
+    Returns:
+        ThrottledDynamicClient: API client.
+    """
+    with _CLIENTS_LOCK:
+        if kubeconfig not in _CLIENTS:
+            import urllib3
+            from kubernetes import config as kube_config
+
+            from .dynamic_client import ThrottledDynamicClient
+
+            urllib3.disable_warnings()
+            try:
+                api_client = kube_config.new_client_from_config(config_file=kubeconfig)
+                _CLIENTS[kubeconfig] = ThrottledDynamicClient(api_client)
+            except (kube_config.ConfigException, urllib3.exceptions.MaxRetryError):
+                LOGGER.error('You need to be login to cluster or have $KUBECONFIG env configured')
+                raise
+        return _CLIENTS[kubeconfig]
+
+
+def clients_stats():
+    """
+    Returns:
+        dict: kubeconfig: shared client stats.
+    """
+    with _CLIENTS_LOCK:
+        return dict((kubeconfig, client.stats()) for kubeconfig, client in _CLIENTS.items())
@@ -0,0 +1,89 @@
+"""
+Cluster context: the cluster the resource layer talks to, passed explicitly so one process can target several
+clusters.
+"""
+
+import logging
+import os
+import threading
+
+from . import client
+
+LOGGER = logging.getLogger(__name__)
+#  Set by utilities.multi_cluster for each cluster run, names the cluster in reports and local files
+CLUSTER_NAME_ENV = "CNV_CLUSTER_NAME"
+
+_DEFAULT_CONTEXTS = {}
+_DEFAULT_CONTEXTS_LOCK = threading.Lock()
+
+
+class ClusterContext(object):
+    """
+    One cluster: its kubeconfig and its shared API client.
+
+    Examples:
+        cluster_a = ClusterContext(kubeconfig="/clusters/a/kubeconfig")
+        cluster_b = ClusterContext(kubeconfig="/clusters/b/kubeconfig")
+        for context in (cluster_a, cluster_b):
+            NameSpace(name="cnv-network-ns", context=context).create(wait=True)
+    """
+    def __init__(self, kubeconfig=None, name=None):
+        """
+        Args:
+            kubeconfig (str): kubeconfig path, None for the default kubeconfig.
+            name (str): Cluster name in reports, the kubeconfig directory name if not set.
+        """
+        self.kubeconfig = kubeconfig
+        self.name = name or (
+            os.path.basename(os.path.dirname(os.path.abspath(kubeconfig))) if kubeconfig else "default"
+        )
+
+    @property
+    def client(self):
+        """
+        Returns:
+            ThrottledDynamicClient: Shared API client of the cluster, created on first API use.
+        """
+        return client.get_client(kubeconfig=self.kubeconfig)
+
+    def env(self, base=None):
+        """
+        Environment of a process which works on the cluster (oc, virtctl, pytest)
+
+        Args:
+            base (dict): Environment to extend, os.environ if not set.
+
+        Returns:
+            dict: Environment with KUBECONFIG and CLUSTER_NAME_ENV set.
+        """
+        env = dict(os.environ if base is None else base)
+        if self.kubeconfig:
+            env["KUBECONFIG"] = os.path.abspath(self.kubeconfig)
+        else:
+            env.pop("KUBECONFIG", None)
+        env[CLUSTER_NAME_ENV] = self.name
+        return env
+
+    def __eq__(self, other):
+        return isinstance(other, ClusterContext) and self.kubeconfig == other.kubeconfig
+
+    def __hash__(self):
+        return hash(self.kubeconfig)
+
+    def __repr__(self):
+        return f"ClusterContext({self.name}, {self.kubeconfig or 'default kubeconfig'})"
+
+
+def default_context():
+    """
+    Context of the resources created without one: $KUBECONFIG (read on each call, as before contexts) and
+    $CNV_CLUSTER_NAME
+
+    Returns:
+        ClusterContext: Shared context of the current $KUBECONFIG.
+    """
+    kubeconfig = os.getenv("KUBECONFIG")
+    with _DEFAULT_CONTEXTS_LOCK:
+        if kubeconfig not in _DEFAULT_CONTEXTS:
+            _DEFAULT_CONTEXTS[kubeconfig] = ClusterContext(kubeconfig=kubeconfig, name=os.getenv(CLUSTER_NAME_ENV))
+        return _DEFAULT_CONTEXTS[kubeconfig]
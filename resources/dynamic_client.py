@@ -0,0 +1,89 @@
+"""
+Rate limited, request coalescing DynamicClient, imported by client.get_client() on first API use.
+"""
+
+import logging
+import threading
+import time
+
+from openshift.dynamic import DynamicClient
+from openshift.dynamic.exceptions import TooManyRequestsError
+
+from .client import BURST, MAX_429_RETRIES, QPS, READ_METHODS, SingleFlight, TokenBucket
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ThrottledDynamicClient(DynamicClient):
+    """
+    DynamicClient which rate limits its requests and coalesces identical in-flight GET/LIST requests.
+
+    Coalesced callers share the same result, the ResourceInstance or, with serialize=False, the raw response with
+    its body already read by the leader. Treat it as read only.
+    """
+    def __init__(self, client, qps=QPS, burst=BURST, **kwargs):
+        """
+        Args:
+            client (ApiClient): kubernetes API client.
+            qps (float): Requests per second.
+            burst (int): Requests burst.
+        """
+        self.rate_limiter = TokenBucket(qps=qps, burst=burst)
+        self.single_flight = SingleFlight()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "coalesced": 0, "throttled": 0, "throttled_seconds": 0.0, "server_throttled": 0
+        }
+        super(ThrottledDynamicClient, self).__init__(client, **kwargs)
+
+    def _count(self, **counters):
+        """
+        Args:
+            counters (dict): Counter name: value to add.
+        """
+        with self._stats_lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+
+    def stats(self):
+        """
+        Returns:
+            dict: Requests, coalesced, throttled (client side), throttled_seconds, server_throttled (429) counters.
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def request(self, method, path, body=None, **params):
+        if method.lower() not in READ_METHODS or params.get("watch"):
+            return self._request(method, path, body=body, **params)
+
+        def func():
+            res = self._request(method, path, body=body, **params)
+            if params.get("serialize") is False:
+                #  Read (and cache) the body once, followers would read the same socket concurrently
+                res.data
+            return res
+
+        key = (method.lower(), path, repr(sorted(params.items())))
+        res, shared = self.single_flight.do(key=key, func=func)
+        if shared:
+            self._count(coalesced=1)
+        return res
+
+    def _request(self, method, path, body=None, **params):
+        """
+        Send the request when a token is available, retry on apiserver throttling (429)
+        """
+        for attempt in range(MAX_429_RETRIES + 1):
+            waited = self.rate_limiter.acquire(write=method.lower() not in READ_METHODS)
+            self._count(requests=1, throttled=int(waited > 0.001), throttled_seconds=waited)
+            try:
+                return super(ThrottledDynamicClient, self).request(method, path, body=body, **params)
+            except TooManyRequestsError as exp:
+                self._count(server_throttled=1)
+                if attempt == MAX_429_RETRIES:
+                    raise
+
+                retry_after = float((exp.headers or {}).get("Retry-After", 1))
+                LOGGER.warning(f"API server throttled {method.upper()} {path}, retry in {retry_after}s")
+                time.sleep(retry_after)
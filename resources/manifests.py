@@ -0,0 +1,414 @@
+"""
+Manifests repository: YAML manifests parsed once with the C loader and cached by path and mtime, validated offline
+against cached OpenAPI schemas.
+
+Refresh the cached schemas from a cluster (run from the repository root):
+    python -m resources.manifests --refresh-schemas
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import re
+import threading
+
+from utilities import utils
+
+LOGGER = logging.getLogger(__name__)
+yaml = utils.LazyModule(name="yaml")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFESTS_DIR = os.path.join(ROOT_DIR, "tests", "manifests")
+SCHEMAS_FILE = os.path.join(MANIFESTS_DIR, "openapi-schemas.json")
+MANIFEST_EXTENSIONS = (".yml", ".yaml")
+#  Kinds validated offline, (group, version, kind)
+SCHEMA_KINDS = (
+    ("k8s.cni.cncf.io", "v1", "NetworkAttachmentDefinition"),
+    ("kubevirt.io", "v1alpha3", "VirtualMachine"),
+    ("kubevirt.io", "v1alpha3", "VirtualMachineInstance"),
+)
+GVK_EXTENSION = "x-kubernetes-group-version-kind"
+TEMPLATE_KIND = "Template"
+#  ${NAME} anywhere in a string, ${{NAME}} as a whole value (substituted by the parsed parameter value)
+TEMPLATE_PARAM = re.compile(r"\$\{(\w+)\}")
+TEMPLATE_RAW_PARAM = re.compile(r"^\$\{\{(\w+)\}\}$")
+JSON_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+}
+
+_REPOSITORIES = {}
+_REPOSITORIES_LOCK = threading.Lock()
+
+
+def yaml_loader():
+    """
+    Returns:
+        type: libyaml safe loader, the pure python one if PyYAML was built without libyaml.
+    """
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class SchemaValidator(object):
+    """
+    Validate objects against OpenAPI v2 definitions (the subset Kubernetes uses: types, required, properties,
+    unknown fields of objects with properties, items, maps, enums, $ref, int-or-string).
+    """
+    def __init__(self, definitions):
+        """
+        Args:
+            definitions (dict): OpenAPI v2 definitions.
+        """
+        self.definitions = definitions
+        self.kinds = {}
+        ''' (apiVersion, kind): definition name. '''
+        for name, definition in definitions.items():
+            for gvk in definition.get(GVK_EXTENSION) or []:
+                api_version = f"{gvk['group']}/{gvk['version']}" if gvk.get("group") else gvk["version"]
+                self.kinds[(api_version, gvk["kind"])] = name
+
+    @classmethod
+    def from_file(cls, path=SCHEMAS_FILE):
+        """
+        Args:
+            path (str): Cached OpenAPI schemas file.
+
+        Returns:
+            SchemaValidator: Validator, without kinds if the file does not exist.
+        """
+        if not os.path.exists(path):
+            LOGGER.warning(
+                f"No cached OpenAPI schemas in {path}, manifests are only parsed, cache them from a cluster with "
+                "python -m resources.manifests --refresh-schemas"
+            )
+            return cls(definitions={})
+
+        with open(path) as fd:
+            return cls(definitions=json.load(fd)["definitions"])
+
+    def validate(self, obj):
+        """
+        Args:
+            obj (dict): API object.
+
+        Returns:
+            list: Errors, empty if valid or if there is no schema for the object kind.
+        """
+        name = self.kinds.get((obj.get("apiVersion"), obj.get("kind")))
+        if not name:
+            return []
+
+        errors = []
+        self._validate(value=obj, schema={"$ref": f"#/definitions/{name}"}, path=obj.get("kind"), errors=errors)
+        return errors
+
+    def _validate(self, value, schema, path, errors):
+        """
+        Validate a value, add its errors (and its fields errors) to errors
+        """
+        while "$ref" in schema:
+            schema = self.definitions.get(schema["$ref"].split("/")[-1], {})
+
+        if value is None:
+            #  null is unset for the API server
+            return
+
+        if schema.get("format") == "int-or-string" or schema.get("x-kubernetes-int-or-string"):
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                errors.append(f"{path}: expected integer or string, got {type(value).__name__}")
+            return
+
+        type_ = schema.get("type")
+        if type_ in JSON_TYPES and (
+            not isinstance(value, JSON_TYPES[type_]) or (type_ != "boolean" and isinstance(value, bool))
+        ):
+            errors.append(f"{path}: expected {type_}, got {type(value).__name__}")
+            return
+
+        if "enum" in schema and value not in schema["enum"]:
+            errors.append(f"{path}: {value!r} not one of {schema['enum']}")
+
+        if isinstance(value, dict):
+            for key in schema.get("required") or []:
+                if key not in value:
+                    errors.append(f"{path}: missing required field {key}")
+
+            properties = schema.get("properties")
+            additional = schema.get("additionalProperties")
+            for key, field in value.items():
+                if properties and key in properties:
+                    self._validate(value=field, schema=properties[key], path=f"{path}.{key}", errors=errors)
+                elif isinstance(additional, dict):
+                    self._validate(value=field, schema=additional, path=f"{path}.{key}", errors=errors)
+                elif properties and not additional:
+                    errors.append(f"{path}: unknown field {key}")
+
+        elif isinstance(value, list) and "items" in schema:
+            for idx, item in enumerate(value):
+                self._validate(value=item, schema=schema["items"], path=f"{path}[{idx}]", errors=errors)
+
+
+def template_params(template, params=None):
+    """
+    Args:
+        template (dict): OpenShift Template.
+        params (dict): Parameters values, override the template defaults.
+
+    Returns:
+        dict: Parameter name: value, parameters without a value get a name-like placeholder (NAME: name) so the
+            objects are valid Kubernetes names.
+    """
+    values = dict(
+        (i["name"], str(i["value"]) if "value" in i else i["name"].lower().replace("_", "-"))
+        for i in template.get("parameters") or []
+    )
+    values.update(params or {})
+    return values
+
+
+def process_template(template, params=None):
+    """
+    Substitute the parameters of a Template objects offline, as `oc process` does (without generated values)
+
+    Args:
+        template (dict): OpenShift Template.
+        params (dict): Parameters values, override the template defaults.
+
+    Returns:
+        list: Processed objects.
+    """
+    values = template_params(template=template, params=params)
+
+    def substitute(node):
+        if isinstance(node, dict):
+            return dict((key, substitute(value)) for key, value in node.items())
+        if isinstance(node, list):
+            return [substitute(i) for i in node]
+        if isinstance(node, str):
+            raw = TEMPLATE_RAW_PARAM.match(node)
+            if raw and raw.group(1) in values:
+                return yaml.load(values[raw.group(1)], Loader=yaml_loader())
+            return TEMPLATE_PARAM.sub(lambda match: values.get(match.group(1), match.group()), node)
+        return node
+
+    return [substitute(i) for i in template.get("objects") or []]
+
+
+class ManifestRepository(object):
+    """
+    Parsed manifests cache: every file is parsed once per modification (libyaml), callers get their own copy.
+
+    Examples:
+        repository = get_repository()
+        nad = repository.document(path="tests/manifests/network/ovs-vlan-net.yml")
+    """
+    def __init__(self, root=MANIFESTS_DIR, schemas_file=SCHEMAS_FILE):
+        """
+        Args:
+            root (str): Manifests directory.
+            schemas_file (str): Cached OpenAPI schemas file.
+        """
+        self.root = root
+        self.schemas_file = schemas_file
+        self._cache = {}
+        ''' Absolute path: (mtime_ns, documents). '''
+        self._validator = None
+        self._lock = threading.Lock()
+
+    def _documents(self, path):
+        """
+        Args:
+            path (str): Manifest path.
+
+        Returns:
+            list: Cached parsed documents (shared, not to be modified).
+        """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with open(path, "rb") as stream:
+            documents = [i for i in yaml.load_all(stream, Loader=yaml_loader()) if i is not None]
+
+        with self._lock:
+            self._cache[path] = (mtime, documents)
+        return documents
+
+    def documents(self, path):
+        """
+        Args:
+            path (str): Manifest path.
+
+        Returns:
+            list: Parsed documents, the caller's copy.
+        """
+        return copy.deepcopy(self._documents(path=path))
+
+    def document(self, path):
+        """
+        Args:
+            path (str): Single document manifest path.
+
+        Returns:
+            dict: Parsed document, the caller's copy.
+        """
+        documents = self._documents(path=path)
+        if len(documents) != 1:
+            raise ValueError(f"{path}: expected one document, found {len(documents)}")
+        return copy.deepcopy(documents[0])
+
+    def paths(self):
+        """
+        Returns:
+            list: Manifests paths under the root.
+        """
+        return sorted(
+            os.path.join(dirpath, filename) for dirpath, _, filenames in os.walk(self.root) for filename in filenames
+            if filename.endswith(MANIFEST_EXTENSIONS)
+        )
+
+    @property
+    def validator(self):
+        """
+        Returns:
+            SchemaValidator: Validator of the cached schemas, loaded on first use.
+        """
+        if self._validator is None:
+            self._validator = SchemaValidator.from_file(path=self.schemas_file)
+        return self._validator
+
+    def validate(self, paths=None):
+        """
+        Load and validate manifests, the objects of Templates after parameters substitution (process_template())
+
+        Args:
+            paths (list): Manifests paths, None for all manifests under the root.
+
+        Returns:
+            list: Errors, prefixed with the manifest path, empty if all are valid.
+        """
+        errors = []
+        for path in paths or self.paths():
+            relpath = os.path.relpath(path, ROOT_DIR)
+            try:
+                documents = self._documents(path=path)
+            except yaml.YAMLError as exp:
+                errors.append(f"{relpath}: {exp}")
+                continue
+
+            for idx, document in enumerate(documents):
+                if not isinstance(document, dict):
+                    errors.append(f"{relpath} document {idx}: not an object")
+                    continue
+                if document.get("kind") == TEMPLATE_KIND and "objects" in document:
+                    for obj_idx, obj in enumerate(process_template(template=document)):
+                        errors.extend(
+                            f"{relpath} objects[{obj_idx}]: {error}" for error in self.validator.validate(obj=obj)
+                        )
+                    continue
+                errors.extend(f"{relpath}: {error}" for error in self.validator.validate(obj=document))
+        return errors
+
+
+def get_repository(root=MANIFESTS_DIR):
+    """
+    Get the shared repository of a manifests directory, create it on first use
+
+    Args:
+        root (str): Manifests directory.
+
+    Returns:
+        ManifestRepository: Repository.
+    """
+    with _REPOSITORIES_LOCK:
+        if root not in _REPOSITORIES:
+            _REPOSITORIES[root] = ManifestRepository(root=root)
+        return _REPOSITORIES[root]
+
+
+def load(path):
+    """
+    Args:
+        path (str): Single document manifest path.
+
+    Returns:
+        dict: Parsed document from the shared repository cache, the caller's copy.
+    """
+    return get_repository().document(path=path)
+
+
+def schema_closure(definitions, names):
+    """
+    Args:
+        definitions (dict): OpenAPI v2 definitions.
+        names (list): Definitions names.
+
+    Returns:
+        dict: The definitions and the definitions they reference, recursively.
+    """
+    closure = {}
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name in closure or name not in definitions:
+            continue
+
+        closure[name] = definitions[name]
+        stack = [definitions[name]]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if isinstance(node.get("$ref"), str):
+                    pending.append(node["$ref"].split("/")[-1])
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+    return closure
+
+
+def refresh_schemas(path=SCHEMAS_FILE, kinds=SCHEMA_KINDS):
+    """
+    Cache the OpenAPI schemas of kinds from the cluster
+
+    Args:
+        path (str): Cached schemas file.
+        kinds (tuple): (group, version, kind) to cache.
+
+    Returns:
+        list: Cached kinds, kinds the cluster does not publish a schema of are missing.
+    """
+    from . import client
+
+    resp = client.get_client(kubeconfig=os.getenv("KUBECONFIG")).request("get", "/openapi/v2", serialize=False)
+    definitions = json.loads(resp.data)["definitions"]
+    wanted = set(kinds)
+    names = [
+        name for name, definition in definitions.items()
+        if any((i.get("group", ""), i["version"], i["kind"]) in wanted for i in definition.get(GVK_EXTENSION) or [])
+    ]
+    with open(path, "w") as fd:
+        json.dump({"definitions": schema_closure(definitions=definitions, names=names)}, fd, indent=1, sort_keys=True)
+        fd.write("\n")
+    return sorted(definitions[i][GVK_EXTENSION][0]["kind"] for i in names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate manifests against the cached OpenAPI schemas")
+    parser.add_argument("paths", nargs="*", help="Manifests paths, all manifests if none")
+    parser.add_argument("--refresh-schemas", action="store_true", help="Cache the OpenAPI schemas from the cluster")
+    args = parser.parse_args()
+
+    if args.refresh_schemas:
+        print(f"Cached schemas of {', '.join(refresh_schemas())} in {SCHEMAS_FILE}")
+
+    manifest_errors = get_repository().validate(paths=args.paths)
+    print("\n".join(manifest_errors) or "All manifests are valid")
+    if manifest_errors:
+        raise SystemExit(1)
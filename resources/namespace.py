@@ -1,14 +1,22 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from utilities import types, utils
 
-from .resource import Resource
+from .resource import TIMEOUT, Resource, api_exceptions
+
+LOGGER = logging.getLogger(__name__)
+RUN_ID_LABEL = "cnv-tests/run-id"
+TERMINATING = "Terminating"
 
 
 class NameSpace(Resource):
     """
     NameSpace object, inherited from Resource.
     """
-    def __init__(self, name):
-        super(NameSpace, self).__init__()
+    def __init__(self, name=None, context=None):
+        super(NameSpace, self).__init__(context=context)
         self.name = name
         self.namespace = self.name
         self.api_version = types.API_VERSION_V1
@@ -21,4 +29,220 @@ class NameSpace(Resource):
         Returns:
             bool: True f switched , False otherwise
         """
-        return utils.run_oc_command(command=f"project {self.name}")[0]
+        return utils.run_oc_command(command=f"project {self.name}", kubeconfig=self.kubeconfig)[0]
+
+    def label(self, labels):
+        """
+        Merge labels into the namespace labels
+
+        Args:
+            labels (dict): Labels to set.
+
+        Returns:
+            ResourceInstance: Patched namespace.
+        """
+        resource_list = self.client.resources.get(api_version=self.api_version, kind=self.kind)
+        return resource_list.patch(
+            body={'metadata': {'labels': labels}}, name=self.name, content_type='application/merge-patch+json'
+        )
+
+
+class NameSpaceManager(object):
+    """
+    Manage the lifecycle of a group of namespaces which belong to one test run.
+
+    Namespaces are created concurrently and labeled with the run id, readiness of all of them is awaited with
+    a single watch and deletion can be fired without waiting for the namespaces finalizers to drain.
+
+    Examples:
+        manager = NameSpaceManager(names=["ns-1", "ns-2"], run_id="a1b2c3d4")
+        manager.create()
+        ...
+        manager.delete(reaper=True)
+    """
+    def __init__(self, names, run_id, max_workers=10, context=None):
+        """
+        Args:
+            names (list): Namespaces names.
+            run_id (str): Test run id, set as RUN_ID_LABEL value on the namespaces.
+            max_workers (int): Maximum number of concurrent API calls.
+            context (ClusterContext): Cluster, the default cluster if not set.
+        """
+        self.context = context
+        self.names = list(names)
+        self.run_id = run_id
+        self.max_workers = max_workers
+        self.labels = {RUN_ID_LABEL: self.run_id}
+        self._reaper = None
+
+    def create(self, timeout=TIMEOUT):
+        """
+        Create all namespaces concurrently and wait for them to be Active
+
+        Args:
+            timeout (int): Time to wait for the namespaces to become Active.
+
+        Returns:
+            bool: True if all namespaces are Active, False if timeout reached.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(utils.Deadline.bind(lambda name: self._create(name=name, timeout=timeout)), self.names))
+
+        return self.wait_for_active(timeout=timeout)
+
+    def wait_for_active(self, timeout=TIMEOUT):
+        """
+        Wait with one watch until all namespaces are Active
+
+        Args:
+            timeout (int): Time to wait for the namespaces to become Active.
+
+        Returns:
+            bool: True if all namespaces are Active, False if timeout reached.
+        """
+        items, resource_version = self._list()
+        pending = set(self.names) - set(i.metadata.name for i in items if i.status.phase == types.ACTIVE)
+        if not pending:
+            return True
+
+        for event in NameSpace(context=self.context).watch(
+            timeout=timeout, label_selector=f"{RUN_ID_LABEL}={self.run_id}", resource_version=resource_version
+        ):
+            obj = event['object']
+            if event['type'] != 'DELETED' and obj.status.phase == types.ACTIVE:
+                pending.discard(obj.metadata.name)
+
+            if not pending:
+                return True
+
+        LOGGER.error(f"Namespaces {sorted(pending)} are not {types.ACTIVE} after {timeout} seconds")
+        return False
+
+    def delete(self, wait=False, reaper=False, timeout=TIMEOUT):
+        """
+        Fire delete for all namespaces
+
+        Args:
+            wait (bool): True to block until all namespaces are gone.
+            reaper (bool): True to wait for the namespaces to be gone in a background thread,
+                use wait_until_gone() as a final barrier.
+            timeout (int): Time to wait for the namespaces to be gone.
+
+        Returns:
+            bool: False if wait requested and timeout reached, True otherwise.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(lambda name: NameSpace(name=name, context=self.context).delete(), self.names))
+
+        if wait:
+            return self.wait_until_gone(timeout=timeout)
+
+        if reaper:
+            self._reaper = threading.Thread(
+                target=self._wait_until_gone, kwargs={'timeout': timeout}, name="namespace-reaper", daemon=True
+            )
+            self._reaper.start()
+        return True
+
+    def wait_until_gone(self, timeout=TIMEOUT):
+        """
+        Barrier: wait until all namespaces are deleted (joins the background reaper if running)
+
+        Args:
+            timeout (int): Time to wait for the namespaces to be gone.
+
+        Returns:
+            bool: True if all namespaces are gone, False if timeout reached.
+        """
+        if self._reaper:
+            self._reaper.join(timeout=timeout)
+            self._reaper = None
+
+        return self._wait_until_gone(timeout=timeout)
+
+    def _wait_until_gone(self, timeout):
+        """
+        Wait with one watch until all namespaces are deleted
+
+        Args:
+            timeout (int): Time to wait for the namespaces to be gone.
+
+        Returns:
+            bool: True if all namespaces are gone, False if timeout reached.
+        """
+        items, resource_version = self._list()
+        pending = set(i.metadata.name for i in items) & set(self.names)
+        if not pending:
+            return True
+
+        for event in NameSpace(context=self.context).watch(
+            timeout=timeout, label_selector=f"{RUN_ID_LABEL}={self.run_id}", resource_version=resource_version
+        ):
+            if event['type'] == 'DELETED':
+                pending.discard(event['object'].metadata.name)
+
+            if not pending:
+                return True
+
+        LOGGER.error(f"Namespaces {sorted(pending)} still exist after {timeout} seconds")
+        return False
+
+    def _list(self):
+        """
+        List the namespaces of this run
+
+        Returns:
+            tuple: Namespaces list, list resourceVersion to start a watch from.
+        """
+        ns = NameSpace(context=self.context)
+        resource_list = ns.client.resources.get(api_version=ns.api_version, kind=ns.kind)
+        res = resource_list.get(label_selector=f"{RUN_ID_LABEL}={self.run_id}")
+        return res.items, res.metadata.resourceVersion
+
+    def _create(self, name, timeout):
+        """
+        Create one labeled namespace, adopt it if it already exists
+
+        Args:
+            name (str): Namespace name.
+            timeout (int): Time to wait for a terminating namespace with the same name to be gone.
+        """
+        ns = NameSpace(name=name, context=self.context)
+        resource_dict = {
+            'apiVersion': ns.api_version,
+            'kind': ns.kind,
+            'metadata': {'name': name, 'labels': self.labels}
+        }
+        try:
+            ns.create(resource_dict=resource_dict)
+        except api_exceptions.ConflictError:
+            if ns.status() != TERMINATING:
+                LOGGER.info(f"Namespace {name} already exists, adopting it")
+                ns.label(labels=self.labels)
+                return
+
+            LOGGER.info(f"Namespace {name} is {TERMINATING}, waiting for it to be gone")
+            ns.wait_until_gone(timeout=timeout)
+            ns.create(resource_dict=resource_dict)
+
+    @staticmethod
+    def cleanup_stale(run_id, max_workers=10, context=None):
+        """
+        Delete namespaces left behind by other (crashed) test runs
+
+        Args:
+            run_id (str): Current test run id, namespaces of this run are kept.
+            max_workers (int): Maximum number of concurrent API calls.
+            context (ClusterContext): Cluster, the default cluster if not set.
+
+        Returns:
+            list: Names of the namespaces that were deleted.
+        """
+        stale = NameSpace(context=context).list(
+            get_names=True, label_selector=f"{RUN_ID_LABEL},{RUN_ID_LABEL}!={run_id}"
+        )
+        if stale:
+            LOGGER.info(f"Deleting stale namespaces from previous runs: {stale}")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(lambda name: NameSpace(name=name, context=context).delete(), stale))
+        return stale
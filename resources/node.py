@@ -1,5 +1,6 @@
 from utilities import types
 
+from . import views
 from .resource import Resource
 
 
@@ -7,8 +8,10 @@ class Node(Resource):
     """
     NameSpace object, inherited from Resource.
     """
-    def __init__(self, name=None, namespace=None):
-        super(Node, self).__init__()
+    view_class = views.NodeView
+
+    def __init__(self, name=None, namespace=None, context=None):
+        super(Node, self).__init__(context=context)
         self.name = name
         self.namespace = namespace
         self.api_version = types.API_VERSION_V1
@@ -1,5 +1,6 @@
-from utilities import types, utils
+from utilities import commands, types, utils
 
+from . import views
 from .resource import Resource
 
 
@@ -7,8 +8,10 @@ class Pod(Resource):
     """
     NameSpace object, inherited from Resource.
     """
-    def __init__(self, name=None, namespace=None):
-        super(Pod, self).__init__()
+    view_class = views.PodView
+
+    def __init__(self, name=None, namespace=None, context=None):
+        super(Pod, self).__init__(context=context)
         self.name = name
         self.namespace = namespace
         self.api_version = types.API_VERSION_V1
@@ -23,6 +26,23 @@ class Pod(Resource):
         """
         return self.get().spec.containers
 
+    def exec_args(self, command, container=None):
+        """
+        Build the oc exec command line of a command, to run many of them with commands.run_many()
+
+        Args:
+            command (str): Command to run.
+            container (str): Container name if pod has more then one.
+
+        Returns:
+            list: Command arguments.
+        """
+        container_name = f" -c {container}" if container else ""
+        return commands.oc_args(
+            command=f"exec -i {self.name}{container_name} -- {command}", namespace=self.namespace,
+            kubeconfig=self.kubeconfig
+        )
+
     def run_command(self, command, container):
         """
         Run command on pod.
@@ -34,15 +54,7 @@ class Pod(Resource):
         Returns:
             tuple: True, out if command succeeded, False, err otherwise.
         """
-        cmd = f"exec -i {self.name}"
-        if self.namespace:
-            cmd += f" -n {self.namespace}"
-
-        if container:
-            cmd += f" -c {container}"
-
-        cmd += f" -- {command}"
-        return utils.run_oc_command(command=cmd, namespace=self.namespace)
+        return utils.run_command(command=self.exec_args(command=command, container=container))
 
     def node(self):
         """
@@ -51,4 +63,4 @@ class Pod(Resource):
         Returns:
             str: Node name
         """
-        return self.get().spec.nodeName
+        return self.view().node_name
@@ -1,35 +1,89 @@
+import json
 import logging
-import os
-
-import urllib3
-import yaml
-from autologs.autologs import generate_logs
-from kubernetes import config as kube_config
-from openshift.dynamic import DynamicClient
-from openshift.dynamic.exceptions import NotFoundError
 
 from utilities import utils
+from utilities.logs import generate_logs
+
+from . import cluster, manifests, views
 
 LOGGER = logging.getLogger(__name__)
 TIMEOUT = 120
 SLEEP = 1
+#  Imported on first use, it imports the whole kubernetes client
+api_exceptions = utils.LazyModule(name="openshift.dynamic.exceptions")
+FIELD_MANAGER = "cnv-tests"
+PATCH_CONTENT_TYPES = {
+    "merge": "application/merge-patch+json",
+    "json": "application/json-patch+json",
+    "strategic": "application/strategic-merge-patch+json",
+}
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+
+def fatal_api_exceptions():
+    """
+    Returns:
+        tuple: API errors which polling can not recover from.
+    """
+    return utils.FATAL_EXCEPTIONS + (
+        api_exceptions.UnauthorizedError, api_exceptions.ForbiddenError, api_exceptions.ResourceNotFoundError
+    )
+
+
+def state_diff(desired, existing):
+    """
+    Desired fields which differ from the existing state, as a merge patch
+
+    Fields the server adds (defaults, status, metadata) are ignored, so are desired None values. Lists are
+    compared whole.
+
+    Args:
+        desired (dict): Desired state.
+        existing (dict): Existing state.
+
+    Returns:
+        dict: Merge patch, empty if the existing state has all desired fields.
+    """
+    patch = {}
+    for key, value in desired.items():
+        if value is None:
+            continue
+
+        current = existing.get(key)
+        if isinstance(value, dict):
+            nested = state_diff(desired=value, existing=current if isinstance(current, dict) else {})
+            if nested:
+                patch[key] = nested
+        elif value != current:
+            patch[key] = value
+    return patch
 
 
 class Resource(object):
-    def __init__(self, name=None, api_version=None, kind=None, namespace=None):
-        urllib3.disable_warnings()
-        try:
-            kubeconfig = os.getenv('KUBECONFIG')
-            self.client = DynamicClient(kube_config.new_client_from_config(config_file=kubeconfig))
-        except (kube_config.ConfigException, urllib3.exceptions.MaxRetryError):
-            LOGGER.error('You need to be login to cluster or have $KUBECONFIG env configured')
-            raise
+    view_class = views.ObjectView
+
+    def __init__(self, name=None, api_version=None, kind=None, namespace=None, context=None):
+        self.context = context or cluster.default_context()
+        self.kubeconfig = self.context.kubeconfig
+        self._client = None
 
         self.kind = kind
         self.namespace = namespace
         self.api_version = api_version
         self.name = name
 
+    @property
+    def client(self):
+        """
+        Returns:
+            ThrottledDynamicClient: Shared API client of the resource cluster, created on first API use.
+        """
+        if self._client is None:
+            self._client = self.context.client
+        return self._client
+
     def get(self, **kwargs):
         """
         Get resource
@@ -77,10 +131,67 @@ class Resource(object):
         Returns:
             list: Resources.
         """
-        list_items = self.client.resources.get(api_version=self.api_version, kind=self.kind).get(**kwargs).items
         if kwargs.pop('get_names', None):
-            return [i.get('metadata', {}).get('name') for i in list_items]
-        return list_items
+            return [i.name for i in self.list_views(**kwargs)]
+        return self.client.resources.get(api_version=self.api_version, kind=self.kind).get(**kwargs).items
+
+    @generate_logs()
+    def list_views(self, keep_raw=False, **kwargs):
+        """
+        Get resources list as typed views (see view_class)
+
+        Args:
+            keep_raw (bool): True to keep the raw JSON for deep access (view.raw).
+
+        Keyword Args:
+            namespace
+            label_selector
+            field_selector
+            limit
+            resource_version
+
+        Returns:
+            list: Views.
+        """
+        res = self.client.resources.get(api_version=self.api_version, kind=self.kind).get(serialize=False, **kwargs)
+        return views.parse_list(data=res.data, view_class=self.view_class, keep_raw=keep_raw)
+
+    def view(self, keep_raw=False):
+        """
+        Get the resource as a typed view (see view_class)
+
+        Args:
+            keep_raw (bool): True to keep the raw JSON for deep access (view.raw).
+
+        Returns:
+            ObjectView: View, None if the resource does not exist.
+        """
+        resource_list = self.client.resources.get(api_version=self.api_version, kind=self.kind)
+        try:
+            res = resource_list.get(name=self.name, namespace=self.namespace, serialize=False)
+        except api_exceptions.NotFoundError:
+            return None
+        return views.parse_object(data=res.data, view_class=self.view_class, keep_raw=keep_raw)
+
+    def watch(self, timeout=TIMEOUT, **kwargs):
+        """
+        Watch resource events
+
+        Args:
+            timeout (int): Time in seconds before the server closes the watch.
+
+        Keyword Args:
+            name
+            label_selector
+            field_selector
+            resource_version
+
+        Yields:
+            dict: Event with 'type' (ADDED, MODIFIED, DELETED) and 'object' keys.
+        """
+        resource_list = self.client.resources.get(api_version=self.api_version, kind=self.kind)
+        for event in resource_list.watch(namespace=self.namespace, timeout=timeout, **kwargs):
+            yield event
 
     @generate_logs()
     def wait(self, timeout=TIMEOUT, sleep=SLEEP):
@@ -89,12 +200,14 @@ class Resource(object):
 
         Args:
             timeout (int): Time to wait for the resource.
-            sleep (int): Time to sleep between retries.
+            sleep (int): Time to sleep between retries or sampling strategy (see utils.TimeoutSampler).
 
         Returns:
             bool: True if resource exists, False if timeout reached.
         """
-        sample = utils.TimeoutSampler(timeout=timeout, sleep=sleep, func=lambda: bool(self.get()))
+        sample = utils.TimeoutSampler(
+            timeout=timeout, sleep=sleep, func=lambda: self.view() is not None, fatal_exceptions=fatal_api_exceptions()
+        )
         return sample.wait_for_func_status(result=True)
 
     @generate_logs()
@@ -104,12 +217,14 @@ class Resource(object):
 
         Args:
             timeout (int): Time to wait for the resource.
-            sleep (int): Time to sleep between retries.
+            sleep (int): Time to sleep between retries or sampling strategy (see utils.TimeoutSampler).
 
         Returns:
             bool: True if resource exists, False if timeout reached.
         """
-        sample = utils.TimeoutSampler(timeout=timeout, sleep=sleep, func=lambda: bool(self.get()))
+        sample = utils.TimeoutSampler(
+            timeout=timeout, sleep=sleep, func=lambda: self.view() is not None, fatal_exceptions=fatal_api_exceptions()
+        )
         return sample.wait_for_func_status(result=False)
 
     @generate_logs()
@@ -120,12 +235,14 @@ class Resource(object):
         Args:
             status (str): Expected status.
             timeout (int): Time to wait for the resource.
-            sleep (int): Time to sleep between retries.
+            sleep (int): Time to sleep between retries or sampling strategy (see utils.TimeoutSampler).
 
         Returns:
             bool: True if resource in desire status, False if timeout reached.
         """
-        sampler = utils.TimeoutSampler(timeout=timeout, sleep=sleep, func=lambda: self.status() == status)
+        sampler = utils.TimeoutSampler(
+            timeout=timeout, sleep=sleep, func=lambda: self.status() == status, fatal_exceptions=fatal_api_exceptions()
+        )
         return sampler.wait_for_func_status(result=True)
 
     @generate_logs()
@@ -134,7 +251,7 @@ class Resource(object):
         Create resource from given yaml file or from dict
 
         Args:
-            yaml_file (str): Path to yaml file.
+            yaml_file (str): Path to yaml file, created in the Resource namespace if set.
             resource_dict (dict): Dict to create resource from.
             wait (bool) : True to wait for resource status.
 
@@ -142,14 +259,7 @@ class Resource(object):
             bool: True if create succeeded, False otherwise.
         """
         if yaml_file:
-            with open(yaml_file, 'r') as stream:
-                data = yaml.full_load(stream)
-
-            self._extract_data_from_yaml(yaml_data=data)
-            res = utils.run_oc_command(command=f'create -f {yaml_file}', namespace=self.namespace)[0]
-            if wait and res:
-                return self.wait()
-            return res
+            return self.create(resource_dict=self._desired_state(yaml_file=yaml_file), wait=wait)
 
         if not resource_dict:
             resource_dict = {
@@ -170,21 +280,15 @@ class Resource(object):
         Delete resource
 
         Args:
-            yaml_file (str): Path to yaml file to delete from yaml.
+            yaml_file (str): Path to yaml file to delete from yaml, deleted from the Resource namespace if set.
             wait (bool): True to wait for pod to be deleted.
 
         Returns:
             True if delete succeeded, False otherwise.
         """
         if yaml_file:
-            with open(yaml_file, 'r') as stream:
-                data = yaml.full_load(stream)
-
-            self._extract_data_from_yaml(yaml_data=data)
-            res = utils.run_oc_command(command=f'delete -f {yaml_file}', namespace=self.namespace)[0]
-            if wait and res:
-                return self.wait_until_gone()
-            return res
+            self._desired_state(yaml_file=yaml_file)
+            return self.delete(wait=wait)
 
         resource_list = self.client.resources.get(api_version=self.api_version, kind=self.kind)
         try:
@@ -192,9 +296,100 @@ class Resource(object):
             if wait and res:
                 return self.wait_until_gone()
             return res
-        except NotFoundError:
+        except api_exceptions.NotFoundError:
             return False
 
+    def _desired_state(self, yaml_file=None, resource_dict=None):
+        """
+        Load the desired state, set the resource identity from it
+
+        Args:
+            yaml_file (str): Path to yaml file, relocated to the Resource namespace if set.
+            resource_dict (dict): Desired state dict.
+
+        Returns:
+            dict: Desired state.
+        """
+        if yaml_file:
+            resource_dict = manifests.load(path=yaml_file)
+
+        namespace = self.namespace
+        self._extract_data_from_yaml(yaml_data=resource_dict)
+        if namespace and namespace != self.namespace:
+            self.namespace = namespace
+            if self.client.resources.get(api_version=self.api_version, kind=self.kind).namespaced:
+                resource_dict = dict(resource_dict, metadata=dict(resource_dict['metadata'], namespace=namespace))
+        return resource_dict
+
+    @generate_logs()
+    def apply(self, yaml_file=None, resource_dict=None, field_manager=FIELD_MANAGER, force=True):
+        """
+        Apply resource from given yaml file or dict (server side apply)
+
+        Args:
+            yaml_file (str): Path to yaml file, applied in the Resource namespace if set.
+            resource_dict (dict): Dict to apply.
+            field_manager (str): Field manager owning the applied fields.
+            force (bool): True to take over fields owned by other managers.
+
+        Returns:
+            ResourceInstance: Applied object.
+        """
+        body = self._desired_state(yaml_file=yaml_file, resource_dict=resource_dict)
+        resource_list = self.client.resources.get(api_version=self.api_version, kind=self.kind)
+        return resource_list.server_side_apply(
+            body=body, name=self.name, namespace=self.namespace, field_manager=field_manager, force_conflicts=force
+        )
+
+    @generate_logs()
+    def patch(self, patch, patch_type="merge", field_manager=FIELD_MANAGER):
+        """
+        Patch resource
+
+        Args:
+            patch (dict): Patch, a list of operations for a JSON patch.
+            patch_type (str): merge, json or strategic (see PATCH_CONTENT_TYPES).
+            field_manager (str): Field manager owning the patched fields.
+
+        Returns:
+            ResourceInstance: Patched object.
+        """
+        resource_list = self.client.resources.get(api_version=self.api_version, kind=self.kind)
+        return resource_list.patch(
+            body=patch, name=self.name, namespace=self.namespace, content_type=PATCH_CONTENT_TYPES[patch_type],
+            field_manager=field_manager
+        )
+
+    @generate_logs()
+    def reconcile(self, yaml_file=None, resource_dict=None, wait=False):
+        """
+        Reconcile resource with given yaml file or dict, send only the fields which differ
+
+        Args:
+            yaml_file (str): Path to yaml file, reconciled in the Resource namespace if set.
+            resource_dict (dict): Desired state dict.
+            wait (bool): True to wait for a created resource.
+
+        Returns:
+            str: CREATED, UPDATED or UNCHANGED.
+        """
+        desired = self._desired_state(yaml_file=yaml_file, resource_dict=resource_dict)
+        resource_list = self.client.resources.get(api_version=self.api_version, kind=self.kind)
+        try:
+            existing = resource_list.get(name=self.name, namespace=self.namespace, serialize=False)
+        except api_exceptions.NotFoundError:
+            self.create(resource_dict=desired, wait=wait)
+            return CREATED
+
+        changes = state_diff(desired=desired, existing=json.loads(existing.data))
+        if not changes:
+            LOGGER.info(f"{self.kind} {self.name} is up to date")
+            return UNCHANGED
+
+        LOGGER.info(f"{self.kind} {self.name} differs from the desired state in {sorted(changes)}, patching it")
+        self.patch(patch=changes)
+        return UPDATED
+
     @generate_logs()
     def status(self):
         """
@@ -203,9 +398,10 @@ class Resource(object):
         Status: Running,Scheduling, Pending, Unknown, CrashLoopBackOff
 
         Returns:
-           str: Status
+           str: Status, None if the resource does not exist.
         """
-        return self.get().status.phase
+        view = self.view()
+        return view.phase if view else None
 
     def _extract_data_from_yaml(self, yaml_data):
         """
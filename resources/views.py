@@ -0,0 +1,203 @@
+"""
+Compact typed views over API objects: the few fields callers use, extracted once from the raw JSON, instead of
+ResourceInstance/ResourceField trees of the whole objects.
+"""
+
+import json
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RawList(object):
+    """
+    Raw JSON of an API response, parsed again only on deep access of one of its objects.
+    """
+    __slots__ = ("data", "_items")
+
+    def __init__(self, data):
+        """
+        Args:
+            data (bytes): Response body, a List or a single object.
+        """
+        self.data = data
+        self._items = None
+
+    def item(self, idx):
+        """
+        Args:
+            idx (int): Object index, None for a single object response.
+
+        Returns:
+            dict: Full object.
+        """
+        if self._items is None:
+            parsed = json.loads(self.data)
+            self._items = parsed.get("items", []) if idx is not None else [parsed]
+        return self._items[idx or 0]
+
+
+def _status_conditions(status):
+    """
+    Returns:
+        dict: Condition type: status ('True', 'False', 'Unknown').
+    """
+    return dict((i.get("type"), i.get("status")) for i in status.get("conditions") or [])
+
+
+class ObjectView(object):
+    """
+    View of any API object: identity, labels and status.phase.
+
+    Deep fields are reachable through `raw` if the view was built with its raw JSON (keep_raw).
+    """
+    __slots__ = ("name", "namespace", "uid", "resource_version", "labels", "creation_timestamp", "phase", "_source")
+
+    def __init__(self, obj, source=None):
+        """
+        Args:
+            obj (dict): API object.
+            source (tuple): RawList and object index, None to not keep the raw JSON.
+        """
+        metadata = obj.get("metadata") or {}
+        self.name = metadata.get("name")
+        self.namespace = metadata.get("namespace")
+        self.uid = metadata.get("uid")
+        self.resource_version = metadata.get("resourceVersion")
+        self.labels = metadata.get("labels") or {}
+        self.creation_timestamp = metadata.get("creationTimestamp")
+        status = obj.get("status") or {}
+        self.phase = status.get("phase")
+        self._source = source
+        self._extract(spec=obj.get("spec") or {}, status=status)
+
+    def _extract(self, spec, status):
+        """
+        Extract the kind specific fields
+
+        Args:
+            spec (dict): Object spec.
+            status (dict): Object status.
+        """
+        pass
+
+    @property
+    def raw(self):
+        """
+        Returns:
+            dict: Full object, parsed from the kept raw JSON.
+
+        Raises:
+            ValueError: If the view was built without its raw JSON.
+        """
+        if self._source is None:
+            raise ValueError(f"{type(self).__name__} {self.name} was built without its raw JSON (keep_raw)")
+        raw_list, idx = self._source
+        return raw_list.item(idx=idx)
+
+    def __repr__(self):
+        name = f"{self.namespace}/{self.name}" if self.namespace else self.name
+        return f"{type(self).__name__}({name})"
+
+
+class PodView(ObjectView):
+    """
+    Pod view: node, IP and container names.
+    """
+    __slots__ = ("node_name", "pod_ip", "containers")
+
+    def _extract(self, spec, status):
+        self.node_name = spec.get("nodeName")
+        self.pod_ip = status.get("podIP")
+        self.containers = tuple(i.get("name") for i in spec.get("containers") or [])
+
+
+class NodeView(ObjectView):
+    """
+    Node view: addresses and Ready condition.
+    """
+    __slots__ = ("addresses", "ready")
+
+    def _extract(self, spec, status):
+        self.addresses = tuple((i.get("type"), i.get("address")) for i in status.get("addresses") or [])
+        self.ready = _status_conditions(status=status).get("Ready") == "True"
+
+    def address(self, type_="InternalIP"):
+        """
+        Args:
+            type_ (str): Address type (InternalIP, ExternalIP, Hostname).
+
+        Returns:
+            str: First address of the type, None if the node has none.
+        """
+        return next((address for addr_type, address in self.addresses if addr_type == type_), None)
+
+
+class VirtualMachineView(ObjectView):
+    """
+    VM view: requested run state and readiness.
+    """
+    __slots__ = ("running", "ready")
+
+    def _extract(self, spec, status):
+        self.running = spec.get("running")
+        self.ready = bool(status.get("ready"))
+
+
+class VirtualMachineInstanceView(ObjectView):
+    """
+    VMI view: node, interfaces reported by the guest agent and conditions.
+    """
+    __slots__ = ("node_name", "interfaces", "conditions")
+
+    def _extract(self, spec, status):
+        self.node_name = status.get("nodeName")
+        self.interfaces = tuple(
+            dict((key, i.get(key)) for key in ("name", "interfaceName", "ipAddress", "mac")) for i in
+            status.get("interfaces") or []
+        )
+        self.conditions = _status_conditions(status=status)
+
+    def ip_address(self, interface_name="eth0"):
+        """
+        Args:
+            interface_name (str): Guest interface name.
+
+        Returns:
+            str: Interface IP without prefix length, None if not reported.
+        """
+        ip = next((i["ipAddress"] for i in self.interfaces if i["interfaceName"] == interface_name), None)
+        return ip.split("/")[0] if ip else None
+
+
+def parse_list(data, view_class=ObjectView, keep_raw=False):
+    """
+    Build views from a raw List response
+
+    Args:
+        data (bytes): Response body.
+        view_class (type): ObjectView subclass.
+        keep_raw (bool): True to keep the raw JSON for deep access (view.raw), the parsed objects are dropped
+            either way.
+
+    Returns:
+        list: Views.
+    """
+    items = json.loads(data).get("items") or []
+    raw_list = RawList(data=data) if keep_raw else None
+    return [view_class(obj=obj, source=(raw_list, idx) if keep_raw else None) for idx, obj in enumerate(items)]
+
+
+def parse_object(data, view_class=ObjectView, keep_raw=False):
+    """
+    Build a view from a raw single object response
+
+    Args:
+        data (bytes): Response body.
+        view_class (type): ObjectView subclass.
+        keep_raw (bool): True to keep the raw JSON for deep access (view.raw).
+
+    Returns:
+        ObjectView: View.
+    """
+    return view_class(obj=json.loads(data), source=(RawList(data=data), None) if keep_raw else None)
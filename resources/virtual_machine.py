@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 
 import logging
-
-from autologs.autologs import generate_logs
+from concurrent.futures import ThreadPoolExecutor
 
 from utilities import types, utils
+from utilities.logs import generate_logs
 
-from .resource import SLEEP, TIMEOUT, Resource
+from . import views
+from .resource import SLEEP, TIMEOUT, Resource, fatal_api_exceptions
+from .virtual_machine_instance import VirtualMachineInstance
 
 LOGGER = logging.getLogger(__name__)
+MAX_WORKERS = 20
 
 
 class VirtualMachine(Resource):
@@ -16,9 +19,10 @@ class VirtualMachine(Resource):
     Virtual Machine object, inherited from Resource.
     Implements actions start / stop / status / wait for VM status / is running
     """
+    view_class = views.VirtualMachineView
 
-    def __init__(self, name, namespace=None):
-        super(VirtualMachine, self).__init__()
+    def __init__(self, name, namespace=None, context=None):
+        super(VirtualMachine, self).__init__(context=context)
         self.name = name
         self.namespace = namespace
         self.api_version = types.CNV_API_VERSION
@@ -37,7 +41,9 @@ class VirtualMachine(Resource):
             True if VM started, else False
 
         """
-        res = utils.run_virtctl_command(command="start", namespace=self.namespace)[0]
+        res = utils.run_virtctl_command(
+            command=f"start {self.name}", namespace=self.namespace, kubeconfig=self.kubeconfig
+        )[0]
         if wait and res:
             return self.wait_for_status(sleep=sleep, timeout=timeout, status=True)
         return res
@@ -55,7 +61,9 @@ class VirtualMachine(Resource):
             bool: True if VM stopped, else False
 
         """
-        res = utils.run_virtctl_command(command="stop", namespace=self.namespace)[0]
+        res = utils.run_virtctl_command(
+            command=f"stop {self.name}", namespace=self.namespace, kubeconfig=self.kubeconfig
+        )[0]
         if wait and res:
             return self.wait_for_status(sleep=sleep, timeout=timeout, status=False)
         return res
@@ -85,14 +93,47 @@ class VirtualMachine(Resource):
         Returns:
             bool: True if resource in desire status, False if timeout reached.
         """
-        sampler = utils.TimeoutSampler(timeout=timeout, sleep=sleep, func=lambda: self.get().spec.running == status)
+        sampler = utils.TimeoutSampler(
+            timeout=timeout, sleep=sleep, func=lambda: self.view().running == status,
+            fatal_exceptions=fatal_api_exceptions()
+        )
         return sampler.wait_for_func_status(result=True)
 
     def node(self):
         """
-        Get the node name where the VM is running
+        Get the node name where the VM is running, from its VMI (a VM status has no node)
 
         Returns:
-            str: Node name
+            str: Node name, None if the VM is not running.
         """
-        return self.get().status.nodeName
+        vmi = VirtualMachineInstance(name=self.name, namespace=self.namespace, context=self.context).view()
+        return vmi.node_name if vmi else None
+
+
+def create_many(vms, namespace, max_workers=MAX_WORKERS, wait=False, context=None):
+    """
+    Create VMs concurrently, the waits are bounded by the caller utils.Deadline
+
+    Args:
+        vms (list): VM dicts.
+        namespace (str): VMs namespace.
+        max_workers (int): Maximum concurrent creates.
+        wait (bool): True to wait for each VM to exist.
+        context (ClusterContext): Cluster, the default cluster if not set.
+
+    Returns:
+        dict: VM name: None if created, the error (exception or False) otherwise.
+    """
+    def _create(vm):
+        try:
+            res = VirtualMachine(name=vm['metadata']['name'], namespace=namespace, context=context).create(
+                resource_dict=vm, wait=wait
+            )
+            return None if res else False
+        except Exception as exp:
+            LOGGER.error(f"Failed to create VM {vm['metadata']['name']}: {exp}")
+            return exp
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(utils.Deadline.bind(_create), vms))
+    return dict((vm['metadata']['name'], result) for vm, result in zip(vms, results))
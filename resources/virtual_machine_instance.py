@@ -1,12 +1,86 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import threading
+import time
 
-from utilities import types
+from utilities import types, utils
 
+from . import views, watcher
 from .resource import Resource
 
 LOGGER = logging.getLogger(__name__)
+AGENT_CONNECTED = 'AgentConnected'
+INTERFACES_TIMEOUT = 600
+#  VMI uid: time of the first watch event with all interfaces reported, of the VMIs of the tracked watchers
+_INTERFACES_TIMES = {}
+_TRACKED_WATCHERS = set()
+_TRACKING_LOCK = threading.Lock()
+
+
+def agent_connected(vmi):
+    """
+    Args:
+        vmi (dict): VMI object.
+
+    Returns:
+        bool: True if the VMI has an AgentConnected=True condition.
+    """
+    return any(
+        i.get('type') == AGENT_CONNECTED and i.get('status') == 'True'
+        for i in (vmi or {}).get('status', {}).get('conditions') or []
+    )
+
+
+def interfaces_reported(vmi):
+    """
+    Args:
+        vmi (dict): VMI object.
+
+    Returns:
+        bool: True if the guest agent reported a name and an IP for every VMI interface.
+    """
+    ifcs = (vmi or {}).get('status', {}).get('interfaces') or []
+    return bool(ifcs) and all(i.get('ipAddress') and i.get('interfaceName') for i in ifcs)
+
+
+def agent_connected_time(vmi):
+    """
+    Args:
+        vmi (dict): VMI object.
+
+    Returns:
+        float: Epoch seconds the AgentConnected condition became True, None if unknown.
+    """
+    for condition in (vmi or {}).get('status', {}).get('conditions') or []:
+        if condition.get('type') == AGENT_CONNECTED and condition.get('status') == 'True':
+            return utils.parse_timestamp(condition.get('lastTransitionTime'))
+    return None
+
+
+def _record_interfaces_time(event_type, obj, timestamp):
+    """
+    Watcher subscriber: keep the time of the first event of every VMI with all interfaces reported
+    """
+    uid = obj['metadata'].get('uid')
+    if event_type == 'DELETED':
+        _INTERFACES_TIMES.pop(uid, None)
+    elif interfaces_reported(vmi=obj):
+        _INTERFACES_TIMES.setdefault(uid, timestamp)
+
+
+def _track_interfaces(vmis):
+    """
+    Record the interfaces reported time of the VMIs of a watcher, from now on
+
+    Args:
+        vmis (Watcher): VMI watcher.
+    """
+    with _TRACKING_LOCK:
+        if vmis in _TRACKED_WATCHERS:
+            return
+        _TRACKED_WATCHERS.add(vmis)
+    vmis.subscribe(callback=_record_interfaces_time)
 
 
 class VirtualMachineInstance(Resource):
@@ -14,9 +88,52 @@ class VirtualMachineInstance(Resource):
     Virtual Machine object, inherited from Resource.
     Implements actions start / stop / status / wait for VM status / is running
     """
-    def __init__(self, name, namespace=None):
-        super(VirtualMachineInstance, self).__init__()
+    view_class = views.VirtualMachineInstanceView
+
+    def __init__(self, name, namespace=None, context=None):
+        super(VirtualMachineInstance, self).__init__(context=context)
         self.name = name
         self.namespace = namespace
         self.api_version = types.CNV_API_VERSION
         self.kind = types.VMI
+
+    def wait_for_agent_and_interfaces(self, timeout=INTERFACES_TIMEOUT):
+        """
+        Wait until the guest agent is connected and reported all VMI network interfaces
+
+        Waits on the namespace shared VMI watch, any number of VMIs waiting cost one watch. The times are when it
+        happened (AgentConnected transition, first watch event with the interfaces since the first wait on the
+        namespace), not when this wait saw it, so waiting on VMIs one after the other does not inflate them.
+
+        Args:
+            timeout (int): Time to wait for both (capped by the current utils.Deadline).
+
+        Returns:
+            dict: time_to_agent and time_to_ip, seconds from the VMI creation.
+
+        Raises:
+            TimeoutExpiredError: After timeout reached.
+        """
+        vmis = watcher.get_watcher(
+            api_version=self.api_version, kind=self.kind, namespace=self.namespace, context=self.context
+        )
+        _track_interfaces(vmis=vmis)
+        vmi = vmis.objects.get(self.name)
+        if vmi and interfaces_reported(vmi=vmi):
+            #  Reported before the tracking started, the wait start is the closest known time
+            _INTERFACES_TIMES.setdefault(vmi['metadata'].get('uid'), time.time())
+
+        with utils.Deadline(timeout=timeout):
+            LOGGER.info(f'Wait until VMI {self.name} guest agent is connected')
+            vmi = vmis.wait_for(name=self.name, predicate=agent_connected, timeout=timeout)
+            agent_time = agent_connected_time(vmi=vmi) or time.time()
+            LOGGER.info(f'Wait until VMI {self.name} reports network interfaces status')
+            vmi = vmis.wait_for(name=self.name, predicate=interfaces_reported, timeout=timeout)
+            ip_time = _INTERFACES_TIMES.get(vmi['metadata'].get('uid')) or time.time()
+
+        created = utils.parse_timestamp(vmi['metadata'].get('creationTimestamp')) or agent_time
+        metrics = {'time_to_agent': agent_time - created, 'time_to_ip': ip_time - created}
+        LOGGER.info(
+            f'VMI {self.name} time to agent {metrics["time_to_agent"]:.1f}s, time to IP {metrics["time_to_ip"]:.1f}s'
+        )
+        return metrics
@@ -0,0 +1,212 @@
+"""
+Shared resources watcher: one watch per kind and namespace, waits resolve on watch events instead of polling.
+"""
+
+import logging
+import threading
+import time
+
+from utilities import utils
+
+from . import cluster
+from .resource import Resource
+
+LOGGER = logging.getLogger(__name__)
+WATCH_TIMEOUT = 300
+RETRY_SLEEP = 1
+
+_WATCHERS = {}
+_WATCHERS_LOCK = threading.Lock()
+
+
+class Watcher(object):
+    """
+    Keep the latest state of all objects of a kind in a namespace from one list + watch, in a background thread.
+
+    Waiters and subscribers are served from this state, so N waiting callers cost one watch.
+    The watch resumes from the last seen resourceVersion and re-lists when the server expired it.
+    """
+    def __init__(self, api_version, kind, namespace=None, context=None):
+        """
+        Args:
+            api_version (str): Resource API version.
+            kind (str): Resource kind.
+            namespace (str): Namespace, None for all namespaces.
+            context (ClusterContext): Cluster, the default cluster if not set.
+        """
+        self.resource = Resource(api_version=api_version, kind=kind, namespace=namespace, context=context)
+        self.objects = {}
+        ''' Object name: latest object (dict). '''
+        self._subscribers = []
+        self._cond = threading.Condition()
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Start watching, return when the initial list is loaded
+        """
+        with self._start_lock:
+            if not self._thread:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"watcher-{self.resource.kind}-{self.resource.namespace}", daemon=True
+                )
+                self._thread.start()
+        self._synced.wait()
+
+    def stop(self):
+        """
+        Stop watching, the running watch ends on its next event or timeout
+        """
+        self._stopped.set()
+
+    def subscribe(self, callback):
+        """
+        Get every event
+
+        Args:
+            callback (function): func(event_type, obj, timestamp), called from the watcher thread,
+                event_type is ADDED, MODIFIED, DELETED or SYNC (objects of the initial list and re-lists).
+        """
+        with self._cond:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Args:
+            callback (function): Subscribed callback.
+        """
+        with self._cond:
+            self._subscribers.remove(callback)
+
+    def _list(self):
+        """
+        Replace the state with a fresh list
+
+        Returns:
+            str: List resourceVersion to watch from.
+        """
+        resource_list = self.resource.client.resources.get(
+            api_version=self.resource.api_version, kind=self.resource.kind
+        )
+        res = resource_list.get(namespace=self.resource.namespace)
+        now = time.time()
+        with self._cond:
+            self.objects = dict((i.metadata.name, i.to_dict()) for i in res.items)
+            for obj in self.objects.values():
+                self._notify(event_type="SYNC", obj=obj, timestamp=now)
+            self._cond.notify_all()
+        return res.metadata.resourceVersion
+
+    def _notify(self, event_type, obj, timestamp):
+        """
+        Call the subscribers, with the lock held
+        """
+        for callback in self._subscribers:
+            try:
+                callback(event_type, obj, timestamp)
+            except Exception:
+                LOGGER.exception(f"Watcher subscriber {callback} failed")
+
+    def _run(self):
+        """
+        List then watch until stopped
+        """
+        resource_version = None
+        while not self._stopped.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self._list()
+                    self._synced.set()
+
+                for event in self.resource.watch(timeout=WATCH_TIMEOUT, resource_version=resource_version):
+                    if self._stopped.is_set():
+                        return
+
+                    obj = event['raw_object']
+                    if event['type'] == 'ERROR':
+                        #  410 Gone, the resourceVersion is too old
+                        LOGGER.info(f"Watch {self.resource.kind} expired ({obj.get('message')}), re-listing")
+                        resource_version = None
+                        break
+
+                    resource_version = obj['metadata']['resourceVersion']
+                    self._apply(event_type=event['type'], obj=obj)
+            except Exception as exp:
+                LOGGER.warning(f"Watch {self.resource.kind} failed: {exp}, re-listing in {RETRY_SLEEP}s")
+                resource_version = None
+                self._synced.set()
+                time.sleep(RETRY_SLEEP)
+
+    def _apply(self, event_type, obj):
+        """
+        Update the state with a watch event
+        """
+        now = time.time()
+        name = obj['metadata']['name']
+        with self._cond:
+            if event_type == 'DELETED':
+                self.objects.pop(name, None)
+            else:
+                self.objects[name] = obj
+            self._notify(event_type=event_type, obj=obj, timestamp=now)
+            self._cond.notify_all()
+
+    def wait_for(self, name, predicate, timeout):
+        """
+        Wait until an object matches
+
+        The timeout is capped by the current utils.Deadline.
+
+        Args:
+            name (str): Object name.
+            predicate (function): func(obj) -> bool, obj is None while the object does not exist.
+            timeout (float): Time to wait.
+
+        Returns:
+            dict: The matching object.
+
+        Raises:
+            TimeoutExpiredError: If the object did not match in time.
+        """
+        self.start()
+        deadline = utils.Deadline.current()
+        expires = time.time() + timeout
+        if deadline:
+            expires = min(expires, deadline.expires)
+
+        with self._cond:
+            while True:
+                obj = self.objects.get(name)
+                if predicate(obj):
+                    return obj
+
+                remaining = expires - time.time()
+                if remaining <= 0:
+                    raise utils.TimeoutExpiredError(f"{self.resource.kind} {name}: condition not met in {timeout}s")
+                self._cond.wait(timeout=remaining)
+
+
+def get_watcher(api_version, kind, namespace=None, context=None):
+    """
+    Get the shared watcher of a kind in a namespace of a cluster, create it on first use
+
+    Args:
+        api_version (str): Resource API version.
+        kind (str): Resource kind.
+        namespace (str): Namespace, None for all namespaces.
+        context (ClusterContext): Cluster, the default cluster if not set.
+
+    Returns:
+        Watcher: Started watcher.
+    """
+    context = context or cluster.default_context()
+    key = (api_version, kind, namespace, context)
+    with _WATCHERS_LOCK:
+        if key not in _WATCHERS:
+            _WATCHERS[key] = Watcher(api_version=api_version, kind=kind, namespace=namespace, context=context)
+        watcher = _WATCHERS[key]
+    watcher.start()
+    return watcher
@@ -1,5 +1,18 @@
-TEST_NS = "kubevirt-test-default"
-TEST_NS_ALTERNATIVE = "kubevirt-test-alternative"
+import os
+import uuid
+
+from utilities import sharding
+
+# Namespaces are per xdist worker (-gw<N> suffix) so workers do not share resources
+TEST_NS = sharding.sharded_name("kubevirt-test-default")
+TEST_NS_ALTERNATIVE = sharding.sharded_name("kubevirt-test-alternative")
+
+# Test run id, labels every namespace created by this run (shared by all xdist workers)
+RUN_ID = os.getenv("CNV_TESTS_RUN_ID") or (sharding.testrun_uid() or uuid.uuid4().hex)[:8]
+
+# Cluster name of a multi-cluster run (utilities.multi_cluster), keeps the local files of concurrent runs apart
+CLUSTER_NAME = os.getenv("CNV_CLUSTER_NAME")
+CLUSTER_DIR = f"{CLUSTER_NAME}/" if CLUSTER_NAME else ""
 
 # VM distro
 FEDORA_VM = "fedora"
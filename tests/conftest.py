@@ -8,10 +8,182 @@ import os
 
 import pytest
 
-from resources.namespace import NameSpace
-from utilities import types
+from resources import client, manifests
+from resources.namespace import NameSpaceManager
+from utilities import diagnostics, durations, logs, profiling
 
-from . import config
+from . import config, hookspecs
+from .config import RUN_ID
+
+
+def pytest_addhooks(pluginmanager):
+    """
+    Register the cnv-tests hooks
+    """
+    pluginmanager.add_hookspecs(hookspecs)
+
+
+def pytest_addoption(parser):
+    """
+    Add CNV tests options
+    """
+    parser.addoption(
+        "--namespaces-teardown",
+        choices=("wait", "barrier", "async"),
+        default="barrier",
+        help=(
+            "wait: block until test namespaces are deleted, "
+            "barrier: delete in background and wait at the end of the session, "
+            "async: fire delete and return"
+        )
+    )
+    parser.addoption(
+        "--cleanup-stale-namespaces",
+        action="store_true",
+        help="Delete namespaces left behind by previous (crashed) test runs"
+    )
+    parser.addoption(
+        "--durations-db",
+        default=durations.DEFAULT_DB,
+        help="sqlite file with tests and fixtures durations history (relative to rootdir)"
+    )
+    parser.addoption(
+        "--schedule-by-durations",
+        action="store_true",
+        help=(
+            "Run the longest test modules first and balance modules over xdist workers "
+            "by their durations history (use with -n <N> --dist loadgroup)"
+        )
+    )
+    parser.addoption(
+        "--reconcile",
+        action="store_true",
+        help=(
+            "Reconcile namespaces, networks, node setup and VMs left by the previous run instead of creating "
+            "them, send only the differences and keep them at the end for the next run "
+            "(do not combine with --cleanup-stale-namespaces)"
+        )
+    )
+    parser.addoption(
+        "--events-buffer",
+        type=int,
+        default=diagnostics.DEFAULT_SIZE,
+        help=(
+            "Size of the ring buffer of Events and VMI phase transitions of the test namespaces, "
+            "the records of a failed test are added to its report (0 disables)"
+        )
+    )
+    parser.addoption(
+        "--events-logs",
+        action="store_true",
+        help="Also capture virt-launcher and ovs-cni container logs into the events buffer"
+    )
+    parser.addoption(
+        "--profile",
+        choices=profiling.MODES,
+        help=(
+            "Profile tests marked with profile and the --profile-fixture fixtures setup (every test if none), "
+            "deterministic writes pstats files, sampling writes collapsed stacks files"
+        )
+    )
+    parser.addoption(
+        "--profile-fixture",
+        action="append",
+        default=[],
+        help="Fixture to profile the setup of with --profile, repeatable, e.g. prepare_env"
+    )
+    parser.addoption(
+        "--profile-dir",
+        default=profiling.DEFAULT_DIR,
+        help="Profiles directory (relative to rootdir)"
+    )
+    parser.addoption(
+        "--profile-top",
+        type=int,
+        default=profiling.TOP,
+        help="Number of hot functions in each profile summary"
+    )
+    parser.addoption(
+        "--no-manifests-validation",
+        action="store_true",
+        help="Do not validate tests/manifests against the cached OpenAPI schemas at session start"
+    )
+    parser.addoption(
+        "--log-config",
+        action="append",
+        default=[],
+        help=(
+            "Call logging settings of a module and its submodules, repeatable, e.g. "
+            "resources=sample_interval:60,max_items:3 (sample_interval 0 logs every call)"
+        )
+    )
+
+
+def pytest_configure(config):
+    """
+    Register durations history, failure diagnostics and profiling plugins, apply call logging settings
+    """
+    for value in config.getoption("--log-config"):
+        module, settings = logs.parse_config(value=value)
+        logs.configure(module=module, **settings)
+
+    config.pluginmanager.register(
+        durations.DurationsPlugin(
+            config=config,
+            store=durations.DurationsStore(path=durations.durations_db_path(config=config)),
+            run_id=RUN_ID,
+            schedule=config.getoption("--schedule-by-durations")
+        ),
+        "cnv-durations"
+    )
+    if config.getoption("--events-buffer"):
+        config.pluginmanager.register(
+            diagnostics.DiagnosticsPlugin(
+                collector=diagnostics.ClusterEventsCollector(
+                    size=config.getoption("--events-buffer"), follow_logs=config.getoption("--events-logs")
+                )
+            ),
+            "cnv-diagnostics"
+        )
+    if config.getoption("--profile"):
+        config.pluginmanager.register(
+            profiling.ProfilingPlugin(
+                mode=config.getoption("--profile"),
+                output_dir=os.path.join(str(config.rootpath), config.getoption("--profile-dir")),
+                fixtures=config.getoption("--profile-fixture"),
+                top=config.getoption("--profile-top"),
+            ),
+            "cnv-profiling"
+        )
+
+
+def pytest_sessionstart(session):
+    """
+    Validate the manifests offline, before any setup (once, on the xdist controller)
+    """
+    if session.config.getoption("--no-manifests-validation") or hasattr(session.config, "workerinput"):
+        return
+
+    errors = manifests.get_repository().validate()
+    if errors:
+        pytest.exit("Invalid manifests:\n" + "\n".join(errors), returncode=pytest.ExitCode.USAGE_ERROR)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """
+    Wait for test namespaces to be deleted (--namespaces-teardown=barrier)
+    """
+    namespaces_manager = getattr(session.config, "namespaces_manager", None)
+    if namespaces_manager:
+        namespaces_manager.wait_until_gone()
+
+
+def pytest_terminal_summary(terminalreporter):
+    """
+    Report API clients requests, coalescing and throttling counters
+    """
+    for kubeconfig, stats in client.clients_stats().items():
+        terminalreporter.write_line(f"API client ({kubeconfig or 'default kubeconfig'}): {stats}")
 
 
 def pytest_collection_modifyitems(session, config, items):
@@ -73,23 +245,52 @@ def junitxml_polarion(request):
             my_junit.add_global_property('polarion-testrun-id', os.getenv('POLARION_TESTRUN_ID'))
 
 
+@pytest.fixture(scope="session")
+def session_namespaces(request):
+    """
+    Test namespaces names, and the namespaces of the collected tests directories (pytest_cnv_session_namespaces)
+
+    Resolved after collection, every collected directory conftest is registered whichever test comes first.
+    """
+    extra = request.config.hook.pytest_cnv_session_namespaces(config=request.config)
+    return [config.TEST_NS, config.TEST_NS_ALTERNATIVE] + [name for names in extra for name in names]
+
+
+@pytest.fixture(scope="session")
+def events_collector(request):
+    """
+    Cluster events collector of the failure diagnostics plugin, None if disabled (--events-buffer 0)
+    """
+    plugin = request.config.pluginmanager.get_plugin("cnv-diagnostics")
+    return plugin.collector if plugin else None
+
+
 @pytest.fixture(scope="session", autouse=True)
-def init(request):
+def init(request, session_namespaces, events_collector):
     """
-    Create test namespaces
+    Create test namespaces, start collecting their events
     """
-    namespaces = (config.TEST_NS, config.TEST_NS_ALTERNATIVE)
+    if request.config.getoption("--cleanup-stale-namespaces"):
+        NameSpaceManager.cleanup_stale(run_id=config.RUN_ID)
+
+    namespaces_manager = NameSpaceManager(names=session_namespaces, run_id=config.RUN_ID)
+    teardown = request.config.getoption("--namespaces-teardown")
+    if request.config.getoption("--reconcile"):
+        #  Existing namespaces are adopted, kept for the next run
+        assert namespaces_manager.create()
+        if events_collector:
+            events_collector.start(namespaces=session_namespaces)
+        return
 
     def fin():
         """
         Remove test namespaces
         """
-        for namespace in namespaces:
-            ns = NameSpace(name=namespace)
-            ns.delete(wait=True)
+        namespaces_manager.delete(wait=teardown == "wait", reaper=teardown == "barrier")
+        if teardown == "barrier":
+            request.config.namespaces_manager = namespaces_manager
     request.addfinalizer(fin)
 
-    for namespace in namespaces:
-        ns = NameSpace(name=namespace)
-        ns.create(wait=True)
-        ns.wait_for_status(status=types.ACTIVE)
+    assert namespaces_manager.create()
+    if events_collector:
+        events_collector.start(namespaces=session_namespaces)
@@ -0,0 +1,19 @@
+"""
+cnv-tests pytest hooks, implemented by the tests directories conftest files
+"""
+
+import pytest
+
+
+@pytest.hookspec
+def pytest_cnv_session_namespaces(config):
+    """
+    Namespaces the tests of a directory need, created with the session namespaces before the first test (whichever
+    directory it is in) and removed with them
+
+    Args:
+        config (Config): pytest config.
+
+    Returns:
+        list: Namespaces names.
+    """
@@ -1,6 +1,9 @@
 from tests.config import *  # noqa: F403,F401
 
-NETWORK_NS = "cnv-network-ns"
+from utilities import sharding
+
+NETWORK_NS = sharding.sharded_name("cnv-network-ns")
 OVS_CNI = "ovs-cni"
 OVS_CNI_CONTAINER = "ovs-cni-marker"
+OVS_CNI_SELECTOR = "app=ovs-cni"
 KUBE_SYSTEM_NS = "kube-system"
@@ -8,23 +8,27 @@ import pytest
 from tests.network import config
 
 from resources.namespace import NameSpace
-from utilities import types
+from utilities import sharding
+
+
+def pytest_cnv_session_namespaces():
+    """
+    Network test namespace, created with the session namespaces
+    """
+    return [config.NETWORK_NS]
 
 
 @pytest.fixture(scope="session", autouse=True)
-def network_init(request):
+def network_init(init, events_collector):
     """
-    Create network test namespaces
+    Switch to network test namespace (created by init with the session namespaces), follow ovs-cni logs
+    (--events-logs)
     """
-    def fin():
-        """
-        Remove network test namespaces
-        """
-        ns = NameSpace(name=config.NETWORK_NS)
-        ns.delete(wait=True)
-    request.addfinalizer(fin)
-
-    ns = NameSpace(name=config.NETWORK_NS)
-    ns.create(wait=True)
-    ns.wait_for_status(status=types.ACTIVE)
-    ns.work_on()
+    if events_collector and events_collector.follow_logs:
+        events_collector.add_logs(
+            namespace=config.KUBE_SYSTEM_NS, selector=config.OVS_CNI_SELECTOR, container=config.OVS_CNI_CONTAINER
+        )
+
+    #  xdist workers share one kubeconfig, switching project would race between them
+    if not sharding.worker_id():
+        NameSpace(name=config.NETWORK_NS).work_on()
@@ -1,24 +1,46 @@
+import os
+
+from tests.config import CLUSTER_DIR
 from tests.network.config import *  # noqa: F401, F403
 
+from utilities import network_benchmark, sharding, ssh
+
 #  GENERAL
-IP_LINK_SHOW_BETH_CMD = 'bash -c "ip -o link show type veth | wc -l"'
+# ifindex and iflink (peer ifindex for veth) of every interface
+POD_IFLINKS_CMD = "sh -c 'for i in /sys/class/net/*; do echo $(cat $i/ifindex) $(cat $i/iflink); done'"
+VIRT_LAUNCHER_CONTAINER = "compute"
+VM_DOMAIN_LABEL = "kubevirt.io/domain"
+VETH_REMOVED_TIMEOUT = 120
 
 #  VMS
+# Each xdist worker gets its own VM names and OVS/BOND addresses (.10 and up, clear of OVS_NODES_IPS)
+VM_HOST_IP = 10 + 2 * sharding.worker_index() if sharding.worker_id() else 1
 VMS = {
-    "vm-fedora-1": {
+    sharding.sharded_name("vm-fedora-1"): {
         "pod_ip": None,
-        "ovs_ip": "192.168.0.1",
-        "bond_ip": "192.168.1.1"
+        "ovs_ip": f"192.168.0.{VM_HOST_IP}",
+        "bond_ip": f"192.168.1.{VM_HOST_IP}"
     },
-    "vm-fedora-2": {
+    sharding.sharded_name("vm-fedora-2"): {
         "pod_ip": None,
-        "ovs_ip": "192.168.0.2",
-        "bond_ip": "192.168.1.2"
+        "ovs_ip": f"192.168.0.{VM_HOST_IP + 1}",
+        "bond_ip": f"192.168.1.{VM_HOST_IP + 1}"
     }
 }
 VMS_LIST = list(VMS.keys())
+VMS_BOOT_TIMEOUT = 900
 VM_YAML_TEMPLATE = "tests/manifests/network/vm-template-fedora-multus.yaml"
 
+#  SSH
+# Key pair injected through cloud-init, generated if missing (per xdist worker)
+SSH_KEY_FILE = os.getenv("CNV_SSH_KEY_FILE", f"ssh-keys/{CLUSTER_DIR}{sharding.sharded_name('id_rsa')}")
+# When the pod network is not routable from the test host, e.g.
+# "virtctl port-forward --stdio=true vmi/{vm}.{namespace} 22" ({vm}, {namespace} and {host} are formatted)
+SSH_PROXY_COMMAND = os.getenv("CNV_SSH_PROXY_COMMAND")
+# Guest commands over SSH instead of the console, opt-in: the VM pod IPs must be routable from the test host
+# (CNV_SSH=1) or reachable through SSH_PROXY_COMMAND
+USE_SSH = ssh.AVAILABLE and (bool(SSH_PROXY_COMMAND) or os.getenv("CNV_SSH", "").lower() in ("1", "true", "yes"))
+
 #  NODES
 OVS_NODES_IPS = ["192.168.0.3", "192.168.0.4"]
 GET_NICS_CMD = "bash -c 'ls -l /sys/class/net/ | grep -v virtual | grep net | rev | cut -d '/' -f 1 | rev'"
@@ -29,8 +51,9 @@ OVS_CMD = f"ovs-vsctl {OVS_DB}"
 OVS_VLAN_YAML_VXLAN = "tests/manifests/network/ovs-vlan-net-vxlan.yml"
 OVS_VLAN_YAML = "tests/manifests/network/ovs-vlan-net.yml"
 OVS_NO_VLAN_PORT = f"{OVS_CMD} ovs_novlan_port"
-OVS_VSCTL_ADD_BR = f"{OVS_CMD} add-br"
-OVS_VSCTL_ADD_PORT = f"{OVS_CMD} add-port"
+# Idempotent, --reconcile re-runs against bridges and ports left by the previous run
+OVS_VSCTL_ADD_BR = f"{OVS_CMD} --may-exist add-br"
+OVS_VSCTL_ADD_PORT = f"{OVS_CMD} --may-exist add-port"
 OVS_VSCTL_DEL_BR = f"{OVS_CMD} del-br"
 
 #  VXLAN
@@ -48,3 +71,40 @@ CHECK_NIC_DRIVER_CMD = "bash -c 'basename $(readlink -f /sys/class/net/{nic}/dev
 BRIDGE_NAME_REAL_NICS = "br1_real_nics"
 
 ALL_BRIDGES = [BRIDGE_NAME_REAL_NICS, BRIDGE_NAME_VXLAN, BOND_BRIDGE]
+
+# GUEST NETWORK BENCHMARK
+BENCHMARK_PROTOCOLS = (network_benchmark.TCP, network_benchmark.UDP)
+BENCHMARK_STREAMS = (1, 4)
+BENCHMARK_DIRECTIONS = (network_benchmark.FORWARD, network_benchmark.REVERSE)
+# UDP datagrams fit the VXLAN MTU (1450)
+BENCHMARK_MESSAGE_SIZES = {network_benchmark.TCP: [1400, 131072], network_benchmark.UDP: [256, 1400]}
+BENCHMARK_DURATION = 5
+BENCHMARK_REPEATS = 3
+BENCHMARK_RESULTS_FILE = os.getenv("CNV_BENCHMARK_RESULTS", f"benchmark-results/{CLUSTER_DIR}network.jsonl")
+# Results history, tests fail only on statistically significant regressions against it
+PERF_BASELINE_DB = os.getenv("CNV_PERF_BASELINE_DB", f"benchmark-results/{CLUSTER_DIR}baseline.sqlite")
+
+# LATENCY PROBE
+LATENCY_PING_COUNT = 100
+LATENCY_PING_INTERVAL = 0.2
+LATENCY_FLOOD_COUNT = 10000
+LATENCY_RR_DURATION = 10
+# Maximum p50/p99 (ms) and loss (%) per network type, None disables the check
+LATENCY_THRESHOLDS = {
+    "pod": {"p50": None, "p99": None, "loss_percent": None},
+    "ovs": {"p50": None, "p99": None, "loss_percent": None},
+    "vxlan": {"p50": None, "p99": None, "loss_percent": None},
+    "bond": {"p50": None, "p99": None, "loss_percent": None},
+}
+
+# CONNECTIVITY MATRIX
+MATRIX_NETWORKS = ["pod_ip", "ovs_ip", "bond_ip"]
+# Probes run concurrently per source VM, over SSH they share one connection, a console is one TTY
+MATRIX_PER_SOURCE_CONCURRENCY = 4 if USE_SSH else 1
+
+# BOOT SCALE BENCHMARK
+BOOT_SCALE_VMS = int(os.getenv("CNV_BOOT_SCALE_VMS", "10"))
+# VMs created per second
+BOOT_SCALE_RATE = float(os.getenv("CNV_BOOT_SCALE_RATE", "1"))
+BOOT_SCALE_TIMEOUT = 1800
+BOOT_SCALE_VM_PREFIX = sharding.sharded_name("vm-boot-scale")
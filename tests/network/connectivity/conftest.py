@@ -10,4 +10,5 @@ def pytest_configure():
     pytest.active_node_nics = {}
     pytest.nodes_network_info = {}
     pytest.real_nics_env = False
+    pytest.nic_driver = None
     pytest.bond_support_env = False
@@ -1,14 +1,14 @@
 
 import pytest
-from autologs.autologs import generate_logs
 from tests.test_utils import wait_for_vm_interfaces
 
 from resources.node import Node
 from resources.pod import Pod
-from resources.resource import Resource
-from resources.virtual_machine import VirtualMachine
+from resources.resource import UPDATED, Resource
+from resources.virtual_machine import VirtualMachine, create_many
 from resources.virtual_machine_instance import VirtualMachineInstance
-from utilities import types, utils
+from utilities import commands, sharding, ssh, types, utils, vm_spec
+from utilities.logs import generate_logs
 
 from . import config
 
@@ -26,9 +26,14 @@ def create_networks_from_yaml(request):
         Remove network CRDs
         """
         for yaml_ in yamls:
-            Resource().delete(yaml_file=yaml_, wait=True)
-    request.addfinalizer(fin)
+            Resource(namespace=config.NETWORK_NS).delete(yaml_file=yaml_, wait=True)
+
+    if keep_setup(request=request):
+        for yaml_ in yamls:
+            Resource(namespace=config.NETWORK_NS).reconcile(yaml_file=yaml_, wait=True)
+        return
 
+    request.addfinalizer(fin)
     for yaml_ in yamls:
         resource.create(yaml_file=yaml_, wait=True)
 
@@ -38,14 +43,11 @@ def get_node_internal_ip(request):
     """
     Get nodes internal IPs
     """
-    compute_nodes = Node().list(get_names=True, label_selector="node-role.kubernetes.io/compute=true")
+    compute_nodes = Node().list_views(label_selector="node-role.kubernetes.io/compute=true")
     for node in compute_nodes:
-        node_obj = Node(name=node)
-        node_info = node_obj.get()
-        for addr in node_info.status.addresses:
-            if addr.type == "InternalIP":
-                pytest.nodes_network_info[node] = addr.address
-                break
+        internal_ip = node.address(type_="InternalIP")
+        if internal_ip:
+            pytest.nodes_network_info[node.name] = internal_ip
     assert len(pytest.nodes_network_info.keys()) == len(compute_nodes)
 
 
@@ -54,34 +56,11 @@ def is_bare_metal():
     """
     Check if setup is on bare-metal
     """
-    pods = get_ovs_cni_pods()
-    assert pods
-    for idx, pod in enumerate(pods):
-        pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
-        pod_container = config.OVS_CNI_CONTAINER
-        pytest.active_node_nics[pod] = []
-        assert pod_object.wait_for_status(status=types.RUNNING)
-        err, nics = pod_object.run_command(command=config.GET_NICS_CMD, container=pod_container)
-        assert err
-        nics = nics.splitlines()
-        err, default_gw = pod_object.run_command(command="ip route show default", container=pod_container)
-        assert err
-        for nic in nics:
-            err, nic_state = pod_object.run_command(
-                command=f"cat /sys/class/net/{nic}/operstate", container=pod_container
-            )
-            assert err
-            if nic_state.strip() == "up":
-                if nic in [i for i in default_gw.splitlines() if 'default' in i][0]:
-                    continue
-
-                pytest.active_node_nics[pod].append(nic)
-
-                err, driver = pod_object.run_command(
-                    command=config.CHECK_NIC_DRIVER_CMD.format(nic=nic), container=pod_container
-                )
-                assert err
-                pytest.real_nics_env = driver.strip() != "virtio_net"
+    #  Detect once per run, other workers must not see NICs already enslaved to the BOND
+    node_nics = sharding.ClusterWideSetup(name="node-nics").setup(func=get_active_node_nics)
+    pytest.active_node_nics = node_nics["active_node_nics"]
+    pytest.real_nics_env = node_nics["real_nics_env"]
+    pytest.nic_driver = node_nics["nic_driver"]
 
 
 @pytest.fixture(scope='module')
@@ -110,19 +89,24 @@ def create_ovs_bridges_real_nics(request):
         """
         pods = get_ovs_cni_pods()
         assert pods
-        for pod in pods:
+        commands.run_many(
+            commands=[
+                Pod(name=pod, namespace=config.KUBE_SYSTEM_NS).exec_args(
+                    command=f"{config.OVS_VSCTL_DEL_BR} {real_nics_bridge}", container=config.OVS_CNI_CONTAINER
+                ) for pod in pods
+            ]
+        )
+
+    def setup():
+        """
+        Create OVS bridges on all nodes
+        """
+        pods = get_ovs_cni_pods()
+        assert pods
+        for idx, pod in enumerate(pods):
             pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
+            pod_name = pod
             pod_container = config.OVS_CNI_CONTAINER
-            pod_object.run_command(command=f"{config.OVS_VSCTL_DEL_BR} {real_nics_bridge}", container=pod_container)
-    request.addfinalizer(fin)
-
-    pods = get_ovs_cni_pods()
-    assert pods
-    for idx, pod in enumerate(pods):
-        pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
-        pod_name = pod
-        pod_container = config.OVS_CNI_CONTAINER
-        if pytest.real_nics_env:
             assert pod_object.run_command(
                 command=f"{config.OVS_VSCTL_ADD_BR} {real_nics_bridge}", container=pod_container
             )[0]
@@ -135,6 +119,10 @@ def create_ovs_bridges_real_nics(request):
                 ), container=pod_container
             )[0]
 
+    cluster_setup = sharding.ClusterWideSetup(name="ovs-bridges-real-nics")
+    request.addfinalizer(lambda: cluster_setup.teardown(func=teardown_unless_kept(request=request, func=fin)))
+    cluster_setup.setup(func=setup)
+
 
 @pytest.fixture(scope='module')
 def create_ovs_bridge_on_vxlan(request):
@@ -153,41 +141,51 @@ def create_ovs_bridge_on_vxlan(request):
         """
         pods = get_ovs_cni_pods()
         assert pods
-        for pod in pods:
+        commands.run_many(
+            commands=[
+                Pod(name=pod, namespace=config.KUBE_SYSTEM_NS).exec_args(
+                    command=f"{config.OVS_VSCTL_DEL_BR} {bridge_name_vxlan}", container=config.OVS_CNI_CONTAINER
+                ) for pod in pods
+            ]
+        )
+
+    def setup():
+        """
+        Create OVS bridges with VXLAN tunnel on all nodes
+        """
+        pods = get_ovs_cni_pods()
+        assert pods
+        for idx, pod in enumerate(pods):
             pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
             pod_container = config.OVS_CNI_CONTAINER
-            pod_object.run_command(command=f"{config.OVS_VSCTL_DEL_BR} {bridge_name_vxlan}", container=pod_container)
-    request.addfinalizer(fin)
+            node_name = pod_object.node()
+            assert pod_object.run_command(
+                command=f"{config.OVS_VSCTL_ADD_BR} {bridge_name_vxlan}", container=pod_container
+            )[0]
+            for name, ip in pytest.nodes_network_info.items():
+                if name != node_name:
+                    assert pod_object.run_command(
+                        command=(
+                            f"{config.OVS_VSCTL_ADD_PORT} {bridge_name_vxlan} vxlan -- "
+                            f"set Interface vxlan type=vxlan options:remote_ip={ip}"
+                        ), container=pod_container
+                    )[0]
+                    break
 
-    pods = get_ovs_cni_pods()
-    assert pods
-    for idx, pod in enumerate(pods):
-        pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
-        pod_container = config.OVS_CNI_CONTAINER
-        node_name = pod_object.node()
-        assert pod_object.run_command(
-            command=f"{config.OVS_VSCTL_ADD_BR} {bridge_name_vxlan}", container=pod_container
-        )[0]
-        for name, ip in pytest.nodes_network_info.items():
-            if name != node_name:
-                assert pod_object.run_command(
-                    command=(
-                        f"{config.OVS_CMD} add-port {bridge_name_vxlan} vxlan -- "
-                        f"set Interface vxlan type=vxlan options:remote_ip={ip}"
-                    ), container=pod_container
-                )[0]
-                break
+            assert pod_object.run_command(
+                command=(
+                    f"{config.OVS_VSCTL_ADD_PORT} {bridge_name_vxlan} {vxlan_port} -- "
+                    f"set Interface {vxlan_port} type=internal"
+                ), container=pod_container
+            )[0]
 
-        assert pod_object.run_command(
-            command=(
-                f"{config.OVS_CMD} add-port {bridge_name_vxlan} {vxlan_port} -- "
-                f"set Interface {vxlan_port} type=internal"
-            ), container=pod_container
-        )[0]
+            assert pod_object.run_command(
+                command=f"ip addr replace {config.OVS_NODES_IPS[idx]} dev {vxlan_port}", container=pod_container
+            )[0]
 
-        assert pod_object.run_command(
-            command=f"ip addr add {config.OVS_NODES_IPS[idx]} dev {vxlan_port}", container=pod_container
-        )[0]
+    cluster_setup = sharding.ClusterWideSetup(name="ovs-bridge-vxlan")
+    request.addfinalizer(lambda: cluster_setup.teardown(func=teardown_unless_kept(request=request, func=fin)))
+    cluster_setup.setup(func=setup)
 
 
 @pytest.fixture(scope='module')
@@ -207,57 +205,79 @@ def create_bond(request):
         """
         pods = get_ovs_cni_pods()
         assert pods
+        commands.run_many(
+            commands=[
+                Pod(name=pod, namespace=config.KUBE_SYSTEM_NS).exec_args(
+                    command=f"ip link del {bond_name}", container=config.OVS_CNI_CONTAINER
+                ) for pod in pods
+            ]
+        )
+
+    def setup():
+        """
+        Create BOND on all nodes and attach it to an OVS bridge
+        """
+        pods = get_ovs_cni_pods()
+        assert pods
         for pod in pods:
             pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
+            pod_name = pod
             pod_container = config.OVS_CNI_CONTAINER
-            pod_object.run_command(command=f"ip link del {bond_name}", container=pod_container)
-    request.addfinalizer(fin)
+            bond_commands = [f"ip link set {bond_name} type bond miimon 100 mode active-backup"]
+            #  Left by a --reconcile run
+            if not pod_object.run_command(command=f"ip link show {bond_name}", container=pod_container)[0]:
+                bond_commands.insert(0, f"ip link add {bond_name} type bond")
 
-    bond_commands = [
-        f"ip link add {bond_name} type bond", f"ip link set {bond_name} type bond miimon 100 mode active-backup"
-    ]
-    pods = get_ovs_cni_pods()
-    assert pods
-    for pod in pods:
-        pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
-        pod_name = pod
-        pod_container = config.OVS_CNI_CONTAINER
-        for cmd in bond_commands:
-            assert pod_object.run_command(command=cmd, container=pod_container)[0]
+            for cmd in bond_commands:
+                assert pod_object.run_command(command=cmd, container=pod_container)[0]
+
+            for nic in pytest.active_node_nics[pod_name][1:3]:
+                assert pod_object.run_command(
+                    command=config.IP_LINK_INTERFACE_DOWN.format(interface=nic), container=pod_container
+                )[0]
+
+                assert pod_object.run_command(
+                    command=f"ip link set {nic} master {bond_name}", container=pod_container
+                )[0]
+
+                assert pod_object.run_command(
+                    command=config.IP_LINK_INTERFACE_UP.format(interface=nic), container=pod_container
+                )[0]
 
-        for nic in pytest.active_node_nics[pod_name][1:3]:
             assert pod_object.run_command(
-                command=config.IP_LINK_INTERFACE_DOWN.format(interface=nic), container=pod_container
+                command=config.IP_LINK_INTERFACE_UP.format(interface=bond_name), container=pod_container
             )[0]
 
+            res, out = pod_object.run_command(command=f"ip link show {bond_name}", container=pod_container)
+
+            assert res
+            assert "state UP" in out
+
             assert pod_object.run_command(
-                command=f"ip link set {nic} master {bond_name}", container=pod_container
+                command=f"{config.OVS_VSCTL_ADD_BR} {bond_bridge}", container=pod_container
             )[0]
 
             assert pod_object.run_command(
-                command=config.IP_LINK_INTERFACE_UP.format(interface=nic), container=pod_container
+                command=f"{config.OVS_VSCTL_ADD_PORT} {bond_bridge} {bond_name}", container=pod_container
             )[0]
 
-        assert pod_object.run_command(
-            command=config.IP_LINK_INTERFACE_UP.format(interface=bond_name), container=pod_container
-        )[0]
-
-        res, out = pod_object.run_command(command=f"ip link show {bond_name}", container=pod_container)
-
-        assert res
-        assert "state UP" in out
+    cluster_setup = sharding.ClusterWideSetup(name="bond")
+    request.addfinalizer(lambda: cluster_setup.teardown(func=teardown_unless_kept(request=request, func=fin)))
+    cluster_setup.setup(func=setup)
 
-        assert pod_object.run_command(
-            command=f"{config.OVS_VSCTL_ADD_BR} {bond_bridge}", container=pod_container
-        )[0]
 
-        assert pod_object.run_command(
-            command=f"{config.OVS_VSCTL_ADD_PORT} {bond_bridge} {bond_name}", container=pod_container
-        )[0]
+@pytest.fixture(scope='module')
+def ssh_key():
+    """
+    SSH public key to inject into the VMs, None unless SSH is enabled (console sessions only)
+    """
+    if not config.USE_SSH:
+        return None
+    return ssh.generate_key_pair(private_key_file=config.SSH_KEY_FILE)
 
 
 @pytest.fixture(scope='module')
-def create_vms(request):
+def create_vms(request, ssh_key):
     """
     Create VMs
     """
@@ -271,47 +291,41 @@ def create_vms(request):
             vm_object = VirtualMachine(name=vm, namespace=config.NETWORK_NS)
             if vm_object.get():
                 vm_object.delete(wait=True)
-    request.addfinalizer(fin)
 
+    if not keep_setup(request=request):
+        request.addfinalizer(fin)
+
+    network = "ovs-vlan-net" if pytest.real_nics_env else "ovs-vlan-net-vxlan"
+    builder = vm_spec.VMSpecBuilder(template=config.VM_YAML_TEMPLATE, MULTUS_NETWORK=network)
+    vms_dicts = []
     for vm in vms:
-        vm_object = VirtualMachine(name=vm, namespace=config.NETWORK_NS)
-        network = "ovs-vlan-net" if pytest.real_nics_env else "ovs-vlan-net-vxlan"
-        json_out = utils.get_json_from_template(file_=config.VM_YAML_TEMPLATE, NAME=vm, MULTUS_NETWORK=network)
-        spec = json_out.get('spec').get('template').get('spec')
-        volumes = spec.get('volumes')
-        cloud_init = [i for i in volumes if 'cloudInitNoCloud' in i][0]
-        cloud_init_data = volumes.pop(volumes.index(cloud_init))
-        cloud_init_user_data = cloud_init_data.get('cloudInitNoCloud').get('userData')
-        cloud_init_user_data += (
-            "\nruncmd:\n"
-            "  - nmcli con add type ethernet con-name eth1 ifname eth1\n"
-            "  - nmcli con mod eth1 ipv4.addresses {ip}/24 ipv4.method manual\n"
-            "  - systemctl start qemu-guest-agent\n".format(ip=config.VMS.get(vm).get("ovs_ip"))
-        )
+        runcmd = [
+            "nmcli con add type ethernet con-name eth1 ifname eth1",
+            f"nmcli con mod eth1 ipv4.addresses {config.VMS.get(vm).get('ovs_ip')}/24 ipv4.method manual",
+        ]
         if not pytest.real_nics_env:
-            cloud_init_user_data += "  - ip link set mtu 1450 eth1\n"
+            runcmd.append("ip link set mtu 1450 eth1")
 
+        hooks = [vm_spec.CloudInitSSHKey(public_key=ssh_key)] if ssh_key else []
         if pytest.bond_support_env:
-            interfaces = spec.get('domain').get('devices').get('interfaces')
-            networks = spec.get('networks')
-            bond_bridge_interface = {'bridge': {}, 'name': 'ovs-net-bond'}
-            bond_bridge_network = {'multus': {'networkName': 'ovs-net-bond'}, 'name': 'ovs-net-bond'}
-            interfaces.append(bond_bridge_interface)
-            networks.append(bond_bridge_network)
-            cloud_init_user_data += (
-                "  - nmcli con add type ethernet con-name eth1 ifname eth2\n"
-                "  - nmcli con mod eth2 ipv4.addresses {ip}/24 ipv4.method manual\n".format(
-                    ip=config.VMS.get(vm).get("bond_ip")
-                )
-            )
-            spec['domain']['devices']['interfaces'] = interfaces
-            spec['networks'] = networks
+            hooks.append(vm_spec.MultusNetwork(name="ovs-net-bond"))
+            runcmd += [
+                "nmcli con add type ethernet con-name eth2 ifname eth2",
+                f"nmcli con mod eth2 ipv4.addresses {config.VMS.get(vm).get('bond_ip')}/24 ipv4.method manual",
+            ]
+
+        hooks.append(vm_spec.CloudInitRunCmd(commands=runcmd))
+        vms_dicts.append(builder.build(name=vm, hooks=hooks))
 
-        cloud_init_data['cloudInitNoCloud']['userData'] = cloud_init_user_data
-        volumes.append(cloud_init_data)
-        spec['volumes'] = volumes
-        json_out['spec']['template']['spec'] = spec
-        assert vm_object.create(resource_dict=json_out, wait=True)
+    if keep_setup(request=request):
+        reconcile_vms(vms=vms_dicts)
+        return
+
+    errors = dict(
+        (name, error) for name, error in create_many(vms=vms_dicts, namespace=config.NETWORK_NS, wait=True).items()
+        if error is not None
+    )
+    assert not errors, errors
 
 
 @pytest.fixture(scope='module')
@@ -319,14 +333,28 @@ def wait_for_vms_status(request):
     """
     Wait until VMs report guest agant data
     """
-    for vmi in config.VMS_LIST:
-        vmi_object = VirtualMachineInstance(name=vmi, namespace=config.NETWORK_NS)
-        assert vmi_object.wait_for_status(status=types.RUNNING)
-        wait_for_vm_interfaces(vmi=vmi_object)
-        vmi_data = vmi_object.get()
-        ifcs = vmi_data.get('status', {}).get('interfaces', [])
-        active_ifcs = [i.get('ipAddress') for i in ifcs if i.get('interfaceName') == "eth0"]
-        config.VMS[vmi]["pod_ip"] = active_ifcs[0].split("/")[0]
+    #  All VMs boot in parallel, nested waits share one budget
+    with utils.Deadline(timeout=config.VMS_BOOT_TIMEOUT):
+        for vmi in config.VMS_LIST:
+            vmi_object = VirtualMachineInstance(name=vmi, namespace=config.NETWORK_NS)
+            assert vmi_object.wait_for_status(status=types.RUNNING)
+            wait_for_vm_interfaces(vmi=vmi_object)
+            pod_ip = vmi_object.view().ip_address(interface_name="eth0")
+            assert pod_ip, f"VMI {vmi} did not report eth0 IP"
+            config.VMS[vmi]["pod_ip"] = pod_ip
+
+
+@pytest.fixture(scope='module')
+def boot_scale_vms(
+    create_networks_from_yaml, is_bare_metal, create_ovs_bridges_real_nics, create_ovs_bridge_on_vxlan
+):
+    """
+    Build the VMs specs, the template is processed before the benchmark starts
+    """
+    network = "ovs-vlan-net" if pytest.real_nics_env else "ovs-vlan-net-vxlan"
+    names = [f"{config.BOOT_SCALE_VM_PREFIX}-{idx}" for idx in range(config.BOOT_SCALE_VMS)]
+    builder = vm_spec.VMSpecBuilder(template=config.VM_YAML_TEMPLATE, MULTUS_NETWORK=network)
+    return dict((name, builder.build(name=name)) for name in names)
 
 
 @pytest.fixture(scope='module', autouse=True)
@@ -348,6 +376,35 @@ def prepare_env(
     pass
 
 
+def keep_setup(request):
+    """
+    Returns:
+        bool: True to reconcile the setup left by the previous run and keep it for the next one (--reconcile).
+    """
+    return request.config.getoption("--reconcile")
+
+
+def teardown_unless_kept(request, func):
+    """
+    Returns:
+        function: func, or a no-op to keep the setup (--reconcile).
+    """
+    return (lambda: None) if keep_setup(request=request) else func
+
+
+def reconcile_vms(vms):
+    """
+    Create missing VMs, patch changed ones and restart their VMIs to pick up the change
+
+    Args:
+        vms (list): VM dicts.
+    """
+    for vm in vms:
+        name = vm['metadata']['name']
+        if VirtualMachine(name=name, namespace=config.NETWORK_NS).reconcile(resource_dict=vm, wait=True) == UPDATED:
+            VirtualMachineInstance(name=name, namespace=config.NETWORK_NS).delete(wait=True)
+
+
 @generate_logs()
 def wait_for_pods_to_match_compute_nodes_number(number_of_nodes):
     """
@@ -371,6 +428,69 @@ def wait_for_pods_to_match_compute_nodes_number(number_of_nodes):
             return True
 
 
+def get_active_node_nics():
+    """
+    Get nodes active NICs (besides the default gateway NIC) and check if they are real NICs
+
+    Returns:
+        dict: active_node_nics (ovs-cni pod name: NICs list), real_nics_env (bool), nic_driver (str).
+    """
+    active_node_nics = {}
+    real_nics_env = False
+    nic_driver = None
+    pods = get_ovs_cni_pods()
+    assert pods
+    for idx, pod in enumerate(pods):
+        pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
+        pod_container = config.OVS_CNI_CONTAINER
+        active_node_nics[pod] = []
+        assert pod_object.wait_for_status(status=types.RUNNING)
+        err, nics = pod_object.run_command(command=config.GET_NICS_CMD, container=pod_container)
+        assert err
+        nics = nics.splitlines()
+        err, default_gw = pod_object.run_command(command="ip route show default", container=pod_container)
+        assert err
+        for nic in nics:
+            err, nic_state = pod_object.run_command(
+                command=f"cat /sys/class/net/{nic}/operstate", container=pod_container
+            )
+            assert err
+            if nic_state.strip() == "up":
+                if nic in [i for i in default_gw.splitlines() if 'default' in i][0]:
+                    continue
+
+                active_node_nics[pod].append(nic)
+
+                err, driver = pod_object.run_command(
+                    command=config.CHECK_NIC_DRIVER_CMD.format(nic=nic), container=pod_container
+                )
+                assert err
+                nic_driver = driver.strip()
+                real_nics_env = nic_driver != "virtio_net"
+    return {"active_node_nics": active_node_nics, "real_nics_env": real_nics_env, "nic_driver": nic_driver}
+
+
+def get_perf_environment(vm):
+    """
+    Get the environment identity performance results are compared by
+
+    Args:
+        vm (str): VM name, its container disk image is the guest image.
+
+    Returns:
+        dict: cluster (API server and version), nic_driver, guest_image.
+    """
+    vm_object = VirtualMachine(name=vm, namespace=config.NETWORK_NS)
+    volumes = vm_object.get().spec.template.spec.volumes
+    images = [i.containerDisk.image for i in volumes if i.containerDisk]
+    version = vm_object.client.version.get('kubernetes', {}).get('gitVersion')
+    return {
+        "cluster": f"{vm_object.client.client.configuration.host}/{version}",
+        "nic_driver": pytest.nic_driver,
+        "guest_image": images[0] if images else None,
+    }
+
+
 def get_ovs_cni_pods():
     """
     Get ovs-cni pods names
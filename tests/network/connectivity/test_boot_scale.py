@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""
+VM boot time and time to network at scale
+"""
+import logging
+import time
+
+import pytest
+
+from utilities import boot_benchmark, network_benchmark
+
+from . import config
+from .fixtures import (  # noqa: F401
+    boot_scale_vms, create_networks_from_yaml, create_ovs_bridge_on_vxlan, create_ovs_bridges_real_nics,
+    is_bare_metal
+    )
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.mark.benchmark
+class TestBootScale(object):
+    """
+    VM boot time and time to network at scale
+    """
+    def test_boot_scale(self, boot_scale_vms):  # noqa: F811
+        """
+        Create VMs at a fixed rate, report per boot phase percentiles and VMs per minute
+        """
+        benchmark = boot_benchmark.BootScaleBenchmark(
+            namespace=config.NETWORK_NS, vms=boot_scale_vms, rate=config.BOOT_SCALE_RATE
+        )
+        try:
+            report = benchmark.run(timeout=config.BOOT_SCALE_TIMEOUT)
+        finally:
+            assert benchmark.teardown()
+
+        for phase, stats in report['phases'].items():
+            LOGGER.info(f"{phase}: {stats}")
+        LOGGER.info(f"VMs per minute: {report['vms_per_minute']}")
+        network_benchmark.ResultsWriter(path=config.BENCHMARK_RESULTS_FILE).write(
+            records=[dict(report, benchmark='boot_scale', run_id=config.RUN_ID, timestamp=time.time())]
+        )
+        assert not report['errors'], report['errors']
+        assert report['phases'][boot_benchmark.IP_REPORTED]['count'] == len(boot_scale_vms), report
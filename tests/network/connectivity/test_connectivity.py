@@ -3,23 +3,21 @@
 """
 VM to VM connectivity
 """
-import json
 import logging
 
-import bitmath
 import pytest
-from autologs.autologs import generate_logs
 
 from resources.pod import Pod
 from resources.virtual_machine import VirtualMachine
-from utilities import console, utils
+from resources.virtual_machine_instance import VirtualMachineInstance
+from utilities import connectivity_matrix, guest, latency, network_benchmark, node_agent, perf_baseline, utils
 
 from . import config
 from .fixtures import (  # noqa: F401
     create_bond, create_networks_from_yaml,
     create_ovs_bridge_on_vxlan,
     create_ovs_bridges_real_nics, create_vms,
-    get_node_internal_ip, get_ovs_cni_pods, is_bare_metal,
+    get_node_internal_ip, get_ovs_cni_pods, get_perf_environment, is_bare_metal,
     is_bond_supported, prepare_env, wait_for_vms_status
     )
 
@@ -61,39 +59,177 @@ class TestConnectivity(object):
         LOGGER.info(_id)
         positive = ip != 'non_vlan_ip'
         dst_ip = config.VMS.get(self.dst_vm).get(ip) if positive else config.OVS_NODES_IPS[0]
-        with console.Console(vm=self.src_vm, distro='fedora', namespace=config.NETWORK_NS) as src_vm_console:
-            src_vm_console.sendline('ping -w 3 {ip}'.format(ip=dst_ip))
-            src_vm_console.sendline('echo $?')
-            src_vm_console.expect('0' if positive else '1')
+        with vm_session(vm=self.src_vm) as src_vm_session:
+            result = src_vm_session.run(command=f'ping -w 3 {dst_ip}')
+        if positive:
+            assert result.ok, f"{result}: {result.stdout}"
+        else:
+            #  ping exits with 1 when no reply was received, other failures (127, 2) are not "unreachable"
+            assert result.rc == 1 and " 0 received" in result.stdout, f"{result}: {result.stdout}"
 
 
+class TestConnectivityMatrix(object):
+    """
+    Test all VMs pairs connectivity over all networks
+    """
+    def test_connectivity_matrix(self):
+        """
+        Check every ordered VMs pair on every network concurrently and report the failing node pairs
+        """
+        networks = [i for i in config.MATRIX_NETWORKS if i != 'bond_ip' or pytest.bond_support_env]
+        #  The node of a VM is on its VMI
+        nodes = dict(
+            (vm, VirtualMachineInstance(name=vm, namespace=config.NETWORK_NS).view().node_name)
+            for vm in config.VMS_LIST
+        )
+        vms = dict((vm, dict(config.VMS[vm], node=nodes[vm])) for vm in config.VMS_LIST)
+        matrix = connectivity_matrix.ConnectivityMatrix(
+            vms=vms,
+            networks=networks,
+            session=lambda vm: vm_session(vm=vm),
+            probe=connectivity_matrix.ping_probe,
+            per_source=config.MATRIX_PER_SOURCE_CONCURRENCY
+        )
+        results = matrix.run()
+        LOGGER.info(f"Connectivity matrix:\n{connectivity_matrix.render(results=results, vms=config.VMS_LIST)}")
+        failing = connectivity_matrix.failing_node_pairs(results=results, vms=vms)
+        assert not failing, f"Failing (network, source node, destination node): (failed, total) {failing}"
+
+
+@pytest.mark.benchmark
 class TestGuestPerformance(object):
     """
     In-guest performance bandwidth passthrough
     """
-    def test_guest_performance(self):
+    @pytest.mark.parametrize(
+        'network',
+        [
+            pytest.param('pod'),
+            pytest.param('ovs'),
+            pytest.param('bond')
+        ],
+        ids=[
+            'Guest_network_benchmark_over_POD_network',
+            'Guest_network_benchmark_over_Multus_with_OVS_network',
+            'Guest_network_benchmark_over_Multus_with_OVS_on_BOND_network'
+        ]
+    )
+    def test_guest_performance(self, network):
         """
         In-guest performance bandwidth passthrough
+
+        Run the iperf3 benchmark matrix (TCP/UDP, streams, directions, message sizes), store the results and
+        fail on throughput regressions against the results history of the same environment.
+        """
+        if network == 'bond' and not pytest.bond_support_env:
+            pytest.skip(msg='No BOND support')
+
+        _id = utils.get_test_parametrize_ids(item=self.test_guest_performance.pytestmark, params=network)
+        LOGGER.info(_id)
+        network_type = 'vxlan' if network == 'ovs' and not pytest.real_nics_env else network
+        server_vm = config.VMS_LIST[0]
+        client_vm = config.VMS_LIST[1]
+        server_ip = config.VMS.get(server_vm).get(f'{network}_ip')
+        runs = network_benchmark.benchmark_matrix(
+            protocols=config.BENCHMARK_PROTOCOLS,
+            streams=config.BENCHMARK_STREAMS,
+            directions=config.BENCHMARK_DIRECTIONS,
+            message_sizes=config.BENCHMARK_MESSAGE_SIZES,
+            duration=config.BENCHMARK_DURATION
+        )
+        with vm_session(vm=server_vm) as server_vm_session:
+            assert server_vm_session.run(command='iperf3 -s -D').ok
+            with vm_session(vm=client_vm) as client_vm_session:
+                benchmark = network_benchmark.GuestNetworkBenchmark(
+                    run_json=lambda cmd: client_vm_session.run_json(
+                        command=cmd, timeout=config.BENCHMARK_DURATION + 60
+                    ),
+                    network=network_type,
+                    server_ip=server_ip,
+                    repeats=config.BENCHMARK_REPEATS,
+                    labels={'run_id': config.RUN_ID, 'server_vm': server_vm, 'client_vm': client_vm}
+                )
+                summaries = benchmark.run(runs=runs)
+            server_vm_session.run(command='pkill iperf3')
+
+        network_benchmark.ResultsWriter(path=config.BENCHMARK_RESULTS_FILE).write(
+            records=benchmark.records + summaries
+        )
+        regressions = check_perf_regressions(
+            environment=dict(get_perf_environment(vm=client_vm), network=network_type),
+            samples=dict(
+                (f"{run}-bits_per_second", [i['bits_per_second'] for i in benchmark.records if i['run'] == repr(run)])
+                for run in runs
+            )
+        )
+        assert not regressions, regressions
+
+
+@pytest.mark.benchmark
+class TestLatency(object):
+    """
+    VM to VM latency and packet loss
+    """
+    @pytest.mark.parametrize(
+        'network',
+        [
+            pytest.param('pod'),
+            pytest.param('ovs'),
+            pytest.param('bond')
+        ],
+        ids=[
+            'Latency_between_VM_and_VM_over_POD_network',
+            'Latency_between_VM_and_VM_over_Multus_with_OVS_network',
+            'Latency_between_VM_and_VM_over_Multus_with_OVS_on_BOND_network'
+        ]
+    )
+    def test_latency(self, network):
+        """
+        VM to VM latency and packet loss
+
+        Run ping, flood ping and UDP request/response probes, store the p50/p99 latency and loss and check them
+        against the network type thresholds.
         """
-        if not pytest.real_nics_env:
-            pytest.skip(msg='Only run on bare metal env')
+        if network == 'bond' and not pytest.bond_support_env:
+            pytest.skip(msg='No BOND support')
 
+        _id = utils.get_test_parametrize_ids(item=self.test_latency.pytestmark, params=network)
+        LOGGER.info(_id)
+        network_type = 'vxlan' if network == 'ovs' and not pytest.real_nics_env else network
         server_vm = config.VMS_LIST[0]
         client_vm = config.VMS_LIST[1]
-        server_ip = config.VMS.get(server_vm).get('ovs_ip')
-        with console.Console(vm=server_vm, distro='fedora', namespace=config.NETWORK_NS) as server_vm_console:
-            server_vm_console.sendline('iperf3 -sB {server_ip}'.format(server_ip=server_ip))
-            with console.Console(vm=client_vm, distro='fedora', namespace=config.NETWORK_NS) as client_vm_console:
-                client_vm_console.sendline('iperf3 -c {server_ip} -t 5 -u -J'.format(server_ip=server_ip))
-                client_vm_console.expect('}\r\r\n}\r\r\n')
-                iperf_data = client_vm_console.before
-            server_vm_console.sendline(chr(3))  # Send ctrl+c to kill iperf3 server
-
-        iperf_data += '}\r\r\n}\r\r\n'
-        iperf_json = json.loads(iperf_data[iperf_data.find('{'):])
-        sum_sent = iperf_json.get('end').get('sum')
-        bits_per_second = int(sum_sent.get('bits_per_second'))
-        assert float(bitmath.Byte(bits_per_second).GiB) >= 2.5
+        server_ip = config.VMS.get(server_vm).get(f'{network}_ip')
+        commands = [
+            latency.ping_command(ip=server_ip, count=config.LATENCY_PING_COUNT, interval=config.LATENCY_PING_INTERVAL),
+            latency.ping_command(ip=server_ip, count=config.LATENCY_FLOOD_COUNT, flood=True),
+            latency.netperf_rr_command(ip=server_ip, duration=config.LATENCY_RR_DURATION),
+        ]
+        timeout = 2 * config.LATENCY_PING_COUNT * config.LATENCY_PING_INTERVAL + config.LATENCY_RR_DURATION + 180
+        with vm_session(vm=server_vm) as server_vm_session:
+            assert server_vm_session.run(command='netserver').ok
+            with vm_session(vm=client_vm) as client_vm_session:
+                ping, flood, udp_rr = client_vm_session.run_batch(commands=commands, timeout=timeout)
+            server_vm_session.run(command='pkill netserver')
+
+        results = [
+            latency.LatencyResult.from_ping(output=ping.stdout),
+            latency.LatencyResult.from_ping(output=flood.stdout, flood=True),
+            latency.LatencyResult.from_netperf_rr(output=udp_rr.stdout),
+        ]
+
+        LOGGER.info(f"{network_type} ping RTT histogram:\n{latency.render_histogram(values=results[0].rtts)}")
+        labels = {'run_id': config.RUN_ID, 'server_vm': server_vm, 'client_vm': client_vm, 'network': network_type}
+        network_benchmark.ResultsWriter(path=config.BENCHMARK_RESULTS_FILE).write(
+            records=[dict(labels, **result.as_dict()) for result in results]
+        )
+        violations = []
+        for result in results:
+            LOGGER.info(f"{network_type} {result}")
+            violations.extend(
+                latency.check_thresholds(result=result, thresholds=config.LATENCY_THRESHOLDS.get(network_type))
+            )
+        assert results[0].received, f"{network_type}: no ping replies from {server_ip}"
+        assert not violations, violations
 
 
 class TestVethRemovedAfterVmsDeleted(object):
@@ -103,46 +239,109 @@ class TestVethRemovedAfterVmsDeleted(object):
     def test_veth_removed_from_host_after_vm_deleted(self):
         """
         Check that veth interfaces are removed from host after VM deleted
+
+        The host side veth peers of the VM virt-launcher pod interfaces are tracked by ifindex, a node agent in the
+        ovs-cni pod of the VM node streams the netlink link deletions.
         """
+        pods = get_ovs_cni_pods()
+        assert pods
+        pods_nodes = dict((Pod(name=pod, namespace=config.KUBE_SYSTEM_NS).node(), pod) for pod in pods)
         for vm in config.VMS_LIST:
             vm_object = VirtualMachine(name=vm, namespace=config.NETWORK_NS)
-            vm_info = vm_object.get()
-            vm_interfaces = vm_info.get('status', {}).get('interfaces', [])
-            vm_node = vm_object.node()
-            pods = get_ovs_cni_pods()
-            assert pods
-            for pod in pods:
-                pod_object = Pod(name=pod, namespace=config.KUBE_SYSTEM_NS)
-                pod_container = config.OVS_CNI_CONTAINER
-                pod_node = pod_object.node()
-                if pod_node == vm_node:
-                    err, out = pod_object.run_command(
-                        command=config.IP_LINK_SHOW_BETH_CMD, container=pod_container
-                    )
-                    assert err
-                    host_vath_before_delete = int(out.strip())
-                    assert vm_object.delete(wait=True)
-                    expect_host_veth = host_vath_before_delete - len(vm_interfaces)
-
-                    sampler = utils.TimeoutSampler(
-                        timeout=30, sleep=1, func=get_host_veth_sampler,
-                        pod=pod_object, pod_container=pod_container, expect_host_veth=expect_host_veth
-                    )
-                    sampler.wait_for_func_status(result=True)
-
-
-@generate_logs()
-def get_host_veth_sampler(pod, pod_container, expect_host_veth):
-    """
-    Wait until host veth are equal to expected veth number
+            #  Read before the delete, the VMI (which holds the node) goes with the VM
+            vm_node = VirtualMachineInstance(name=vm, namespace=config.NETWORK_NS).view().node_name
+            host_veths = get_vm_host_veths(vm=vm)
+            assert host_veths, f"{vm}: no veth interfaces in virt-launcher pod"
+            with node_agent.NodeAgent(
+                pod=pods_nodes[vm_node], namespace=config.KUBE_SYSTEM_NS, container=config.OVS_CNI_CONTAINER
+            ) as agent:
+                cursor = agent.cursor()
+                assert vm_object.delete()
+                events = agent.wait_for_all(
+                    predicates=[
+                        lambda event, ifindex=ifindex: (
+                            event.get("source") == node_agent.LINK and event.get("event") == "del"
+                            and event.get("ifindex") == ifindex
+                        )
+                        for ifindex in host_veths
+                    ],
+                    timeout=config.VETH_REMOVED_TIMEOUT,
+                    since=cursor
+                )
+                for event in events:
+                    LOGGER.info(f"{vm_node}: {event['name']} (ifindex {event['ifindex']}) removed")
+
+
+def vm_session(vm):
+    """
+    Guest session to a VM, over SSH to its pod IP when enabled (config.USE_SSH), else over its console
+
+    Args:
+        vm (str): VM name.
+
+    Returns:
+        object: Guest session context manager (see guest.session()).
+    """
+    return guest.session(
+        vm=vm, namespace=config.NETWORK_NS, host=config.VMS[vm]["pod_ip"],
+        key_filename=config.SSH_KEY_FILE if config.USE_SSH else None,
+        proxy_command=config.SSH_PROXY_COMMAND
+    )
+
+
+def get_vm_host_veths(vm):
+    """
+    Get the host side ifindexes of the VM virt-launcher pod veth interfaces
+
+    A veth iflink is its peer ifindex, pod interfaces whose iflink differs from their ifindex are veths.
 
     Args:
-        pod (Pod): Pod object.
-        pod_container (str): Pod container name.
-        expect_host_veth (int): Expected number of veth on the host.
+        vm (str): VM name.
 
     Returns:
-        bool: True if current veth number == expected veth number, False otherwise.
+        list: Host veth ifindexes.
     """
-    out = pod.run_command(command=config.IP_LINK_SHOW_BETH_CMD, container=pod_container)[1]
-    return int(out.strip()) == expect_host_veth
+    launcher = Pod().list(
+        get_names=True, namespace=config.NETWORK_NS, label_selector=f"{config.VM_DOMAIN_LABEL}={vm}"
+    )[0]
+    ok, out = Pod(name=launcher, namespace=config.NETWORK_NS).run_command(
+        command=config.POD_IFLINKS_CMD, container=config.VIRT_LAUNCHER_CONTAINER
+    )
+    assert ok, out
+    host_veths = []
+    for line in out.splitlines():
+        ifindex, iflink = line.split()
+        if ifindex != iflink:
+            host_veths.append(int(iflink))
+    return host_veths
+
+
+def check_perf_regressions(environment, samples, higher_is_better=True):
+    """
+    Compare performance samples with their baseline and add them to the results history
+
+    Args:
+        environment (dict): Environment identity (see get_perf_environment()) plus network type.
+        samples (dict): Metric name: current run samples.
+        higher_is_better (bool): False for metrics like latency.
+
+    Returns:
+        list: RegressionResult of the regressed metrics.
+    """
+    store = perf_baseline.BaselineStore(path=config.PERF_BASELINE_DB)
+    fingerprint = perf_baseline.fingerprint(**environment)
+    regressions = []
+    for metric, values in samples.items():
+        result = perf_baseline.detect_regression(
+            metric=metric,
+            current=values,
+            baseline=store.baseline(fingerprint_=fingerprint, metric=metric, exclude_run_id=config.RUN_ID),
+            higher_is_better=higher_is_better
+        )
+        LOGGER.info(result)
+        if result.regressed:
+            regressions.append(result)
+        store.add(fingerprint_=fingerprint, metric=metric, values=values, run_id=config.RUN_ID)
+
+    LOGGER.info(f"Performance trend:\n{perf_baseline.trend_report(store=store, fingerprint_=fingerprint)}")
+    return regressions
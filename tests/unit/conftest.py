@@ -0,0 +1,57 @@
+import pexpect
+import pytest
+
+from resources.cluster import ClusterContext
+from utilities.fake_apiserver import FakeAPIServer
+
+
+class FakeChild(object):
+    """
+    pexpect child replaying output chunks, a callable chunk gets the last sent line
+    """
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.sent = []
+
+    def sendline(self, line):
+        self.sent.append(line)
+
+    def read_nonblocking(self, size, timeout):
+        if not self.chunks:
+            raise pexpect.TIMEOUT("no more output")
+        chunk = self.chunks.pop(0)
+        if callable(chunk):
+            chunk = chunk(self.sent[-1])
+        return chunk
+
+
+@pytest.fixture(scope="session", autouse=True)
+def init():
+    """
+    Unit tests run without a cluster, no test namespaces
+    """
+
+
+@pytest.fixture()
+def fake_server():
+    """
+    Local fake API server
+    """
+    with FakeAPIServer() as server:
+        yield server
+
+
+@pytest.fixture()
+def fake_context(tmp_path, fake_server):
+    """
+    Cluster context of the fake API server
+    """
+    return ClusterContext(kubeconfig=fake_server.write_kubeconfig(path=str(tmp_path / "kubeconfig")), name="fake")
+
+
+@pytest.fixture()
+def fake_child():
+    """
+    FakeChild class, console streams without a VM
+    """
+    return FakeChild
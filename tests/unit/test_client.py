@@ -0,0 +1,66 @@
+import threading
+import time
+
+from resources.client import SingleFlight, TokenBucket
+
+
+def test_token_bucket_rate():
+    """
+    The burst is served at once, the next tokens at the qps rate
+    """
+    bucket = TokenBucket(qps=20, burst=3)
+    assert max(bucket.acquire() for _ in range(3)) < 0.01
+    assert 0.02 < bucket.acquire() < 0.5
+
+
+def test_token_bucket_writes_first():
+    """
+    A write arriving while a read waits for a token gets the next token first
+    """
+    bucket = TokenBucket(qps=10, burst=1)
+    bucket.acquire()
+    order = []
+
+    def _acquire(write):
+        bucket.acquire(write=write)
+        order.append("write" if write else "read")
+
+    reader = threading.Thread(target=_acquire, args=(False,))
+    writer = threading.Thread(target=_acquire, args=(True,))
+    reader.start()
+    time.sleep(0.02)
+    writer.start()
+    reader.join()
+    writer.join()
+
+    assert order == ["write", "read"]
+
+
+def test_single_flight_shares_result():
+    """
+    Concurrent calls with the same key run once, the waiters get the leader result
+    """
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def _call():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do(key="list", func=_call)))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=lambda: results.append(flight.do(key="list", func=_call)))
+    follower.start()
+    time.sleep(0.02)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False), ("result", True)]
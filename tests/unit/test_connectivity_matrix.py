@@ -0,0 +1,67 @@
+import contextlib
+
+from utilities import connectivity_matrix
+
+VMS = {
+    "vm-1": {"node": "node-1", "ovs_ip": "192.168.0.1"},
+    "vm-2": {"node": "node-2", "ovs_ip": "192.168.0.2"},
+    "vm-3": {"node": "node-2", "ovs_ip": "192.168.0.3"},
+}
+
+
+class Sessions(object):
+    """
+    Guest sessions factory recording opened and closed sessions
+    """
+    def __init__(self):
+        self.opened = []
+        self.closed = []
+
+    @contextlib.contextmanager
+    def __call__(self, vm):
+        session = f"{vm}-{len(self.opened)}"
+        self.opened.append(session)
+        try:
+            yield session
+        finally:
+            self.closed.append(session)
+
+
+def test_session_dropped_after_probe_error():
+    """
+    A session whose probe raised is closed, the next probe of the source gets a new one
+    """
+    sessions = Sessions()
+    broken = set()
+
+    def probe(session, dst_ip):
+        if session in broken:
+            raise ConnectionError("session is broken")
+        if dst_ip == VMS["vm-2"]["ovs_ip"]:
+            broken.add(session)
+            raise ConnectionError("connection dropped")
+        return True, 0.5
+
+    matrix = connectivity_matrix.ConnectivityMatrix(
+        vms={"vm-1": VMS["vm-1"], "vm-2": VMS["vm-2"]}, networks=["ovs_ip"], session=sessions, probe=probe
+    )
+    pool = connectivity_matrix.SessionPool(session=sessions)
+    results = [matrix._check(pool, "ovs_ip", "vm-1", dst) for dst in ("vm-2", "vm-2", "vm-2")]
+    results.append(matrix._check(pool, "ovs_ip", "vm-2", "vm-1"))
+    results.append(matrix._check(pool, "ovs_ip", "vm-2", "vm-1"))
+    pool.close()
+
+    assert [i.ok for i in results] == [False, False, False, True, True]
+    assert all("connection dropped" in i.error for i in results[:3])
+    assert sessions.opened == ["vm-1-0", "vm-1-1", "vm-1-2", "vm-2-3"]
+    assert sorted(sessions.closed) == sorted(sessions.opened)
+
+
+def test_failing_node_pairs():
+    results = [
+        connectivity_matrix.PairResult(src=src, dst=dst, network="ovs_ip", ok=dst != "vm-1")
+        for src in VMS for dst in VMS if src != dst
+    ]
+    assert connectivity_matrix.failing_node_pairs(results=results, vms=VMS) == {
+        ("ovs_ip", "node-2", "node-1"): (2, 2),
+    }
@@ -0,0 +1,30 @@
+import re
+
+from utilities import console
+
+
+def markers(line):
+    """
+    Returns:
+        dict: Command index: END marker of a framed commands line, without the empty quotes splitting it.
+    """
+    return dict(
+        (int(idx), marker.replace("''", "") + f"_{idx}") for marker, idx in re.findall(r"(CNV''\w+?)_(\d+)_END", line)
+    )
+
+
+def test_run_framed_exit_codes_split_across_reads(fake_child):
+    def begin(idx):
+        return lambda line: f"{markers(line)[idx]}_BEGIN\r\n"
+
+    child = fake_child(chunks=[
+        begin(0), "bash: foo: command not found\r\n", lambda line: f"{markers(line)[0]}_END:1", "27\r\n",
+        begin(1), "64 bytes from 10.0.0.1\r\n", lambda line: f"{markers(line)[1]}_END:", "0\r\n",
+    ])
+    outputs = [[], []]
+    results = console.run_framed(
+        child=child, commands=["foo", "ping -c 1 10.0.0.1"], sinks=[i.append for i in outputs], timeout=5
+    )
+    assert [rc for rc, _ in results] == [127, 0]
+    assert "".join(outputs[0]) == "bash: foo: command not found\r\n"
+    assert "".join(outputs[1]) == "64 bytes from 10.0.0.1\r\n"
@@ -0,0 +1,48 @@
+import threading
+import time
+
+import pytest
+
+from utilities import diagnostics
+
+
+@pytest.mark.parametrize(
+    "name, text, expected",
+    [
+        ("vm-fedora-1", "VMI vm-fedora-1 did not start", True),
+        ("vm-fedora-1", "Guest agent of vm-fedora-1: not connected", True),
+        ("vm-fedora-1", "VMI vm-fedora-10 did not start", False),
+        ("vm-fedora-1", "VMI my-vm-fedora-1 did not start", False),
+        ("vm-fedora-1", "cnv-network-ns/vm-fedora-1.", True),
+    ]
+)
+def test_named_in(name, text, expected):
+    assert diagnostics.named_in(name=name, text=text) is expected
+
+
+def test_launcher_logs_followed_outside_watcher_callback(monkeypatch):
+    """
+    A VMI phase callback (run under the watcher lock) only queues the log follower start
+    """
+    collector = diagnostics.ClusterEventsCollector(follow_logs=True)
+    release = threading.Event()
+    started = []
+
+    def add_logs(**kwargs):
+        release.wait(timeout=10)
+        started.append(kwargs)
+
+    monkeypatch.setattr(collector, "add_logs", add_logs)
+    collector.start(namespaces=[])
+    vmi = {"metadata": {"name": "vm-1", "namespace": "ns", "uid": "uid-1"}, "status": {"phase": "Scheduled"}}
+    start = time.monotonic()
+    collector._on_vmi(event_type="MODIFIED", obj=vmi, timestamp=time.time())
+    assert time.monotonic() - start < 1
+    assert [i.text for i in collector.buffer.slice(start=0, end=time.time())] == ["phase - -> Scheduled"]
+
+    release.set()
+    collector.stop()
+    assert started == [{
+        "namespace": "ns", "selector": "kubevirt.io/created-by=uid-1", "container": diagnostics.LAUNCHER_CONTAINER,
+        "tail": -1,
+    }]
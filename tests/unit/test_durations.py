@@ -0,0 +1,55 @@
+import types
+
+from utilities import durations
+
+NODEID = "tests/network/connectivity/test_connectivity.py::test_ping[bridge@vlan]"
+GROUP = f"{durations.XDIST_GROUP_PREFIX}-1"
+
+
+def test_base_nodeid():
+    assert durations.base_nodeid(nodeid=f"{NODEID}@{GROUP}") == NODEID
+    #  "@" inside the parameters id is kept
+    assert durations.base_nodeid(nodeid=NODEID) == NODEID
+
+
+def test_loadgroup_reports_known_on_next_run(tmp_path):
+    """
+    Durations recorded from --dist loadgroup reports (suffixed node ids) are found by the next run collection
+    """
+    store = durations.DurationsStore(path=str(tmp_path / "durations.sqlite"))
+    plugin = durations.DurationsPlugin(config=types.SimpleNamespace(), store=store, run_id="run-1")
+    plugin.pytest_runtest_logreport(report=types.SimpleNamespace(nodeid=f"{NODEID}@{GROUP}", duration=42.0))
+    plugin.pytest_sessionfinish(session=None, exitstatus=0)
+
+    test_estimates = store.estimates(kind=durations.TEST)
+    assert test_estimates == {NODEID: ("function", 42.0)}
+    modules = durations.predict_modules(nodeids=[NODEID], test_estimates=test_estimates)
+    assert modules == {durations.module_of(nodeid=NODEID): 42.0}
+    assert plugin._prediction_lines(nodeids=[f"{NODEID}@{GROUP}"], workers=1)[0].startswith(
+        "durations history: 1/1 tests known"
+    )
+
+
+def test_predict_modules_unknown_tests_get_median():
+    """
+    Tests without history count the median of the known tests, modules longest first
+    """
+    test_estimates = {"a.py::t1": ("function", 10.0), "a.py::t2": ("function", 30.0), "b.py::t1": ("function", 50.0)}
+    modules = durations.predict_modules(
+        nodeids=["a.py::t1", "a.py::t2", "b.py::t1", "c.py::t1"], test_estimates=test_estimates
+    )
+    assert list(modules.items()) == [("b.py", 50.0), ("a.py", 40.0), ("c.py", 30.0)]
+
+
+def test_balance_longest_processing_time_first():
+    """
+    Whole modules go to the least loaded worker, longest first
+    """
+    modules = {"a.py": 50.0, "b.py": 40.0, "c.py": 30.0, "d.py": 20.0, "e.py": 10.0}
+    assignment, loads = durations.balance(modules=modules, workers=2)
+    assert assignment == {"a.py": 0, "b.py": 1, "c.py": 1, "d.py": 0, "e.py": 0}
+    assert loads == [80.0, 70.0]
+
+    assignment, loads = durations.balance(modules={"a.py": 5.0}, workers=3)
+    assert assignment == {"a.py": 0}
+    assert loads == [5.0, 0.0, 0.0]
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+from resources import client
+from resources.pod import Pod
+from utilities import fake_apiserver
+
+THREADS = 16
+VIEWS = 3
+POD = "coalesced-pod"
+NAMESPACE = "default"
+
+
+@pytest.fixture()
+def fake_cluster(fake_server, fake_context, monkeypatch):
+    """
+    Fake cluster with one pod, its GETs of the pod are slow enough for concurrent views to be coalesced
+    """
+    do_get = fake_apiserver._Handler.do_GET
+
+    def slow_get(handler):
+        if f"/pods/{POD}" in handler.path:
+            time.sleep(0.2)
+        do_get(handler)
+
+    monkeypatch.setattr(fake_apiserver._Handler, "do_GET", slow_get)
+    fake_server.add(resource=fake_apiserver.RESOURCES[0], obj={"metadata": {"name": NAMESPACE}})
+    fake_server.add(
+        resource=fake_apiserver.RESOURCES[2], namespace=NAMESPACE,
+        obj={"metadata": {"name": POD}, "spec": {"containers": [{"name": "c", "image": "fake"}]}}
+    )
+    return fake_context
+
+
+def test_coalesced_raw_responses(fake_cluster):
+    """
+    Coalesced serialize=False GETs (views) share a response whose body is read once
+    """
+    names = []
+
+    def views():
+        pod = Pod(name=POD, namespace=NAMESPACE, context=fake_cluster)
+        names.extend(pod.view().name for _ in range(VIEWS))
+
+    #  Daemon threads, a caller stuck reading a shared socket fails the test instead of hanging the session
+    threads = [threading.Thread(target=views, daemon=True) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 30
+    for thread in threads:
+        thread.join(timeout=max(deadline - time.monotonic(), 0))
+
+    assert not [i for i in threads if i.is_alive()], "coalesced callers did not finish"
+    assert names == [POD] * THREADS * VIEWS
+    assert client.get_client(kubeconfig=fake_cluster.kubeconfig).stats()["coalesced"]
@@ -0,0 +1,87 @@
+import pytest
+
+from utilities import latency
+
+PING_OUTPUT = """PING 10.200.0.2 (10.200.0.2) 56(84) bytes of data.
+64 bytes from 10.200.0.2: icmp_seq=1 ttl=64 time=0.412 ms
+64 bytes from 10.200.0.2: icmp_seq=2 ttl=64 time=0.388 ms
+64 bytes from 10.200.0.2: icmp_seq=4 ttl=64 time=1.20 ms
+
+--- 10.200.0.2 ping statistics ---
+4 packets transmitted, 3 received, 25% packet loss, time 603ms
+rtt min/avg/max/mdev = 0.388/0.666/1.200/0.377 ms
+"""
+
+FLOOD_OUTPUT = """PING 10.200.0.2 (10.200.0.2) 56(84) bytes of data.
+
+--- 10.200.0.2 ping statistics ---
+1000 packets transmitted, 1000 received, 0% packet loss, time 412ms
+rtt min/avg/max/mdev = 0.101/0.187/0.902/0.044 ms, ipg/ewma 0.412/0.180 ms
+"""
+
+NO_REPLY_OUTPUT = """PING 10.200.0.9 (10.200.0.9) 56(84) bytes of data.
+From 10.200.0.1 icmp_seq=1 Destination Host Unreachable
+
+--- 10.200.0.9 ping statistics ---
+2 packets transmitted, 0 received, +1 errors, 100% packet loss, time 1002ms
+"""
+
+#  Remote shell noise before the values line
+NETPERF_OUTPUT = """netperf -H 10.200.0.2 -t UDP_RR -l 10 -P 0 -- -r 1,1 -o MIN_LATENCY
+42,61.25,58,75,120,2300,16210.44
+"""
+
+
+def test_from_ping():
+    result = latency.LatencyResult.from_ping(output=PING_OUTPUT)
+    assert result.probe == "ping"
+    assert result.rtts == [0.412, 0.388, 1.2]
+    assert (result.transmitted, result.received, result.loss_percent) == (4, 3, 25.0)
+    assert (result.rtt_min, result.rtt_avg, result.rtt_max, result.rtt_mdev) == (0.388, 0.666, 1.2, 0.377)
+    assert result.p50 == 0.412
+
+
+def test_from_ping_flood():
+    """
+    Flood output has the summary only, no percentiles
+    """
+    result = latency.LatencyResult.from_ping(output=FLOOD_OUTPUT, flood=True)
+    assert result.probe == "flood"
+    assert result.rtts == []
+    assert (result.transmitted, result.received, result.loss_percent) == (1000, 1000, 0.0)
+    assert (result.rtt_min, result.rtt_max) == (0.101, 0.902)
+    assert result.p50 is None
+
+
+def test_from_ping_no_reply():
+    result = latency.LatencyResult.from_ping(output=NO_REPLY_OUTPUT)
+    assert (result.transmitted, result.received, result.loss_percent) == (2, 0, 100.0)
+    assert result.rtt_avg is None
+    assert latency.check_thresholds(result=result, thresholds={"loss_percent": 0, "p99": 1}) == [
+        "ping loss_percent=100.0 > 0"
+    ]
+
+    with pytest.raises(ValueError):
+        latency.LatencyResult.from_ping(output="ping: connect: Network is unreachable")
+
+
+def test_from_netperf_rr():
+    """
+    Latencies are converted from usec to ms
+    """
+    result = latency.LatencyResult.from_netperf_rr(output=NETPERF_OUTPUT)
+    assert result.probe == "udp_rr"
+    assert (result.rtt_min, result.rtt_avg, result.rtt_max) == (0.042, 0.06125, 2.3)
+    assert (result.p50, result.p90, result.p99) == (0.058, 0.075, 0.12)
+    assert result.transaction_rate == 16210.44
+
+    with pytest.raises(ValueError):
+        latency.LatencyResult.from_netperf_rr(output="establish control: are you sure there is a netserver")
+
+
+def test_histogram():
+    assert latency.histogram(values=[0.05, 0.1, 0.15, 5000], buckets=(0.1, 1)) == [(0.1, 2), (1, 1), (None, 1)]
+    assert latency.render_histogram(values=[0.05, 5000], buckets=(0.1, 1), width=4).splitlines() == [
+        "    <= 0.1ms      1 ####",
+        "       > 1ms      1 ####",
+    ]
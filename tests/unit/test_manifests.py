@@ -0,0 +1,92 @@
+import json
+
+import yaml
+
+from resources import manifests
+
+GVK = [{"group": "kubevirt.io", "version": "v1alpha3", "kind": "VirtualMachine"}]
+DEFINITIONS = {
+    "VirtualMachine": {
+        manifests.GVK_EXTENSION: GVK,
+        "type": "object",
+        "required": ["spec"],
+        "properties": {
+            "apiVersion": {"type": "string"},
+            "kind": {"type": "string"},
+            "metadata": {"$ref": "#/definitions/ObjectMeta"},
+            "spec": {"$ref": "#/definitions/VirtualMachineSpec"},
+        },
+    },
+    "ObjectMeta": {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "labels": {"type": "object", "additionalProperties": {"type": "string"}},
+        },
+    },
+    "VirtualMachineSpec": {
+        "type": "object",
+        "properties": {
+            "running": {"type": "boolean"},
+            "cores": {"type": "integer"},
+            "memory": {"format": "int-or-string"},
+        },
+    },
+}
+TEMPLATE = {
+    "apiVersion": "v1",
+    "kind": "Template",
+    "metadata": {"name": "vm-template"},
+    "objects": [{
+        "apiVersion": "kubevirt.io/v1alpha3",
+        "kind": "VirtualMachine",
+        "metadata": {"name": "${NAME}", "labels": {"vm": "vm-${NAME}"}},
+        "spec": {"running": True, "cores": "${{CPU_CORES}}", "memory": "${MEMORY}"},
+    }],
+    "parameters": [
+        {"name": "NAME"},
+        {"name": "CPU_CORES", "value": "4"},
+        {"name": "MEMORY", "value": "1024Mi"},
+    ],
+}
+
+
+def test_validator_errors():
+    validator = manifests.SchemaValidator(definitions=DEFINITIONS)
+    vm = {
+        "apiVersion": "kubevirt.io/v1alpha3", "kind": "VirtualMachine",
+        "metadata": {"name": "vm-1", "labels": {"a": 1}}, "spec": {"running": "yes", "memory": 1024, "cpus": 2},
+    }
+    assert validator.validate(obj=vm) == [
+        "VirtualMachine.metadata.labels.a: expected string, got int",
+        "VirtualMachine.spec.running: expected boolean, got str",
+        "VirtualMachine.spec: unknown field cpus",
+    ]
+    assert validator.validate(obj={"apiVersion": "kubevirt.io/v1alpha3", "kind": "VirtualMachine"}) == [
+        "VirtualMachine: missing required field spec"
+    ]
+    #  Kinds without a schema are not validated
+    assert validator.validate(obj={"apiVersion": "v1", "kind": "ConfigMap", "data": 1}) == []
+
+
+def test_process_template():
+    vm, = manifests.process_template(template=TEMPLATE, params={"NAME": "vm-fedora-1"})
+    assert vm["metadata"] == {"name": "vm-fedora-1", "labels": {"vm": "vm-vm-fedora-1"}}
+    assert vm["spec"] == {"running": True, "cores": 4, "memory": "1024Mi"}
+    #  Parameters without a value get a name-like placeholder
+    assert manifests.process_template(template=TEMPLATE)[0]["metadata"]["name"] == "name"
+
+
+def test_validate_template_objects(tmp_path):
+    schemas_file = tmp_path / "openapi-schemas.json"
+    schemas_file.write_text(json.dumps({"definitions": DEFINITIONS}))
+    template = dict(TEMPLATE, objects=[dict(TEMPLATE["objects"][0], spec={"cores": "${{CPU_CORES}}", "cpus": 2})])
+    (tmp_path / "vm-template.yaml").write_text(yaml.safe_dump(template))
+    (tmp_path / "vm.yaml").write_text(yaml.safe_dump(TEMPLATE["objects"][0]))
+
+    repository = manifests.ManifestRepository(root=str(tmp_path), schemas_file=str(schemas_file))
+    errors = repository.validate()
+    assert len(errors) == 2
+    #  Template objects are validated after parameters substitution (cores is an integer there)
+    assert errors[0].endswith("vm-template.yaml objects[0]: VirtualMachine.spec: unknown field cpus")
+    assert errors[1].endswith("vm.yaml: VirtualMachine.spec.cores: expected integer, got str")
@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+from utilities import network_benchmark
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def iperf_json(name):
+    with open(os.path.join(DATA_DIR, f"iperf3-{name}.json")) as fd:
+        return json.load(fd)
+
+
+@pytest.mark.parametrize("protocol", [None, network_benchmark.TCP])
+def test_tcp(protocol):
+    result = network_benchmark.IperfResult.from_json(iperf_json=iperf_json(name="tcp"), protocol=protocol)
+    assert result.bits_per_second == 2487213966.4
+    assert result.intervals == [2442832618.8, 2550088376.1]
+    assert result.retransmits == 112
+    assert (result.jitter_ms, result.lost_percent) == (None, None)
+
+
+@pytest.mark.parametrize("name", ["udp", "udp-legacy"])
+@pytest.mark.parametrize("protocol", [None, network_benchmark.UDP])
+def test_udp(name, protocol):
+    """
+    UDP runs keep jitter and loss, with and without sum_received (newer and older iperf3)
+    """
+    result = network_benchmark.IperfResult.from_json(iperf_json=iperf_json(name=name), protocol=protocol)
+    expected = {"udp": (904019954.6, 0.017, 1.411753), "udp-legacy": (784009629.6, 0.024, 0.49994)}[name]
+    assert (result.bits_per_second, result.jitter_ms, result.lost_percent) == expected
+    assert result.retransmits is None
+
+
+def test_error():
+    with pytest.raises(ValueError, match="unable to connect"):
+        network_benchmark.IperfResult.from_json(iperf_json={"error": "unable to connect to server"})
+
+
+def test_percentiles_and_summary():
+    assert network_benchmark.percentiles(values=[]) == {}
+    assert network_benchmark.percentiles(values=[5, None], percents=(50, 99)) == {"p50": 5, "p99": 5}
+    results = [
+        network_benchmark.IperfResult(bits_per_second=value, intervals=[value], retransmits=0)
+        for value in (1.0, 3.0, 2.0)
+    ]
+    summary = network_benchmark.summarize(results=results)
+    assert summary["repeats"] == 3
+    assert summary["bits_per_second_median"] == 2.0
+    assert summary["bits_per_second"]["p50"] == 2.0
+    assert summary["jitter_ms"] == {}
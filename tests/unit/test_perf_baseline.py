@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from utilities import perf_baseline
+
+
+def samples(median, count, seed):
+    rand = random.Random(seed)
+    return [median * rand.uniform(0.97, 1.03) for _ in range(count)]
+
+
+def test_mann_whitney_u():
+    """
+    Fully separated groups, their mirror and all ties
+    """
+    u, p_value = perf_baseline.mann_whitney_u(current=[1, 2, 3], baseline=[4, 5, 6])
+    assert u == 0
+    assert p_value == pytest.approx(0.0404, abs=1e-4)
+
+    u, p_value = perf_baseline.mann_whitney_u(current=[4, 5, 6], baseline=[1, 2, 3])
+    assert u == 9
+    assert p_value > 0.95
+
+    assert perf_baseline.mann_whitney_u(current=[5, 5], baseline=[5, 5, 5]) == (3.0, 1.0)
+
+
+def test_median_drop():
+    drop, bounds = perf_baseline.median_drop(current=[90.0] * 5, baseline=[100.0] * 10)
+    assert drop == pytest.approx(0.1)
+    assert bounds == (pytest.approx(0.1), pytest.approx(0.1))
+
+    drop, (lower, upper) = perf_baseline.median_drop(current=samples(80, 10, seed=1), baseline=samples(100, 30, seed=2))
+    assert lower <= drop <= upper
+    assert 0.15 < lower
+
+
+@pytest.mark.parametrize(
+    "current_median, higher_is_better, regressed",
+    [
+        pytest.param(80, True, True, id="throughput-drop"),
+        pytest.param(98, True, False, id="throughput-noise"),
+        pytest.param(120, True, False, id="throughput-gain"),
+        pytest.param(120, False, True, id="latency-rise"),
+        pytest.param(80, False, False, id="latency-gain"),
+    ]
+)
+def test_detect_regression(current_median, higher_is_better, regressed):
+    result = perf_baseline.detect_regression(
+        metric="metric", current=samples(current_median, 10, seed=1), baseline=samples(100, 30, seed=2),
+        higher_is_better=higher_is_better
+    )
+    assert result.regressed is regressed, result
+
+
+def test_detect_regression_small_baseline():
+    result = perf_baseline.detect_regression(metric="metric", current=[1.0], baseline=[100.0] * 5)
+    assert not result.regressed
+    assert result.reason == "baseline too small (5/6 samples)"
+
+
+def test_store_baseline_and_runs(tmp_path):
+    """
+    The baseline excludes the current run, runs are reported by median
+    """
+    store = perf_baseline.BaselineStore(path=str(tmp_path / "baseline.sqlite"))
+    fingerprint = perf_baseline.fingerprint(network="ovs", cluster="a")
+    assert fingerprint == perf_baseline.fingerprint(cluster="a", network="ovs")
+
+    store.add(fingerprint_=fingerprint, metric="gbps", values=[1.0, 2.0, 3.0], run_id="run-1")
+    store.add(fingerprint_=fingerprint, metric="gbps", values=[5.0], run_id="run-2")
+    assert sorted(store.baseline(fingerprint_=fingerprint, metric="gbps", exclude_run_id="run-2")) == [1.0, 2.0, 3.0]
+    assert [median for _, median in store.runs(fingerprint_=fingerprint)[(fingerprint, "gbps")]] == [2.0, 5.0]
+    assert "2 runs, first->last +150.0%: 2 5" in perf_baseline.trend_report(store=store)
@@ -0,0 +1,72 @@
+import tempfile
+import threading
+
+import pytest
+
+from utilities import sharding
+
+
+@pytest.fixture()
+def xdist_run(monkeypatch, tmp_path):
+    """
+    xdist test run environment, setup files under tmp_path
+    """
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setenv(sharding.XDIST_TESTRUNUID_ENV, "run-uid")
+    monkeypatch.setenv(sharding.XDIST_WORKER_ENV, "gw3")
+
+
+def test_sharded_name(monkeypatch):
+    """
+    Names get the worker id suffix under xdist only
+    """
+    monkeypatch.delenv(sharding.XDIST_WORKER_ENV, raising=False)
+    assert sharding.sharded_name("cnv-network-ns") == "cnv-network-ns"
+    assert sharding.worker_index() == 0
+
+    monkeypatch.setenv(sharding.XDIST_WORKER_ENV, "gw3")
+    assert sharding.sharded_name("cnv-network-ns") == "cnv-network-ns-gw3"
+    assert sharding.worker_index() == 3
+
+
+def test_setup_without_xdist(monkeypatch):
+    """
+    Without xdist setup and teardown run every time
+    """
+    monkeypatch.delenv(sharding.XDIST_TESTRUNUID_ENV, raising=False)
+    calls = []
+    setup = sharding.ClusterWideSetup(name="bridges")
+    assert setup.setup(func=lambda: calls.append("setup") or "state") == "state"
+    setup.teardown(func=lambda: calls.append("teardown"))
+    assert calls == ["setup", "teardown"]
+
+
+def test_setup_once_teardown_by_last_user(xdist_run):
+    """
+    Concurrent workers run the setup once and share its result, the last one to release it runs the teardown
+    """
+    calls = []
+    results = []
+    workers = [
+        threading.Thread(
+            target=lambda: results.append(
+                sharding.ClusterWideSetup(name="bridges").setup(func=lambda: calls.append("setup") or {"br": 1})
+            )
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert calls == ["setup"]
+    assert results == [{"br": 1}] * 4
+
+    for idx in range(4):
+        sharding.ClusterWideSetup(name="bridges").teardown(func=lambda: calls.append("teardown"))
+        assert calls.count("teardown") == (1 if idx == 3 else 0)
+
+    #  Torn down, the next setup runs again
+    sharding.ClusterWideSetup(name="bridges").setup(func=lambda: calls.append("setup"))
+    assert calls.count("setup") == 2
@@ -0,0 +1,56 @@
+import re
+
+import pytest
+
+from utilities import stream_expect
+
+
+def marker_of(line):
+    """
+    Returns:
+        str: The marker a framed command line prints, without the empty quotes splitting it.
+    """
+    return re.search(r"(CNV''\w+)_RC", line).group(1).replace("''", "")
+
+
+@pytest.mark.parametrize(
+    "chunks, rc",
+    [
+        ([lambda line: f"bash: foo: command not found\r\n{marker_of(line)}_RC:1", "27\r\n"], 127),
+        ([lambda line: f"{marker_of(line)}_RC:", "0", "\r\n"], 0),
+        ([lambda line: f"{marker_of(line)}_RC:1\r\n[fedora@vm ~]$ "], 1),
+    ]
+)
+def test_exit_code_split_across_reads(fake_child, chunks, rc):
+    matcher = stream_expect.StreamMatcher(child=fake_child(chunks=chunks))
+    assert matcher.exit_code(command="foo", timeout=5) == rc
+
+
+def test_exit_code_ignores_echoed_command_line(fake_child):
+    child = fake_child(chunks=[lambda line: f"{line}\r\n", lambda line: f"{marker_of(line)}_RC:2\r\n"])
+    assert stream_expect.StreamMatcher(child=child).exit_code(command="false", timeout=5) == 2
+
+
+def test_stream_until_keeps_split_marker(fake_child):
+    text = []
+    child = fake_child(chunks=["a" * 300, "b" * 300 + "EN", "D\r\n"])
+    matcher = stream_expect.StreamMatcher(child=child, window=16)
+    matcher.stream_until(pattern=re.compile(r"END\r\n"), sink=text.append, timeout=5)
+    assert "".join(text) == "a" * 300 + "b" * 300
+
+
+def test_ring_buffer_drops_oldest():
+    buffer = stream_expect.RingBuffer(maxlen=4)
+    buffer.append("abc")
+    buffer.append("def")
+    assert (buffer.text, buffer.dropped) == ("cdef", 2)
+    assert buffer.consume(end=2) == "cd"
+    assert buffer.text == "ef"
+
+
+def test_json_stream_extractor_split_objects():
+    extractor = stream_expect.JsonStreamExtractor()
+    assert extractor.feed('noise {"a": "x}\\') == []
+    assert extractor.feed('"y", "b": {"c": 1}} more {"d"') == [{"a": 'x}"y', "b": {"c": 1}}]
+    assert extractor.feed(': 2}') == [{"d": 2}]
+    assert len(extractor.objects) == 2
@@ -0,0 +1,37 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utilities import utils
+
+
+def sample_until_timeout(timeout):
+    """
+    Returns:
+        float: Seconds until a never satisfied TimeoutSampler timed out.
+    """
+    start = time.monotonic()
+    assert not utils.TimeoutSampler(timeout=timeout, sleep=0.05, func=lambda: False).wait_for_func_status(result=True)
+    return time.monotonic() - start
+
+
+def test_deadline_is_per_thread():
+    """
+    A pool worker does not see the caller deadline unless the function is bound to it
+    """
+    with utils.Deadline(timeout=60) as deadline, ThreadPoolExecutor(max_workers=2) as executor:
+        assert executor.submit(utils.Deadline.current).result() is None
+        assert executor.submit(utils.Deadline.bind(utils.Deadline.current)).result() is deadline
+
+    assert utils.Deadline.bind(utils.Deadline.current)() is None
+
+
+def test_bound_workers_share_the_deadline():
+    """
+    Samplers in bound pool workers time out with the caller deadline, the workers stacks are restored
+    """
+    with utils.Deadline(timeout=0.5), ThreadPoolExecutor(max_workers=4) as executor:
+        durations = list(executor.map(utils.Deadline.bind(sample_until_timeout), [30] * 4))
+        stacks = list(executor.map(lambda _: list(utils.Deadline._stack()), range(4)))
+
+    assert max(durations) < 5, durations
+    assert not any(stacks), stacks
@@ -0,0 +1,27 @@
+from resources.virtual_machine import VirtualMachine
+from utilities import fake_apiserver
+
+NAMESPACE = "vm-node"
+
+
+def resource(plural):
+    return next(i for i in fake_apiserver.RESOURCES if i[2] == plural)
+
+
+def test_node_from_vmi(fake_server, fake_context):
+    """
+    The VM node is its VMI node, None while the VM does not run
+    """
+    fake_server.add(resource=resource(plural="namespaces"), obj={"metadata": {"name": NAMESPACE}})
+    for name in ("vm-running", "vm-stopped"):
+        fake_server.add(
+            resource=resource(plural="virtualmachines"), namespace=NAMESPACE,
+            obj={"metadata": {"name": name}, "spec": {"running": name == "vm-running"}}
+        )
+    fake_server.add(
+        resource=resource(plural="virtualmachineinstances"), namespace=NAMESPACE,
+        obj={"metadata": {"name": "vm-running"}, "status": {"nodeName": "fake-node-0", "phase": "Running"}}
+    )
+
+    assert VirtualMachine(name="vm-running", namespace=NAMESPACE, context=fake_context).node() == "fake-node-0"
+    assert VirtualMachine(name="vm-stopped", namespace=NAMESPACE, context=fake_context).node() is None
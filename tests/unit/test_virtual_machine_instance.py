@@ -0,0 +1,45 @@
+import threading
+import time
+
+from resources.virtual_machine_instance import AGENT_CONNECTED, VirtualMachineInstance
+from utilities import fake_apiserver
+
+NAMESPACE = "vmi-timings"
+VMIS = ("vm-a", "vm-b")
+REPORT_DELAY = 0.3
+WAIT_GAP = 3
+
+
+def test_sequential_waits_do_not_inflate_times(fake_server, fake_context):
+    """
+    A VMI waited on after another reports when its agent and interfaces were ready, not when its wait started
+    """
+    vmi_resource = next(i for i in fake_apiserver.RESOURCES if i[2] == "virtualmachineinstances")
+    fake_server.add(resource=fake_apiserver.RESOURCES[0], obj={"metadata": {"name": NAMESPACE}})
+    connected = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    for name in VMIS:
+        fake_server.add(resource=vmi_resource, namespace=NAMESPACE, obj={
+            "metadata": {"name": name},
+            "status": {"conditions": [{"type": AGENT_CONNECTED, "status": "True", "lastTransitionTime": connected}]},
+        })
+
+    def report_interfaces():
+        time.sleep(REPORT_DELAY)
+        for name in VMIS:
+            fake_server.store.update(
+                resource=vmi_resource, namespace=NAMESPACE, name=name,
+                func=lambda vmi: dict(vmi, status=dict(
+                    vmi["status"], interfaces=[{"interfaceName": "eth0", "ipAddress": "10.0.2.2"}]
+                ))
+            )
+
+    threading.Thread(target=report_interfaces, daemon=True).start()
+    first = VirtualMachineInstance(name=VMIS[0], namespace=NAMESPACE, context=fake_context)
+    first_metrics = first.wait_for_agent_and_interfaces(timeout=30)
+    time.sleep(WAIT_GAP)
+    second = VirtualMachineInstance(name=VMIS[1], namespace=NAMESPACE, context=fake_context)
+    second_metrics = second.wait_for_agent_and_interfaces(timeout=30)
+
+    #  Timestamps have a second resolution, the VMIs may be created across a second boundary
+    assert second_metrics["time_to_agent"] < first_metrics["time_to_agent"] + 1.5 < WAIT_GAP
+    assert second_metrics["time_to_ip"] < first_metrics["time_to_ip"] + 1.5 < WAIT_GAP
@@ -0,0 +1,89 @@
+import copy
+
+from utilities import vm_spec
+
+SPEC = {
+    "apiVersion": "kubevirt.io/v1alpha3",
+    "kind": "VirtualMachine",
+    "metadata": {"name": vm_spec.NAME_SENTINEL, "labels": {"kubevirt.io/vm": vm_spec.NAME_SENTINEL}},
+    "spec": {
+        "running": True,
+        "template": {
+            "spec": {
+                "domain": {"devices": {"interfaces": [{"name": "default", "masquerade": {}}]}},
+                "networks": [{"name": "default", "pod": {}}],
+                "volumes": [
+                    {"name": "containerdisk", "containerDisk": {"image": "fedora"}},
+                    {
+                        "name": "cloudinitdisk",
+                        "cloudInitNoCloud": {
+                            "userData": f"#cloud-config\nhostname: {vm_spec.NAME_SENTINEL}\nruncmd:\n- echo template\n"
+                        },
+                    },
+                ],
+            },
+        },
+    },
+}
+
+
+def test_build_replaces_name():
+    """
+    Without hooks the spec is the template with the VM name
+    """
+    builder = vm_spec.VMSpecBuilder(spec=copy.deepcopy(SPEC))
+    vm = builder.build(name="vm-1")
+    assert vm["metadata"] == {"name": "vm-1", "labels": {"kubevirt.io/vm": "vm-1"}}
+    volumes = vm["spec"]["template"]["spec"]["volumes"]
+    assert volumes[1]["cloudInitNoCloud"]["userData"] == SPEC["spec"]["template"]["spec"]["volumes"][1][
+        "cloudInitNoCloud"]["userData"].replace(vm_spec.NAME_SENTINEL, "vm-1")
+
+
+def test_build_applies_hooks():
+    builder = vm_spec.VMSpecBuilder(spec=copy.deepcopy(SPEC))
+    vm = builder.build(
+        name="vm-2",
+        hooks=[
+            vm_spec.CloudInitSSHKey(public_key="ssh-rsa AAAA"),
+            vm_spec.MultusNetwork(name="ovs-net", network_name="ovs-vlan-net"),
+            vm_spec.CloudInitRunCmd(commands=["ip link set mtu 1450 eth1"]),
+        ]
+    )
+    spec = vm["spec"]["template"]["spec"]
+    assert spec["domain"]["devices"]["interfaces"][-1] == {"name": "ovs-net", "bridge": {}}
+    assert spec["networks"][-1] == {"name": "ovs-net", "multus": {"networkName": "ovs-vlan-net"}}
+
+    user_data = spec["volumes"][1]["cloudInitNoCloud"]["userData"]
+    assert user_data.startswith(vm_spec.CLOUD_CONFIG_HEADER)
+    assert vm_spec.parse_cloud_config(user_data=user_data) == {
+        "hostname": "vm-2",
+        "runcmd": ["echo template", "ip link set mtu 1450 eth1"],
+        "ssh_authorized_keys": ["ssh-rsa AAAA"],
+    }
+
+
+def test_builds_are_independent():
+    """
+    Hooks of a build do not leak into the next builds
+    """
+    builder = vm_spec.VMSpecBuilder(spec=copy.deepcopy(SPEC))
+    builder.build(name="vm-1", hooks=[vm_spec.MultusNetwork(name="ovs-net"), vm_spec.CloudInitRunCmd(commands=["a"])])
+    vm = builder.build(name="vm-2", hooks=[vm_spec.CloudInitRunCmd(commands=["b"])])
+    spec = vm["spec"]["template"]["spec"]
+    assert len(spec["networks"]) == 1
+    assert vm_spec.parse_cloud_config(user_data=spec["volumes"][1]["cloudInitNoCloud"]["userData"])["runcmd"] == [
+        "echo template", "b"
+    ]
+
+
+def test_build_without_cloud_init():
+    """
+    Cloud-init hooks are ignored by specs without a cloud-init volume
+    """
+    spec = copy.deepcopy(SPEC)
+    del spec["spec"]["template"]["spec"]["volumes"][1]
+    vm = vm_spec.VMSpecBuilder(spec=spec).build(
+        name="vm-3", hooks=[vm_spec.CloudInitRunCmd(commands=["a"]), vm_spec.MultusNetwork(name="ovs-net")]
+    )
+    assert vm["spec"]["template"]["spec"]["volumes"] == spec["spec"]["template"]["spec"]["volumes"]
+    assert len(vm["spec"]["template"]["spec"]["networks"]) == 2
@@ -0,0 +1,225 @@
+"""
+VM boot time and time to network benchmark at scale.
+"""
+
+import concurrent.futures
+import logging
+import threading
+import time
+
+from resources import watcher
+from resources.virtual_machine import VirtualMachine
+from resources.virtual_machine_instance import agent_connected, interfaces_reported
+from utilities import types
+from utilities.network_benchmark import percentiles
+
+LOGGER = logging.getLogger(__name__)
+CREATED = "created"
+SCHEDULED = "scheduled"
+RUNNING = "running"
+AGENT_CONNECTED = "agent_connected"
+IP_REPORTED = "ip_reported"
+PHASES = (CREATED, SCHEDULED, RUNNING, AGENT_CONNECTED, IP_REPORTED)
+MAX_WORKERS = 20
+
+
+def vmi_phases(vmi):
+    """
+    Args:
+        vmi (dict): VMI object.
+
+    Returns:
+        list: Boot phases the VMI reached (CREATED excluded, it is the create request time).
+    """
+    status = vmi.get('status', {})
+    phase = status.get('phase')
+    phases = []
+    if status.get('nodeName') or phase in ('Scheduled', types.RUNNING):
+        phases.append(SCHEDULED)
+
+    if phase == types.RUNNING:
+        phases.append(RUNNING)
+
+    if agent_connected(vmi):
+        phases.append(AGENT_CONNECTED)
+
+    if interfaces_reported(vmi):
+        phases.append(IP_REPORTED)
+    return phases
+
+
+class PhaseRecorder(object):
+    """
+    Record when each VM first reached each boot phase, from the VMI watch events.
+    """
+    def __init__(self, names):
+        """
+        Args:
+            names (list): VM names.
+        """
+        self.names = set(names)
+        self.times = dict((name, {}) for name in names)
+        ''' VM name: {phase: epoch seconds}. '''
+        self._cond = threading.Condition()
+
+    def mark(self, name, phase, timestamp=None):
+        """
+        Args:
+            name (str): VM name.
+            phase (str): Phase.
+            timestamp (float): Epoch seconds, default is now.
+        """
+        with self._cond:
+            self.times[name].setdefault(phase, timestamp or time.time())
+            self._cond.notify_all()
+
+    def on_event(self, event_type, obj, timestamp):
+        """
+        Watcher subscriber
+        """
+        name = obj['metadata']['name']
+        if name not in self.names or event_type == 'DELETED':
+            return
+
+        for phase in vmi_phases(vmi=obj):
+            self.mark(name=name, phase=phase, timestamp=timestamp)
+
+    def wait(self, phase, timeout, names=None):
+        """
+        Wait until all VMs reached a phase
+
+        Args:
+            phase (str): Phase.
+            timeout (float): Time to wait.
+            names (list): VMs to wait for, default all.
+
+        Returns:
+            list: VMs which did not reach the phase in time.
+        """
+        names = set(names or self.names)
+        expires = time.time() + timeout
+        with self._cond:
+            while True:
+                pending = sorted(name for name in names if phase not in self.times[name])
+                remaining = expires - time.time()
+                if not pending or remaining <= 0:
+                    return pending
+                self._cond.wait(timeout=remaining)
+
+
+class BootScaleBenchmark(object):
+    """
+    Create N VMs at a fixed rate and measure their boot phases from one VMI watch.
+
+    Examples:
+        benchmark = BootScaleBenchmark(
+            namespace="cnv-network-ns", vms={"vm-1": vm_dict_1, "vm-2": vm_dict_2}, rate=2
+        )
+        try:
+            report = benchmark.run(timeout=1800)
+        finally:
+            benchmark.teardown()
+    """
+    def __init__(self, namespace, vms, rate=1.0, max_workers=MAX_WORKERS):
+        """
+        Args:
+            namespace (str): VMs namespace.
+            vms (dict): VM name: VM dict to create.
+            rate (float): VMs created per second.
+            max_workers (int): Maximum concurrent API calls.
+        """
+        self.namespace = namespace
+        self.vms = vms
+        self.rate = rate
+        self.max_workers = max_workers
+        self.recorder = PhaseRecorder(names=list(vms))
+        self.errors = {}
+        ''' VM name: create error. '''
+
+    def _create(self, name):
+        """
+        Create one VM, record the create request time
+        """
+        requested = time.time()
+        try:
+            VirtualMachine(name=name, namespace=self.namespace).create(resource_dict=self.vms[name])
+            self.recorder.mark(name=name, phase=CREATED, timestamp=requested)
+        except Exception as exp:
+            LOGGER.error(f"Failed to create VM {name}: {exp}")
+            self.errors[name] = repr(exp)
+
+    def run(self, timeout):
+        """
+        Create the VMs at the configured rate and wait until they all reported their IPs
+
+        Args:
+            timeout (float): Time to wait for all VMs after the last create.
+
+        Returns:
+            dict: Report (see report()).
+        """
+        vmis = watcher.get_watcher(api_version=types.CNV_API_VERSION, kind=types.VMI, namespace=self.namespace)
+        vmis.subscribe(callback=self.recorder.on_event)
+        try:
+            start = time.monotonic()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for idx, name in enumerate(self.vms):
+                    #  Fixed schedule, a slow create does not delay the next ones
+                    delay = start + idx / self.rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(self._create, name)
+
+            created = [name for name in self.vms if name not in self.errors]
+            pending = self.recorder.wait(phase=IP_REPORTED, timeout=timeout, names=created)
+            if pending:
+                LOGGER.error(f"VMs {pending} did not report their IPs in {timeout} seconds")
+        finally:
+            vmis.unsubscribe(callback=self.recorder.on_event)
+        return self.report()
+
+    def report(self):
+        """
+        Returns:
+            dict: Per phase count and percentiles of the seconds from the create request, VMs per minute
+                (VMs which reported their IPs over the time from the first create to the last IP) and errors.
+        """
+        times = self.recorder.times
+        phases = {}
+        for phase in PHASES[1:]:
+            durations = [i[phase] - i[CREATED] for i in times.values() if phase in i and CREATED in i]
+            phases[phase] = dict(percentiles(values=durations), count=len(durations))
+
+        created = [i[CREATED] for i in times.values() if CREATED in i]
+        ready = [i[IP_REPORTED] for i in times.values() if IP_REPORTED in i]
+        elapsed = max(ready) - min(created) if ready and created else None
+        return {
+            "vms": len(self.vms),
+            "rate": self.rate,
+            "phases": phases,
+            "vms_per_minute": len(ready) / elapsed * 60 if elapsed else None,
+            "errors": dict(self.errors),
+        }
+
+    def teardown(self, timeout=600):
+        """
+        Delete all VMs concurrently and wait for their VMIs to be gone
+
+        Args:
+            timeout (float): Time to wait for the VMIs to be gone.
+
+        Returns:
+            bool: True if all VMIs are gone.
+        """
+        vmis = watcher.get_watcher(api_version=types.CNV_API_VERSION, kind=types.VMI, namespace=self.namespace)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(lambda name: VirtualMachine(name=name, namespace=self.namespace).delete(), self.vms))
+
+        expires = time.time() + timeout
+        try:
+            for name in self.vms:
+                vmis.wait_for(name=name, predicate=lambda obj: obj is None, timeout=max(expires - time.time(), 0))
+        except Exception as exp:
+            LOGGER.error(f"VMIs teardown not completed: {exp}")
+            return False
+        return True
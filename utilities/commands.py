@@ -0,0 +1,190 @@
+"""
+Local command runner: structured results (exit code, stdout, stderr, duration), per command timeouts, concurrent
+batches and streamed output. oc/virtctl binaries are resolved once.
+"""
+
+import concurrent.futures
+import functools
+import logging
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+
+from resources import cluster
+
+LOGGER = logging.getLogger(__name__)
+TIMEOUT = 600
+MAX_WORKERS = 10
+CHUNK_SIZE = 65536
+
+
+class CommandResult(object):
+    """
+    Result of one command.
+    """
+    def __init__(self, command, rc, stdout, stderr=None, duration=None):
+        """
+        Args:
+            command (str): Command.
+            rc (int): Exit code, negative if killed by a signal (-9 on timeout).
+            stdout (str): Standard output (merged with stderr on a console), None if streamed to a sink.
+            stderr (str): Standard error, None if merged into stdout or streamed to a sink.
+            duration (float): Seconds.
+        """
+        self.command = command
+        self.rc = rc
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            bool: True if the command exited with 0.
+        """
+        return self.rc == 0
+
+    def __repr__(self):
+        duration = f" in {self.duration:.2f}s" if self.duration is not None else ""
+        return f"{self.command!r} rc={self.rc}{duration}"
+
+
+@functools.lru_cache(maxsize=None)
+def which(binary):
+    """
+    Resolve a binary on PATH once
+
+    Args:
+        binary (str): Binary name.
+
+    Returns:
+        str: Binary path.
+
+    Raises:
+        FileNotFoundError: If the binary is not on PATH.
+    """
+    path = shutil.which(binary)
+    if not path:
+        raise FileNotFoundError(f"{binary} not found on PATH")
+    return path
+
+
+def _cli_args(binary, command, namespace=None, kubeconfig=None):
+    """
+    Build a cluster CLI command line, namespace and kubeconfig go before the ` -- ` separated remote command
+
+    Returns:
+        list: Command arguments.
+    """
+    first, _, last = command.partition(" -- ")
+    args = [which(binary=binary)] + shlex.split(first)
+    if namespace:
+        args += ["-n", namespace]
+
+    #  The default context kubeconfig, the API client of the resources created without a context uses the same
+    kubeconfig = kubeconfig or cluster.default_context().kubeconfig
+    if kubeconfig:
+        args += ["--kubeconfig", kubeconfig]
+
+    if last:
+        args += ["--"] + shlex.split(last)
+    return args
+
+
+def oc_args(command, namespace=None, kubeconfig=None):
+    """
+    Args:
+        command (str): oc command (without oc), e.g. "exec -i pod-1 -- ip link".
+        namespace (str): Namespace.
+        kubeconfig (str): Cluster kubeconfig, the default context kubeconfig if not set.
+
+    Returns:
+        list: Command arguments.
+    """
+    return _cli_args(binary="oc", command=command, namespace=namespace, kubeconfig=kubeconfig)
+
+
+def virtctl_args(command, namespace=None, kubeconfig=None):
+    """
+    Args:
+        command (str): virtctl command (without virtctl), e.g. "start vm-fedora-1".
+        namespace (str): Namespace.
+        kubeconfig (str): Cluster kubeconfig, the default context kubeconfig if not set.
+
+    Returns:
+        list: Command arguments.
+    """
+    return _cli_args(binary="virtctl", command=command, namespace=namespace, kubeconfig=kubeconfig)
+
+
+def _pump(stream, sink):
+    """
+    Pass a pipe to sink in chunks until EOF
+    """
+    for chunk in iter(lambda: stream.read1(CHUNK_SIZE), b""):
+        sink(chunk.decode("utf-8", errors="replace"))
+    stream.close()
+
+
+def run(command, timeout=TIMEOUT, stdout_sink=None, stderr_sink=None, env=None):
+    """
+    Run a local command
+
+    Args:
+        command (list|str): Command arguments, or a command line split with shlex.
+        timeout (float): Time to wait for the command, it is killed after, None to wait until it exits.
+        stdout_sink (function): func(text) called with stdout chunks as they arrive, instead of buffering them.
+        stderr_sink (function): func(text) called with stderr chunks as they arrive, instead of buffering them.
+        env (dict): Command environment, the current environment if not set.
+
+    Returns:
+        CommandResult: Result.
+    """
+    args = shlex.split(command) if isinstance(command, str) else list(command)
+    line = " ".join(shlex.quote(i) for i in args)
+    stdout, stderr = [], []
+    start = time.monotonic()
+    proc = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    pumps = [
+        threading.Thread(target=_pump, args=(proc.stdout, stdout_sink or stdout.append), daemon=True),
+        threading.Thread(target=_pump, args=(proc.stderr, stderr_sink or stderr.append), daemon=True),
+    ]
+    for pump in pumps:
+        pump.start()
+
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        LOGGER.error(f"{line} did not exit in {timeout} seconds, killing it")
+        proc.kill()
+        proc.wait()
+
+    for pump in pumps:
+        pump.join()
+
+    return CommandResult(
+        command=line,
+        rc=proc.returncode,
+        stdout=None if stdout_sink else "".join(stdout),
+        stderr=None if stderr_sink else "".join(stderr),
+        duration=time.monotonic() - start,
+    )
+
+
+def run_many(commands, timeout=TIMEOUT, max_workers=MAX_WORKERS):
+    """
+    Run local commands concurrently
+
+    Args:
+        commands (list): Commands (see run()).
+        timeout (float): Time to wait for each command.
+        max_workers (int): Maximum concurrent commands.
+
+    Returns:
+        list: CommandResult per command, in commands order.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda command: run(command=command, timeout=timeout), commands))
@@ -0,0 +1,280 @@
+"""
+All pairs VM to VM connectivity matrix over several networks.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from utilities.latency import LatencyResult
+
+LOGGER = logging.getLogger(__name__)
+PER_SOURCE_CONCURRENCY = 1
+
+
+class PairResult(object):
+    """
+    Result of one source VM to destination VM check on one network.
+    """
+    def __init__(self, src, dst, network, ok, rtt=None, error=None, duration=None):
+        """
+        Args:
+            src (str): Source VM name.
+            dst (str): Destination VM name.
+            network (str): Network (IP key).
+            ok (bool): True if the destination is reachable.
+            rtt (float): Average RTT in milliseconds.
+            error (str): Probe error, if the probe itself failed.
+            duration (float): Probe seconds.
+        """
+        self.src = src
+        self.dst = dst
+        self.network = network
+        self.ok = ok
+        self.rtt = rtt
+        self.error = error
+        self.duration = duration
+
+    def __repr__(self):
+        status = f"ok {self.rtt}ms" if self.ok else f"FAIL {self.error or ''}".strip()
+        return f"{self.network}: {self.src} -> {self.dst} {status}"
+
+
+class SessionPool(object):
+    """
+    Per source VM pool of guest sessions (SSH or console), bounding the concurrent probes of every source.
+
+    A session is opened on first need and reused by the next probes of the same source, a session whose probe
+    raised is closed instead.
+    """
+    def __init__(self, session, per_source=PER_SOURCE_CONCURRENCY):
+        """
+        Args:
+            session (function): func(vm) -> context manager yielding a guest session.
+            per_source (int): Maximum sessions (concurrent probes) per source VM.
+        """
+        self.session = session
+        self.per_source = per_source
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(queue.Queue)
+        self._slots = collections.defaultdict(lambda: threading.Semaphore(self.per_source))
+        self._open = {}
+        ''' id(session): (session, its context manager), of the open sessions. '''
+
+    @contextlib.contextmanager
+    def get(self, vm):
+        """
+        Args:
+            vm (str): Source VM name.
+
+        Yields:
+            object: Session to the VM, exclusive to the caller.
+        """
+        with self._lock:
+            slots = self._slots[vm]
+            idle = self._idle[vm]
+
+        with slots:
+            try:
+                session = idle.get_nowait()
+            except queue.Empty:
+                #  Log in outside the lock, other sources open their sessions meanwhile
+                manager = self.session(vm)
+                session = manager.__enter__()
+                with self._lock:
+                    self._open[id(session)] = (session, manager)
+            try:
+                yield session
+            except Exception as exp:
+                #  The session may be broken (dropped connection, console out of sync), the next probe opens one
+                LOGGER.warning(f"{vm}: closing the session after {exp!r}")
+                with self._lock:
+                    _, manager = self._open.pop(id(session))
+                self._exit(manager=manager, exc=exp)
+                raise
+            idle.put(session)
+
+    @staticmethod
+    def _exit(manager, exc=None):
+        """
+        Exit a session context, errors are logged (the session is dropped anyway)
+
+        Args:
+            manager (object): Session context manager.
+            exc (Exception): Exception the session is closed after, None if closed normally.
+        """
+        try:
+            manager.__exit__(type(exc) if exc else None, exc, exc.__traceback__ if exc else None)
+        except Exception as exp:
+            LOGGER.warning(f"Failed to close a guest session: {exp!r}")
+
+    def close(self):
+        """
+        Close all sessions
+        """
+        with self._lock:
+            sessions, self._open = list(self._open.values()), {}
+        for _, manager in sessions:
+            self._exit(manager=manager)
+
+
+class ConnectivityMatrix(object):
+    """
+    Check every ordered VM pair on every network, probes of different sources run concurrently.
+
+    Examples:
+        matrix = ConnectivityMatrix(
+            vms={"vm-1": {"node": "node-1", "ovs_ip": "192.168.0.1"}, "vm-2": {...}},
+            networks=["pod_ip", "ovs_ip"],
+            session=lambda vm: guest.ConsoleSession(vm=vm, namespace=ns),
+            probe=ping_probe,
+        )
+        results = matrix.run()
+        LOGGER.info(render(results=results, vms=matrix.vms))
+    """
+    def __init__(self, vms, networks, session, probe, per_source=PER_SOURCE_CONCURRENCY, max_workers=None):
+        """
+        Args:
+            vms (dict): VM name: {"node": node name, <network>: IP, ...}.
+            networks (list): Networks, the IP keys of vms.
+            session (function): func(vm) -> context manager yielding a guest session.
+            probe (function): func(session, dst_ip) -> (reachable, RTT ms).
+            per_source (int): Maximum concurrent probes per source VM (1 for a console, one TTY).
+            max_workers (int): Maximum concurrent probes, default is every source at its limit.
+        """
+        self.vms = vms
+        self.networks = networks
+        self.session = session
+        self.probe = probe
+        self.per_source = per_source
+        self.max_workers = max_workers or max(1, len(vms) * per_source)
+
+    def pairs(self):
+        """
+        Returns:
+            list: (network, src, dst) to check, interleaved by source so all sources start at once.
+        """
+        by_source = [
+            [(network, src, dst) for network in self.networks for dst in self.vms if dst != src]
+            for src in self.vms
+        ]
+        return [pair for pairs in itertools.zip_longest(*by_source) for pair in pairs if pair]
+
+    def _check(self, pool, network, src, dst):
+        """
+        Returns:
+            PairResult: Check result.
+        """
+        dst_ip = self.vms[dst].get(network)
+        if not dst_ip:
+            return PairResult(src=src, dst=dst, network=network, ok=False, error="no IP")
+
+        start = time.monotonic()
+        try:
+            with pool.get(vm=src) as session:
+                ok, rtt = self.probe(session, dst_ip)
+        except Exception as exp:
+            return PairResult(
+                src=src, dst=dst, network=network, ok=False, error=repr(exp), duration=time.monotonic() - start
+            )
+
+        return PairResult(src=src, dst=dst, network=network, ok=ok, rtt=rtt, duration=time.monotonic() - start)
+
+    def run(self):
+        """
+        Check all pairs
+
+        Returns:
+            list: PairResult per (network, src, dst).
+        """
+        pool = SessionPool(session=self.session, per_source=self.per_source)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(self._check, pool, network, src, dst) for network, src, dst in self.pairs()
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            pool.close()
+
+        for result in results:
+            LOGGER.info(result)
+        return results
+
+
+def ping_probe(session, dst_ip, count=3, deadline=5):
+    """
+    Ping from a guest session
+
+    Args:
+        session (object): Guest session (SSHSession or ConsoleSession).
+        dst_ip (str): Destination IP.
+        count (int): Echo requests.
+        deadline (int): ping deadline seconds.
+
+    Returns:
+        tuple: True if any reply was received, average RTT in milliseconds.
+    """
+    output = session.run(command=f"ping -c {count} -w {deadline} {dst_ip}", timeout=deadline + 30).stdout
+    result = LatencyResult.from_ping(output=output)
+    return bool(result.received), result.rtt_avg
+
+
+def render(results, vms):
+    """
+    Render a pass/fail and RTT matrix per network, rows are sources and columns destinations
+
+    Args:
+        results (list): PairResult list.
+        vms (list): VM names, matrix order.
+
+    Returns:
+        str: Matrix text.
+    """
+    vms = list(vms)
+    cells = dict(((i.network, i.src, i.dst), i) for i in results)
+    width = max([len(vm) for vm in vms] + [10])
+    lines = []
+    for network in sorted(set(i.network for i in results)):
+        lines.append(f"{network}:")
+        lines.append(" " * width + " " + " ".join(f"{vm:>{width}}" for vm in vms))
+        for src in vms:
+            row = []
+            for dst in vms:
+                result = cells.get((network, src, dst))
+                if result is None:
+                    row.append(f"{'-':>{width}}")
+                elif result.ok:
+                    row.append(f"{result.rtt if result.rtt is not None else 'ok':>{width}}")
+                else:
+                    row.append(f"{'FAIL':>{width}}")
+            lines.append(f"{src:>{width}} " + " ".join(row))
+    return "\n".join(lines)
+
+
+def failing_node_pairs(results, vms):
+    """
+    Aggregate the failures by (source node, destination node)
+
+    A node pair whose checks all failed points at the nodes (or the path between them), a partially failing
+    pair points at specific VMs.
+
+    Args:
+        results (list): PairResult list.
+        vms (dict): VM name: {"node": node name, ...}.
+
+    Returns:
+        dict: (network, source node, destination node): (failed, total), only pairs with failures.
+    """
+    counts = collections.defaultdict(lambda: [0, 0])
+    for result in results:
+        key = (result.network, vms[result.src].get("node"), vms[result.dst].get("node"))
+        counts[key][1] += 1
+        if not result.ok:
+            counts[key][0] += 1
+    return dict((key, tuple(value)) for key, value in counts.items() if value[0])
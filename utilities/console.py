@@ -1,9 +1,31 @@
 
 import logging
+import re
+import time
 
 import pexpect
 
+from utilities import stream_expect
+
 LOGGER = logging.getLogger(__name__)
+#  Login and prompt patterns per distro, compiled once
+PATTERNS = {
+    "fedora": {
+        "login": re.compile("login:"),
+        "password": re.compile("Password:"),
+        "prompt": re.compile("$"),
+    },
+    "cirros": {
+        "banner": re.compile("login as 'cirros' user. default password: 'gocubsgo'. use 'sudo' for root."),
+        "login": re.compile("login:"),
+        "password": re.compile("Password:"),
+        "prompt": re.compile("\\$"),
+    },
+    "alpine": {
+        "login": re.compile("localhost login:"),
+        "prompt": re.compile("localhost:~#"),
+    },
+}
 
 
 class DistroNotSupported(Exception):
@@ -57,12 +79,13 @@ class Console(object):
         Returns:
             spawn: Spawn object
         """
+        patterns = PATTERNS["fedora"]
         self.child.send("\n\n")
-        self.child.expect("login:")
+        self.child.expect_list([patterns["login"]])
         self.child.sendline(self.username or "fedora")
-        self.child.expect("Password:")
+        self.child.expect_list([patterns["password"]])
         self.child.sendline(self.password or "fedora")
-        self.child.expect("$")
+        self.child.expect_list([patterns["prompt"]])
         if self.child.after:
             LOGGER.error(self.err_msg.format(vm=self.vm, error=self.child.after))
             return False
@@ -76,14 +99,15 @@ class Console(object):
         Returns:
             spawn: Spawn object
         """
+        patterns = PATTERNS["cirros"]
         self.child.send("\n\n")
-        self.child.expect("login as 'cirros' user. default password: 'gocubsgo'. use 'sudo' for root.")
+        self.child.expect_list([patterns["banner"]])
         self.child.send("\n")
-        self.child.expect("login:")
+        self.child.expect_list([patterns["login"]])
         self.child.sendline(self.username or "cirros")
-        self.child.expect("Password:")
+        self.child.expect_list([patterns["password"]])
         self.child.sendline(self.password or "gocubsgo")
-        self.child.expect("\\$")
+        self.child.expect_list([patterns["prompt"]])
         if self.child.after:
             LOGGER.error(self.err_msg.format(vm=self.vm, error=self.child.after))
             return False
@@ -97,10 +121,11 @@ class Console(object):
         Returns:
             spawn: Spawn object
         """
+        patterns = PATTERNS["alpine"]
         self.child.send("\n\n")
-        self.child.expect("localhost login:")
+        self.child.expect_list([patterns["login"]])
         self.child.sendline(self.username or "root")
-        self.child.expect("localhost:~#")
+        self.child.expect_list([patterns["prompt"]])
         if self.child.after:
             LOGGER.error(self.err_msg.format(vm=self.vm, error=self.child.after))
             return False
@@ -115,3 +140,37 @@ class Console(object):
         self.child.send("\n\n")
         self.child.expect("login:")
         self.child.close()
+
+
+def run_framed(child, commands, sinks, timeout):
+    """
+    Run commands in one line, each between nonce markers, pass their output to their sink as it arrives
+
+    Args:
+        child (spawn): Logged in console (Console context).
+        commands (list): Commands to run, the joined line must fit the terminal line limit (4095 characters).
+        sinks (list): func(text) per command, called with consecutive chunks of its output.
+        timeout (int): Time to wait for all the commands.
+
+    Returns:
+        list: (exit code, seconds) per command.
+    """
+    marker = stream_expect.nonce()
+    typed = stream_expect.split_marker(marker)
+    matcher = stream_expect.StreamMatcher(child=child)
+    matcher.sendline(
+        "; ".join(
+            f"echo {typed}_{idx}_BEGIN; {command}; echo {typed}_{idx}_END:$?" for idx, command in enumerate(commands)
+        )
+    )
+    expires = time.monotonic() + timeout
+    results = []
+    for idx, sink in enumerate(sinks):
+        matcher.expect(patterns=[re.compile(f"{marker}_{idx}_BEGIN\r?\n")], timeout=expires - time.monotonic())
+        start = time.monotonic()
+        end = matcher.stream_until(
+            #  The line end marks the last digit, the exit code may arrive split across reads
+            pattern=re.compile(rf"{marker}_{idx}_END:(\d+)\r?\n"), sink=sink, timeout=expires - time.monotonic()
+        )
+        results.append((int(end.group(1)), time.monotonic() - start))
+    return results
@@ -0,0 +1,370 @@
+"""
+Failure diagnostics: cluster Events, VMI phase transitions and (optionally) container logs of the test namespaces
+in a bounded in-memory ring buffer, the slice relevant to a failed test is added to its report.
+"""
+
+import collections
+import logging
+import queue
+import re
+import subprocess
+import threading
+import time
+
+import pytest
+
+from resources import watcher
+from utilities import commands, types, utils
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_SIZE = 5000
+#  Seconds before the test start to include in its slice (events of the module fixtures setup)
+WINDOW_MARGIN = 60
+LAUNCHER_CONTAINER = "compute"
+LAUNCHER_POD_PREFIX = "virt-launcher-"
+#  oc logs --prefix line: "[pod/<name>/<container>] <text>"
+LOG_PREFIX = re.compile(r"\[pod/([^/]+)/([^\]]+)\] ?(.*)")
+
+Record = collections.namedtuple("Record", ("timestamp", "namespace", "kind", "name", "source", "text"))
+''' One captured line: source is event, vmi or the container name of a log line. '''
+
+
+class RingBuffer(object):
+    """
+    Thread safe bounded buffer of records, the oldest records are dropped first.
+    """
+    def __init__(self, size=DEFAULT_SIZE):
+        """
+        Args:
+            size (int): Maximum number of records.
+        """
+        self._records = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        """
+        Args:
+            record (Record): Record.
+        """
+        with self._lock:
+            self._records.append(record)
+
+    def slice(self, start, end, names=None):
+        """
+        Records of a time window
+
+        Args:
+            start (float): Window start, epoch seconds.
+            end (float): Window end, epoch seconds.
+            names (set): Only records of these objects (and of their virt-launcher pods), None for all.
+
+        Returns:
+            list: Records by timestamp.
+        """
+        with self._lock:
+            records = [i for i in self._records if start <= i.timestamp <= end]
+
+        if names:
+            records = [i for i in records if involves(record=i, names=names)]
+        return sorted(records, key=lambda i: i.timestamp)
+
+    def __len__(self):
+        return len(self._records)
+
+
+def involves(record, names):
+    """
+    Args:
+        record (Record): Record.
+        names (set): Objects names.
+
+    Returns:
+        bool: True if the record is about one of the objects or the virt-launcher pod of one of them.
+    """
+    return record.name in names or any(record.name.startswith(f"{LAUNCHER_POD_PREFIX}{i}-") for i in names)
+
+
+def named_in(name, text):
+    """
+    Args:
+        name (str): Object name.
+        text (str): Text, e.g. a failure message.
+
+    Returns:
+        bool: True if the text names the object, as a whole name (vm-fedora-1 is not named by vm-fedora-10).
+    """
+    return re.search(rf"(?<![\w-]){re.escape(name)}(?![\w-])", text) is not None
+
+
+def format_records(records):
+    """
+    Args:
+        records (list): Records.
+
+    Returns:
+        str: One line per record.
+    """
+    return "\n".join(
+        f"{time.strftime('%H:%M:%S', time.localtime(i.timestamp))}.{int(i.timestamp % 1 * 1000):03d} "
+        f"{i.namespace}/{i.kind}/{i.name} [{i.source}] {i.text}"
+        for i in records
+    )
+
+
+class LogFollower(object):
+    """
+    Follow the logs of the pods matching a label selector (oc logs -f) into the ring buffer.
+    """
+    def __init__(self, buffer, namespace, selector, container, tail=0):
+        """
+        Args:
+            buffer (RingBuffer): Buffer.
+            namespace (str): Pods namespace.
+            selector (str): Pods label selector.
+            container (str): Container name.
+            tail (int): Lines of the existing logs to include, -1 for all.
+        """
+        self.buffer = buffer
+        self.namespace = namespace
+        self.selector = selector
+        self.container = container
+        self.tail = tail
+        self._proc = None
+
+    def start(self):
+        cmd = commands.oc_args(
+            command=(
+                f"logs -f --prefix --tail={self.tail} --max-log-requests=20 -l {self.selector} -c {self.container}"
+            ),
+            namespace=self.namespace
+        )
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, errors="replace"
+        )
+        threading.Thread(target=self._read, name=f"logs-{self.selector}", daemon=True).start()
+
+    def stop(self):
+        if self._proc and self._proc.poll() is None:
+            self._proc.terminate()
+
+    def _read(self):
+        """
+        Read log lines until oc exits (stopped or all pods gone)
+        """
+        for line in self._proc.stdout:
+            match = LOG_PREFIX.match(line.rstrip("\n"))
+            if match:
+                pod, container, text = match.groups()
+                self.buffer.append(
+                    Record(
+                        timestamp=time.time(), namespace=self.namespace, kind=types.POD, name=pod, source=container,
+                        text=text
+                    )
+                )
+
+
+class ClusterEventsCollector(object):
+    """
+    Collect the Events and VMI phase transitions of namespaces, from one Events watch per namespace and the shared
+    VMI watcher the VMI waits use, and optionally the virt-launcher logs of the VMIs.
+
+    Examples:
+        collector = ClusterEventsCollector(size=5000)
+        collector.start(namespaces=["cnv-network-ns"])
+        ...
+        print(format_records(collector.buffer.slice(start=test_start, end=time.time(), names={"vm-fedora-1"})))
+    """
+    def __init__(self, size=DEFAULT_SIZE, follow_logs=False):
+        """
+        Args:
+            size (int): Ring buffer size (records).
+            follow_logs (bool): True to follow the virt-launcher compute container logs of the VMIs.
+        """
+        self.buffer = RingBuffer(size=size)
+        self.follow_logs = follow_logs
+        self.started = False
+        self._watchers = []
+        self._followers = {}
+        self._events = {}
+        self._phases = {}
+        self._lock = threading.Lock()
+        self._pending_logs = queue.Queue()
+        ''' add_logs() arguments of the followers to start, out of the watcher callbacks (they hold its lock). '''
+        self._starter = None
+
+    def start(self, namespaces):
+        """
+        Start collecting
+
+        Args:
+            namespaces (list): Namespaces names.
+        """
+        for namespace in namespaces:
+            events = watcher.get_watcher(api_version=types.API_VERSION_V1, kind=types.EVENT, namespace=namespace)
+            vmis = watcher.get_watcher(api_version=types.CNV_API_VERSION, kind=types.VMI, namespace=namespace)
+            events.subscribe(callback=self._on_event)
+            vmis.subscribe(callback=self._on_vmi)
+            self._watchers.extend(((events, self._on_event), (vmis, self._on_vmi)))
+        if self.follow_logs and not self._starter:
+            self._starter = threading.Thread(target=self._start_logs, name="logs-starter", daemon=True)
+            self._starter.start()
+        self.started = True
+
+    def stop(self):
+        """
+        Stop collecting, the shared watchers keep running for their other users
+        """
+        for watcher_, callback in self._watchers:
+            watcher_.unsubscribe(callback=callback)
+
+        if self._starter:
+            self._pending_logs.put(None)
+            self._starter.join()
+            self._starter = None
+
+        with self._lock:
+            for follower in self._followers.values():
+                follower.stop()
+            self._followers.clear()
+        self._watchers = []
+        self.started = False
+
+    def _start_logs(self):
+        """
+        Start the requested log followers (oc subprocesses) until stopped
+        """
+        while True:
+            kwargs = self._pending_logs.get()
+            if kwargs is None:
+                return
+            try:
+                self.add_logs(**kwargs)
+            except Exception as exp:
+                LOGGER.warning(f"Failed to follow {kwargs['container']} logs of {kwargs['namespace']}: {exp!r}")
+
+    def add_logs(self, namespace, selector, container, tail=0):
+        """
+        Follow the logs of pods
+
+        Args:
+            namespace (str): Pods namespace.
+            selector (str): Pods label selector.
+            container (str): Container name.
+            tail (int): Lines of the existing logs to include, -1 for all.
+        """
+        key = (namespace, selector, container)
+        with self._lock:
+            if key in self._followers:
+                return
+
+            follower = LogFollower(
+                buffer=self.buffer, namespace=namespace, selector=selector, container=container, tail=tail
+            )
+            self._followers[key] = follower
+        LOGGER.info(f"Following {container} logs of {namespace}/{selector}")
+        follower.start()
+
+    def _on_event(self, event_type, obj, timestamp):
+        """
+        Record new Events and new occurrences of Events (count increments)
+        """
+        metadata = obj['metadata']
+        if event_type == 'DELETED':
+            self._events.pop(metadata['uid'], None)
+            return
+
+        count = obj.get('count') or 1
+        if self._events.get(metadata['uid']) == count:
+            #  Already recorded, re-list or unrelated update
+            return
+
+        self._events[metadata['uid']] = count
+        involved = obj.get('involvedObject') or {}
+        repeated = f" (x{count})" if count > 1 else ""
+        self.buffer.append(
+            Record(
+                timestamp=utils.parse_timestamp(
+                    obj.get('lastTimestamp') or obj.get('firstTimestamp') or metadata.get('creationTimestamp')
+                ) or timestamp,
+                namespace=metadata.get('namespace'),
+                kind=involved.get('kind'),
+                name=involved.get('name'),
+                source="event",
+                text=f"{obj.get('type')} {obj.get('reason')}: {obj.get('message')}{repeated}",
+            )
+        )
+
+    def _on_vmi(self, event_type, obj, timestamp):
+        """
+        Record VMI phase transitions, follow the VMI virt-launcher logs once it is scheduled
+        """
+        metadata = obj['metadata']
+        key = (metadata.get('namespace'), metadata['name'])
+        phase = 'Deleted' if event_type == 'DELETED' else (obj.get('status') or {}).get('phase')
+        previous = self._phases.get(key)
+        if phase == previous:
+            return
+
+        if event_type == 'DELETED':
+            self._phases.pop(key, None)
+        else:
+            self._phases[key] = phase
+
+        node = (obj.get('status') or {}).get('nodeName')
+        on_node = f" on {node}" if node else ""
+        self.buffer.append(
+            Record(
+                timestamp=timestamp, namespace=key[0], kind=types.VMI, name=key[1], source="vmi",
+                text=f"phase {previous or '-'} -> {phase}{on_node}",
+            )
+        )
+        if self.follow_logs and phase in (types.RUNNING, 'Scheduled'):
+            #  Started by the starter thread, a subprocess start here would block every subscriber of the watch
+            self._pending_logs.put({
+                "namespace": key[0], "selector": f"kubevirt.io/created-by={metadata['uid']}",
+                "container": LAUNCHER_CONTAINER, "tail": -1,
+            })
+
+
+class DiagnosticsPlugin(object):
+    """
+    pytest plugin: add the captured cluster records of a failed test to its report.
+
+    The slice is the test time window (from WINDOW_MARGIN seconds before its setup), narrowed to the objects named
+    in the failure message if any is.
+    """
+    def __init__(self, collector, margin=WINDOW_MARGIN):
+        """
+        Args:
+            collector (ClusterEventsCollector): Collector, started by the session setup.
+            margin (int): Seconds before the test start to include.
+        """
+        self.collector = collector
+        self.margin = margin
+        self._starts = {}
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self._starts[nodeid] = time.time()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if not report.failed or not self.collector.started:
+            return
+
+        start = self._starts.get(item.nodeid, call.start) - self.margin
+        records = self.collector.buffer.slice(start=start, end=time.time())
+        #  The exception message, the traceback source lines name every object of the test
+        failure = str(call.excinfo.value) if call.excinfo else report.longreprtext
+        names = set(i.name for i in records if i.name and named_in(name=i.name, text=failure))
+        if names:
+            records = [i for i in records if involves(record=i, names=names)]
+
+        if records:
+            scope = f" of {', '.join(sorted(names))}" if names else ""
+            report.sections.append((f"Cluster events{scope}", format_records(records=records)))
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.collector.stop()
@@ -0,0 +1,280 @@
+"""
+Tests and fixtures durations history and longest-first scheduling.
+"""
+
+import collections
+import heapq
+import logging
+import os
+import re
+import sqlite3
+import statistics
+import time
+
+import pytest
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_DB = ".cnv-tests-durations.sqlite"
+HISTORY_SIZE = 5
+TEST = "test"
+FIXTURE = "fixture"
+XDIST_GROUP_PREFIX = "cnv-worker"
+#  "@<group>" xdist appends to the node ids of xdist_group tests under --dist loadgroup
+XDIST_GROUP_SUFFIX = re.compile(r"@[^@\]/:]*$")
+
+
+class DurationsStore(object):
+    """
+    Local sqlite store of tests and fixtures durations over past runs.
+    """
+    def __init__(self, path=DEFAULT_DB):
+        """
+        Args:
+            path (str): sqlite DB file path.
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS durations ("
+                "kind TEXT NOT NULL, name TEXT NOT NULL, scope TEXT, duration REAL NOT NULL, "
+                "run_id TEXT, timestamp REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS durations_name ON durations (kind, name)")
+
+    def _connect(self):
+        """
+        Returns:
+            sqlite3.Connection: DB connection (xdist workers write concurrently, wait on locks).
+        """
+        return sqlite3.connect(self.path, timeout=60)
+
+    def record(self, records, run_id=None):
+        """
+        Store durations
+
+        Args:
+            records (list): (kind, name, scope, duration) tuples.
+            run_id (str): Test run id.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO durations (kind, name, scope, duration, run_id, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                [(kind, name, scope, duration, run_id, now) for kind, name, scope, duration in records]
+            )
+
+    def estimates(self, kind, history=HISTORY_SIZE):
+        """
+        Get expected durations, the median of the last runs
+
+        Args:
+            kind (str): TEST or FIXTURE.
+            history (int): Number of last runs to consider.
+
+        Returns:
+            dict: name: (scope, expected duration in seconds).
+        """
+        samples = collections.defaultdict(list)
+        scopes = {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name, scope, duration FROM durations WHERE kind = ? ORDER BY timestamp DESC", (kind,)
+            )
+            for name, scope, duration in rows:
+                if len(samples[name]) < history:
+                    samples[name].append(duration)
+                    scopes[name] = scope
+        return dict((name, (scopes[name], statistics.median(values))) for name, values in samples.items())
+
+
+def base_nodeid(nodeid):
+    """
+    Args:
+        nodeid (str): Test node id.
+
+    Returns:
+        str: The node id without the xdist group suffix, the same with and without --dist loadgroup.
+    """
+    return XDIST_GROUP_SUFFIX.sub("", nodeid)
+
+
+def module_of(nodeid):
+    """
+    Args:
+        nodeid (str): Test node id.
+
+    Returns:
+        str: Test module node id.
+    """
+    return nodeid.split("::")[0]
+
+
+def predict_modules(nodeids, test_estimates):
+    """
+    Predict each test module duration
+
+    Tests without history are estimated with the median of the known tests.
+
+    Args:
+        nodeids (list): Tests node ids.
+        test_estimates (dict): Test node id: (scope, duration) from DurationsStore.estimates().
+
+    Returns:
+        OrderedDict: Module node id: predicted duration, longest first.
+    """
+    known = [duration for _, duration in test_estimates.values()]
+    default = statistics.median(known) if known else 1.0
+    modules = collections.defaultdict(float)
+    for nodeid in nodeids:
+        nodeid = base_nodeid(nodeid=nodeid)
+        modules[module_of(nodeid)] += test_estimates.get(nodeid, (None, default))[1]
+    return collections.OrderedDict(sorted(modules.items(), key=lambda item: item[1], reverse=True))
+
+
+def balance(modules, workers):
+    """
+    Assign whole modules to workers, longest processing time first
+
+    Modules are never split so module scoped fixtures are set up on one worker only.
+
+    Args:
+        modules (OrderedDict): Module: predicted duration, longest first (from predict_modules()).
+        workers (int): Number of workers.
+
+    Returns:
+        tuple: Module: worker index dict, list of predicted load per worker.
+    """
+    loads = [(0.0, idx) for idx in range(workers)]
+    assignment = {}
+    for module, duration in modules.items():
+        load, idx = heapq.heappop(loads)
+        assignment[module] = idx
+        heapq.heappush(loads, (load + duration, idx))
+    per_worker = [0.0] * workers
+    for load, idx in loads:
+        per_worker[idx] = load
+    return assignment, per_worker
+
+
+class DurationsPlugin(object):
+    """
+    pytest plugin: record tests and fixtures durations, order and balance tests longest first.
+
+    Under xdist the controller records tests durations (it gets all reports) and workers record the fixtures
+    durations they measured.
+    """
+    def __init__(self, config, store, run_id=None, schedule=False):
+        """
+        Args:
+            config (Config): pytest config.
+            store (DurationsStore): Durations store.
+            run_id (str): Test run id.
+            schedule (bool): True to reorder and balance tests by their durations history.
+        """
+        self.config = config
+        self.store = store
+        self.run_id = run_id
+        self.schedule = schedule
+        self.is_worker = hasattr(config, "workerinput")
+        self.tests = collections.defaultdict(float)
+        self.fixtures = []
+        self._reported = False
+
+    def workers(self):
+        """
+        Returns:
+            int: Number of xdist workers, 1 without xdist.
+        """
+        if self.is_worker:
+            return int(self.config.workerinput.get("workercount", 1))
+        return 1
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        start = time.perf_counter()
+        yield
+        self.fixtures.append(
+            (
+                FIXTURE, f"{base_nodeid(nodeid=request.node.nodeid)}::{fixturedef.argname}", fixturedef.scope,
+                time.perf_counter() - start
+            )
+        )
+
+    def pytest_runtest_logreport(self, report):
+        if self.is_worker:
+            return
+
+        #  setup + call + teardown, setup includes module fixtures set up for the module first test
+        self.tests[base_nodeid(nodeid=report.nodeid)] += report.duration
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        if not self.schedule:
+            return
+
+        test_estimates = self.store.estimates(kind=TEST)
+        modules = predict_modules(nodeids=[i.nodeid for i in items], test_estimates=test_estimates)
+        order = dict((module, idx) for idx, module in enumerate(modules))
+        #  Stable sort, tests order inside a module is kept (incremental tests depend on it)
+        items.sort(key=lambda item: order[module_of(item.nodeid)])
+        workers = self.workers()
+        if workers > 1:
+            assignment, _ = balance(modules=modules, workers=workers)
+            for item in items:
+                item.add_marker(pytest.mark.xdist_group(f"{XDIST_GROUP_PREFIX}-{assignment[module_of(item.nodeid)]}"))
+
+    def pytest_report_collectionfinish(self, config, items):
+        return self._prediction_lines(nodeids=[i.nodeid for i in items], workers=1)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        if self._reported:
+            return
+
+        self._reported = True
+        terminal = self.config.pluginmanager.get_plugin("terminalreporter")
+        workers = int(node.workerinput.get("workercount", 1))
+        for line in self._prediction_lines(nodeids=ids, workers=workers):
+            terminal.write_line(line)
+
+    def _prediction_lines(self, nodeids, workers):
+        """
+        Args:
+            nodeids (list): Collected tests node ids.
+            workers (int): Number of workers.
+
+        Returns:
+            list: Predicted runtime report lines.
+        """
+        test_estimates = self.store.estimates(kind=TEST)
+        if not test_estimates:
+            return ["durations history: empty, no runtime prediction"]
+
+        modules = predict_modules(nodeids=nodeids, test_estimates=test_estimates)
+        known = len([i for i in nodeids if base_nodeid(nodeid=i) in test_estimates])
+        lines = [f"durations history: {known}/{len(nodeids)} tests known, predicted serial runtime "
+                 f"{sum(modules.values()):.0f}s"]
+        if workers > 1:
+            _, loads = balance(modules=modules, workers=workers)
+            lines.append(f"predicted runtime on {workers} workers: {max(loads):.0f}s (longest worker)")
+
+        fixtures = sorted(self.store.estimates(kind=FIXTURE).items(), key=lambda item: item[1][1], reverse=True)
+        for name, (scope, duration) in fixtures[:5]:
+            lines.append(f"  {duration:8.1f}s  {scope:8} fixture {name}")
+        return lines
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        records = [(TEST, nodeid, "function", duration) for nodeid, duration in self.tests.items()]
+        records.extend(self.fixtures)
+        if records:
+            self.store.record(records=records, run_id=self.run_id)
+
+
+def durations_db_path(config):
+    """
+    Args:
+        config (Config): pytest config.
+
+    Returns:
+        str: Durations DB path from --durations-db, relative paths are relative to the rootdir.
+    """
+    return os.path.join(str(config.rootpath), config.getoption("--durations-db"))
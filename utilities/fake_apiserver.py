@@ -0,0 +1,529 @@
+"""
+Local fake Kubernetes API server: in-memory objects of the kinds the resource layer uses, discovery, CRUD, merge
+patch, apply and watch, enough to run the resource layer and the multi cluster runner without a cluster.
+
+Objects are stored as sent, no controller runs (namespaces are Active on creation, VMs never boot).
+
+Run one from the repository root:
+    python -m utilities.fake_apiserver --kubeconfig /tmp/fake/kubeconfig
+"""
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+import uuid
+
+from resources import manifests
+from utilities import types
+
+LOGGER = logging.getLogger(__name__)
+#  (group, version, plural, kind, namespaced)
+RESOURCES = (
+    ("", "v1", "namespaces", types.NAMESPACE, False),
+    ("", "v1", "nodes", types.NODE, False),
+    ("", "v1", "pods", types.POD, True),
+    ("", "v1", "events", types.EVENT, True),
+    ("", "v1", "configmaps", "ConfigMap", True),
+    ("kubevirt.io", "v1alpha3", "virtualmachines", types.VM, True),
+    ("kubevirt.io", "v1alpha3", "virtualmachineinstances", types.VMI, True),
+    ("k8s.cni.cncf.io", "v1", "network-attachment-definitions", "NetworkAttachmentDefinition", True),
+)
+VERBS = ["create", "delete", "get", "list", "patch", "update", "watch"]
+MAX_WATCH_SECONDS = 60
+
+
+class ApiError(Exception):
+    """
+    API error, answered as a Status object.
+    """
+    def __init__(self, code, reason, message):
+        super(ApiError, self).__init__(message)
+        self.code = code
+        self.reason = reason
+        self.message = message
+
+    def status(self):
+        return {
+            "kind": "Status", "apiVersion": "v1", "metadata": {}, "status": "Failure", "message": self.message,
+            "reason": self.reason, "code": self.code,
+        }
+
+
+def merge_patch(target, patch):
+    """
+    Apply a JSON merge patch (RFC 7386)
+
+    Args:
+        target (dict): Object, not modified.
+        patch (dict): Patch, None values delete fields.
+
+    Returns:
+        dict: Patched object.
+    """
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(target=result.get(key), patch=value)
+    return result
+
+
+def match_labels(labels, selector):
+    """
+    Args:
+        labels (dict): Object labels.
+        selector (str): Label selector, equality based (k=v, k==v, k!=v, k, !k).
+
+    Returns:
+        bool: True if the labels match.
+    """
+    for requirement in filter(None, (i.strip() for i in (selector or "").split(","))):
+        if "!=" in requirement:
+            key, value = requirement.split("!=", 1)
+            if labels.get(key) == value:
+                return False
+        elif "=" in requirement:
+            key, value = requirement.replace("==", "=").split("=", 1)
+            if labels.get(key) != value:
+                return False
+        elif requirement.startswith("!"):
+            if requirement[1:] in labels:
+                return False
+        elif requirement not in labels:
+            return False
+    return True
+
+
+class Store(object):
+    """
+    In-memory objects with a global resourceVersion and an events log for watches.
+    """
+    def __init__(self):
+        self.objects = dict((resource, {}) for resource in RESOURCES)
+        ''' Resource: (namespace, name): object. '''
+        self.events = []
+        ''' (resourceVersion, resource, event type, object), in order. '''
+        self.resource_version = 0
+        self.cond = threading.Condition()
+
+    def _commit(self, resource, event_type, obj):
+        """
+        Bump the resourceVersion, log the event, with the lock held
+
+        Returns:
+            dict: The object with its new resourceVersion.
+        """
+        self.resource_version += 1
+        obj = dict(obj, metadata=dict(obj["metadata"], resourceVersion=str(self.resource_version)))
+        self.events.append((self.resource_version, resource, event_type, obj))
+        self.cond.notify_all()
+        return obj
+
+    def create(self, resource, namespace, obj):
+        metadata = dict(obj.get("metadata") or {})
+        if not metadata.get("name"):
+            if not metadata.get("generateName"):
+                raise ApiError(code=422, reason="Invalid", message="metadata.name: Required value")
+            metadata["name"] = f"{metadata['generateName']}{uuid.uuid4().hex[:5]}"
+
+        group, version, _, kind, namespaced = resource
+        key = (namespace if namespaced else None, metadata["name"])
+        metadata.update(
+            uid=str(uuid.uuid4()), creationTimestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        )
+        if namespaced:
+            metadata["namespace"] = namespace
+
+        obj = dict(obj, apiVersion=f"{group}/{version}" if group else version, kind=kind, metadata=metadata)
+        if kind == types.NAMESPACE:
+            obj["status"] = {"phase": types.ACTIVE}
+
+        with self.cond:
+            if key in self.objects[resource]:
+                raise ApiError(code=409, reason="AlreadyExists", message=f"{kind} {key[1]} already exists")
+            if namespaced and (None, namespace) not in self.objects[RESOURCES[0]]:
+                raise ApiError(code=404, reason="NotFound", message=f"namespaces {namespace} not found")
+            obj = self._commit(resource=resource, event_type="ADDED", obj=obj)
+            self.objects[resource][key] = obj
+        return obj
+
+    def get(self, resource, namespace, name):
+        obj = self.objects[resource].get((namespace if resource[4] else None, name))
+        if obj is None:
+            raise ApiError(code=404, reason="NotFound", message=f"{resource[2]} {name} not found")
+        return obj
+
+    def list(self, resource, namespace=None, label_selector=None):
+        with self.cond:
+            items = [
+                obj for (obj_namespace, _), obj in self.objects[resource].items()
+                if (namespace is None or obj_namespace == namespace)
+                and match_labels(labels=obj["metadata"].get("labels") or {}, selector=label_selector)
+            ]
+            return items, str(self.resource_version)
+
+    def update(self, resource, namespace, name, func):
+        """
+        Args:
+            func (function): func(existing object) -> new object.
+        """
+        with self.cond:
+            existing = self.get(resource=resource, namespace=namespace, name=name)
+            obj = func(existing)
+            metadata = dict(obj.get("metadata") or {})
+            metadata.update(
+                (i, existing["metadata"][i]) for i in ("name", "namespace", "uid", "creationTimestamp")
+                if i in existing["metadata"]
+            )
+            obj = self._commit(resource=resource, event_type="MODIFIED", obj=dict(obj, metadata=metadata))
+            self.objects[resource][(namespace if resource[4] else None, name)] = obj
+            return obj
+
+    def delete(self, resource, namespace, name):
+        with self.cond:
+            obj = self.get(resource=resource, namespace=namespace, name=name)
+            del self.objects[resource][(namespace if resource[4] else None, name)]
+            obj = self._commit(resource=resource, event_type="DELETED", obj=obj)
+            if resource[3] == types.NAMESPACE:
+                for other in RESOURCES:
+                    for key in [i for i in self.objects[other] if other[4] and i[0] == name]:
+                        self._commit(resource=other, event_type="DELETED", obj=self.objects[other].pop(key))
+            return obj
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    One API request, the server holds the Store.
+    """
+    #  Keep-alive and chunked watch streams, clients read watch events as they arrive
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        LOGGER.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self):
+        """
+        Returns:
+            tuple: Resource, namespace, name, query, discovery response (the others are None) or None.
+        """
+        url = urllib.parse.urlparse(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        parts = [i for i in url.path.split("/") if i]
+        discovery = self.server.discovery(parts=parts)
+        if discovery is not None:
+            return None, None, None, query, discovery
+
+        if parts[:1] == ["api"]:
+            group, version, rest = "", parts[1], parts[2:]
+        elif parts[:1] == ["apis"] and len(parts) > 3:
+            group, version, rest = parts[1], parts[2], parts[3:]
+        else:
+            raise ApiError(code=404, reason="NotFound", message=f"{url.path} not found")
+
+        namespace = None
+        if len(rest) >= 3 and rest[0] == "namespaces":
+            namespace, rest = rest[1], rest[2:]
+
+        resource = next((i for i in RESOURCES if i[:3] == (group, version, rest[0])), None)
+        if not resource or len(rest) > 2:
+            raise ApiError(code=404, reason="NotFound", message=f"{url.path} not found")
+        return resource, namespace, rest[1] if len(rest) > 1 else None, query, None
+
+    def _handle(self, method):
+        try:
+            resource, namespace, name, query, discovery = self._route()
+            store = self.server.store
+            if discovery is not None:
+                return self._send(code=200, body=discovery)
+
+            if method == "GET" and name:
+                return self._send(code=200, body=store.get(resource=resource, namespace=namespace, name=name))
+
+            if method == "GET" and query.get("watch") in ("true", "1"):
+                return self._watch(resource=resource, namespace=namespace, query=query)
+
+            if method == "GET":
+                items, resource_version = store.list(
+                    resource=resource, namespace=namespace, label_selector=query.get("labelSelector")
+                )
+                group, version, _, kind, _ = resource
+                return self._send(code=200, body={
+                    "kind": f"{kind}List", "apiVersion": f"{group}/{version}" if group else version,
+                    "metadata": {"resourceVersion": resource_version}, "items": items,
+                })
+
+            if method == "POST":
+                return self._send(code=201, body=store.create(resource=resource, namespace=namespace, obj=self._body()))
+
+            if method == "PUT":
+                body = self._body()
+                return self._send(code=200, body=store.update(
+                    resource=resource, namespace=namespace, name=name, func=lambda existing: body
+                ))
+
+            if method == "PATCH":
+                content_type = self.headers.get("Content-Type", "")
+                if "json-patch" in content_type:
+                    raise ApiError(code=415, reason="UnsupportedMediaType", message="json-patch is not supported")
+
+                patch = self._body()
+                try:
+                    return self._send(code=200, body=store.update(
+                        resource=resource, namespace=namespace, name=name,
+                        func=lambda existing: merge_patch(target=existing, patch=patch)
+                    ))
+                except ApiError as exp:
+                    if exp.code != 404 or "apply-patch" not in content_type:
+                        raise
+                    #  Server side apply creates missing objects
+                    return self._send(code=201, body=store.create(resource=resource, namespace=namespace, obj=patch))
+
+            if method == "DELETE":
+                return self._send(code=200, body=store.delete(resource=resource, namespace=namespace, name=name))
+
+            raise ApiError(code=405, reason="MethodNotAllowed", message=f"{method} is not supported")
+        except ApiError as exp:
+            self._send(code=exp.code, body=exp.status())
+
+    def _watch(self, resource, namespace, query):
+        """
+        Stream the events after the requested resourceVersion until timeoutSeconds
+        """
+        store = self.server.store
+        timeout = min(float(query.get("timeoutSeconds") or MAX_WATCH_SECONDS), MAX_WATCH_SECONDS)
+        expires = time.monotonic() + timeout
+        resource_version = int(query.get("resourceVersion") or store.resource_version)
+        selector = query.get("labelSelector")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        while not self.server.stopped.is_set():
+            with store.cond:
+                events = [
+                    (rv, event_type, obj) for rv, event_resource, event_type, obj in store.events
+                    if rv > resource_version and event_resource == resource
+                    and (namespace is None or obj["metadata"].get("namespace") == namespace)
+                    and match_labels(labels=obj["metadata"].get("labels") or {}, selector=selector)
+                ]
+                remaining = expires - time.monotonic()
+                if not events and remaining > 0:
+                    store.cond.wait(timeout=min(remaining, 1))
+                    continue
+
+            for rv, event_type, obj in events:
+                resource_version = rv
+                line = json.dumps({"type": event_type, "object": obj}).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            if expires - time.monotonic() <= 0:
+                break
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        self._handle(method="GET")
+
+    def do_POST(self):
+        self._handle(method="POST")
+
+    def do_PUT(self):
+        self._handle(method="PUT")
+
+    def do_PATCH(self):
+        self._handle(method="PATCH")
+
+    def do_DELETE(self):
+        self._handle(method="DELETE")
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store, definitions):
+        super(_Server, self).__init__(address, _Handler)
+        self.store = store
+        self.definitions = definitions
+        self.stopped = threading.Event()
+
+    def discovery(self, parts):
+        """
+        Args:
+            parts (list): URL path parts.
+
+        Returns:
+            dict: Discovery response, None if the path is not a discovery path.
+        """
+        if parts == ["version"]:
+            return {"major": "1", "minor": "16", "gitVersion": "v1.16.0-fake", "platform": "linux/amd64"}
+
+        if parts == ["openapi", "v2"]:
+            return {"swagger": "2.0", "info": {"title": "fake", "version": "v1"}, "paths": {},
+                    "definitions": self.definitions}
+
+        if parts == ["api"]:
+            return {"kind": "APIVersions", "versions": ["v1"], "serverAddressByClientCIDRs": []}
+
+        groups = {}
+        for group, version, _, _, _ in RESOURCES:
+            if group:
+                groups.setdefault(group, [])
+                if version not in groups[group]:
+                    groups[group].append(version)
+
+        if parts == ["apis"]:
+            return {"kind": "APIGroupList", "apiVersion": "v1", "groups": [
+                {
+                    "name": group,
+                    "versions": [{"groupVersion": f"{group}/{i}", "version": i} for i in versions],
+                    "preferredVersion": {"groupVersion": f"{group}/{versions[0]}", "version": versions[0]},
+                } for group, versions in groups.items()
+            ]}
+
+        if parts[:1] == ["api"] and len(parts) == 2:
+            group, version = "", parts[1]
+        elif parts[:1] == ["apis"] and len(parts) == 3:
+            group, version = parts[1], parts[2]
+        else:
+            return None
+
+        return {
+            "kind": "APIResourceList", "apiVersion": "v1",
+            "groupVersion": f"{group}/{version}" if group else version,
+            "resources": [
+                {"name": plural, "singularName": kind.lower(), "namespaced": namespaced, "kind": kind, "verbs": VERBS}
+                for resource_group, resource_version, plural, kind, namespaced in RESOURCES
+                if (resource_group, resource_version) == (group, version)
+            ],
+        }
+
+
+class FakeAPIServer(object):
+    """
+    Fake API server on a local port, with a node.
+
+    Examples:
+        with FakeAPIServer() as server:
+            server.write_kubeconfig(path="/tmp/fake/kubeconfig")
+            context = ClusterContext(kubeconfig="/tmp/fake/kubeconfig")
+    """
+    def __init__(self, host="127.0.0.1", port=0, nodes=1, schemas_file=None):
+        """
+        Args:
+            host (str): Listen address.
+            port (int): Listen port, 0 for a free port.
+            nodes (int): Number of Ready nodes to add.
+            schemas_file (str): OpenAPI definitions served on /openapi/v2, the cached manifests schemas if not set
+                (none if they were not cached).
+        """
+        self.store = Store()
+        schemas_file = schemas_file or manifests.SCHEMAS_FILE
+        definitions = {}
+        if os.path.exists(schemas_file):
+            with open(schemas_file) as fd:
+                definitions = json.load(fd)["definitions"]
+        self._server = _Server(address=(host, port), store=self.store, definitions=definitions)
+        self._thread = None
+        for idx in range(nodes):
+            self.add(resource=RESOURCES[1], obj={
+                "metadata": {"name": f"fake-node-{idx}", "labels": {"kubernetes.io/hostname": f"fake-node-{idx}"}},
+                "status": {
+                    "addresses": [{"type": "InternalIP", "address": f"192.0.2.{idx + 1}"}],
+                    "conditions": [{"type": "Ready", "status": "True"}],
+                },
+            })
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add(self, resource, obj, namespace=None):
+        """
+        Add an object
+
+        Args:
+            resource (tuple): RESOURCES entry.
+            obj (dict): Object.
+            namespace (str): Namespace of a namespaced object.
+
+        Returns:
+            dict: Stored object.
+        """
+        return self.store.create(resource=resource, namespace=namespace, obj=obj)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-apiserver", daemon=True)
+        self._thread.start()
+        LOGGER.info(f"Fake API server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def write_kubeconfig(self, path, name="fake"):
+        """
+        Args:
+            path (str): kubeconfig path.
+            name (str): Cluster, user and context name.
+
+        Returns:
+            str: kubeconfig path.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        kubeconfig = {
+            "apiVersion": "v1", "kind": "Config", "current-context": name,
+            "clusters": [{"name": name, "cluster": {"server": self.url}}],
+            "users": [{"name": name, "user": {"token": "fake"}}],
+            "contexts": [{"name": name, "context": {"cluster": name, "user": name, "namespace": "default"}}],
+        }
+        with open(path, "w") as fd:
+            #  JSON is YAML
+            json.dump(kubeconfig, fd, indent=2)
+        return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Kubernetes API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--kubeconfig", help="Write a kubeconfig of the server to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fake_server = FakeAPIServer(host=args.host, port=args.port).start()
+    if args.kubeconfig:
+        print(f"kubeconfig: {fake_server.write_kubeconfig(path=args.kubeconfig)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake_server.stop()
@@ -0,0 +1,129 @@
+"""
+Guest command execution: structured results (stdout, exit code, duration) over guest sessions.
+"""
+
+import logging
+
+from utilities import console, stream_expect
+from utilities.commands import CommandResult
+
+LOGGER = logging.getLogger(__name__)
+TIMEOUT = 60
+
+
+class ConsoleSession(object):
+    """
+    Guest session over the VM serial console.
+
+    Examples:
+        with ConsoleSession(vm="vm-fedora-1", namespace="cnv-network-ns") as session:
+            result = session.run(command="ping -w 3 192.168.0.2")
+            assert result.ok, result.stdout
+    """
+    def __init__(self, vm, namespace=None, distro="fedora", username=None, password=None):
+        """
+        Args:
+            vm (str): VM name.
+            namespace (str): VM namespace.
+            distro (str): Distro name (fedora, cirros, alpine).
+            username (str): Username for login.
+            password (str): Password for login.
+        """
+        self.vm = vm
+        self.console = console.Console(
+            vm=vm, distro=distro, username=username, password=password, namespace=namespace
+        )
+        self.child = None
+
+    def __enter__(self):
+        self.child = self.console.__enter__()
+        assert self.child, f"Failed to login to {self.vm} console"
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.console.__exit__(exc_type, exc_val, exc_tb)
+
+    def run(self, command, timeout=TIMEOUT):
+        """
+        Run a command
+
+        Args:
+            command (str): Command.
+            timeout (int): Time to wait for the command.
+
+        Returns:
+            CommandResult: Result, stdout holds stdout and stderr.
+        """
+        return self.run_batch(commands=[command], timeout=timeout)[0]
+
+    def run_batch(self, commands, timeout=TIMEOUT):
+        """
+        Run commands in one round-trip, one after the other
+
+        Args:
+            commands (list): Commands.
+            timeout (int): Time to wait for all of them.
+
+        Returns:
+            list: CommandResult per command.
+        """
+        outputs = [[] for _ in commands]
+        results = console.run_framed(
+            child=self.child,
+            commands=[f"{{ {command}; }} 2>&1" for command in commands],
+            sinks=[output.append for output in outputs],
+            timeout=timeout
+        )
+        return [
+            CommandResult(command=command, rc=rc, stdout="".join(output).replace("\r", ""), duration=duration)
+            for command, output, (rc, duration) in zip(commands, outputs, results)
+        ]
+
+    def run_json(self, command, timeout=TIMEOUT):
+        """
+        Run a command with JSON output, parsed as it streams
+
+        Args:
+            command (str): Command.
+            timeout (int): Time to wait for the command.
+
+        Returns:
+            dict: The first JSON object the command printed.
+
+        Raises:
+            ValueError: If the command printed no JSON object.
+        """
+        extractor = stream_expect.JsonStreamExtractor()
+        console.run_framed(child=self.child, commands=[command], sinks=[extractor.feed], timeout=timeout)
+        if not extractor.objects:
+            raise ValueError(f"{self.vm}: no JSON output from {command}")
+        return extractor.objects[0]
+
+
+def session(vm, namespace=None, host=None, key_filename=None, proxy_command=None, **console_kwargs):
+    """
+    Guest session over SSH when the guest address and key are known and paramiko is installed, else over the
+    serial console
+
+    Args:
+        vm (str): VM name.
+        namespace (str): VM namespace.
+        host (str): Guest address (VM pod IP).
+        key_filename (str): Private key file, its public key injected through cloud-init, None to use the console
+            (SSH is opt-in, the guest must be reachable from the test host).
+        proxy_command (str): SSH proxy command, formatted with vm, namespace and host.
+        console_kwargs (dict): ConsoleSession arguments (distro, username, password).
+
+    Returns:
+        object: SSHSession or ConsoleSession, not entered yet.
+    """
+    #  ssh imports this module for CommandResult
+    from utilities import ssh
+
+    if ssh.AVAILABLE and host and key_filename:
+        if proxy_command:
+            proxy_command = proxy_command.format(vm=vm, namespace=namespace, host=host)
+        return ssh.SSHSession(host=host, key_filename=key_filename, proxy_command=proxy_command)
+
+    LOGGER.info(f"{vm}: no SSH to the guest, using the console")
+    return ConsoleSession(vm=vm, namespace=namespace, **console_kwargs)
@@ -0,0 +1,127 @@
+"""
+Startup benchmark: import time of modules (python -X importtime) and test collection time.
+
+Run from the repository root:
+    python -m utilities.import_time resources.resource utilities.utils --collect tests --budget 1
+"""
+
+import argparse
+import logging
+import re
+import subprocess
+import sys
+import time
+
+LOGGER = logging.getLogger(__name__)
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+#  Modules which must not be imported by the measured modules
+HEAVY_MODULES = ("kubernetes", "openshift", "urllib3")
+
+
+def parse_importtime(output):
+    """
+    Parse python -X importtime output
+
+    Args:
+        output (str): stderr of the python process.
+
+    Returns:
+        list: (module, self seconds, cumulative seconds, nesting level) per imported module.
+    """
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append((module, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return modules
+
+
+def measure_import(module):
+    """
+    Import a module in a fresh interpreter
+
+    Args:
+        module (str): Module name.
+
+    Returns:
+        dict: module, seconds (interpreter startup and module imports), imported (module: self seconds),
+            heavy (HEAVY_MODULES imported).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, universal_newlines=True
+    )
+    if proc.returncode:
+        raise RuntimeError(f"Failed to import {module}: {proc.stderr[-2000:]}")
+
+    modules = parse_importtime(output=proc.stderr)
+    #  Top level imports, the ones python imports at startup included
+    total = sum(cumulative for _, _, cumulative, level in modules if not level)
+    return {
+        "module": module,
+        "seconds": total,
+        "imported": dict((name, self_time) for name, self_time, _, _ in modules),
+        "heavy": sorted(name for name, _, _, _ in modules if name in HEAVY_MODULES),
+    }
+
+
+def measure_collect(path):
+    """
+    Collect tests in a fresh interpreter
+
+    Args:
+        path (str): Tests path.
+
+    Returns:
+        float: Wall clock seconds of pytest --collect-only.
+    """
+    start = time.monotonic()
+    proc = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "--collect-only", "-p", "no:cacheprovider", path],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
+    )
+    elapsed = time.monotonic() - start
+    if proc.returncode:
+        raise RuntimeError(f"Failed to collect {path}: {proc.stdout[-2000:]}")
+    return elapsed
+
+
+def report(results, top=10):
+    """
+    Args:
+        results (list): measure_import() results.
+        top (int): Heaviest modules (self time) to show per measured module.
+
+    Returns:
+        str: Report.
+    """
+    lines = []
+    for result in results:
+        heavy = f", imports {', '.join(result['heavy'])}" if result["heavy"] else ""
+        lines.append(f"{result['module']}: {result['seconds'] * 1000:.1f} ms{heavy}")
+        heaviest = sorted(result["imported"].items(), key=lambda i: i[1], reverse=True)[:top]
+        for name, seconds in heaviest:
+            lines.append(f"    {seconds * 1000:8.1f} ms  {name}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Modules import time and tests collection time")
+    parser.add_argument("modules", nargs="*", default=["resources.resource"], help="Modules to import")
+    parser.add_argument("--collect", help="Tests path to collect with pytest --collect-only")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest modules to show")
+    parser.add_argument("--budget", type=float, help="Fail if an import or the collection takes longer (seconds)")
+    args = parser.parse_args()
+
+    results = [measure_import(module=module) for module in args.modules]
+    print(report(results=results, top=args.top))
+    durations = [result["seconds"] for result in results]
+    if args.collect:
+        collect_seconds = measure_collect(path=args.collect)
+        durations.append(collect_seconds)
+        print(f"pytest --collect-only {args.collect}: {collect_seconds * 1000:.1f} ms")
+
+    if args.budget is not None and max(durations) > args.budget:
+        print(f"Over budget of {args.budget} seconds")
+        sys.exit(1)
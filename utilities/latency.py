@@ -0,0 +1,224 @@
+"""
+VM to VM latency and packet loss probes (ping and netperf UDP request/response).
+"""
+
+import logging
+import re
+
+from utilities.network_benchmark import percentiles
+
+LOGGER = logging.getLogger(__name__)
+PING_REPLY_RE = re.compile(r"icmp_seq=(\d+).*time=([\d.]+) ms")
+PING_LOSS_RE = re.compile(r"(\d+) packets transmitted, (\d+) received.*?([\d.]+)% packet loss")
+PING_RTT_RE = re.compile(r"= ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms")
+NETPERF_RR_FIELDS = (
+    "MIN_LATENCY", "MEAN_LATENCY", "P50_LATENCY", "P90_LATENCY", "P99_LATENCY", "MAX_LATENCY", "TRANSACTION_RATE"
+)
+HISTOGRAM_BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def ping_command(ip, count=100, interval=0.2, flood=False, size=None):
+    """
+    Args:
+        ip (str): Destination IP.
+        count (int): Number of echo requests.
+        interval (float): Seconds between requests (ignored in flood mode).
+        flood (bool): Flood ping (sudo, no per packet output).
+        size (int): Payload size.
+
+    Returns:
+        str: ping command.
+    """
+    cmd = f"ping -c {count} -q {ip}" if flood else f"ping -c {count} -i {interval} {ip}"
+    if flood:
+        cmd = f"sudo {cmd.replace('ping', 'ping -f', 1)}"
+
+    if size:
+        cmd += f" -s {size}"
+    return cmd
+
+
+def netperf_rr_command(ip, duration=10, request_size=1, response_size=1):
+    """
+    Args:
+        ip (str): netserver IP.
+        duration (int): Test seconds.
+        request_size (int): Request bytes.
+        response_size (int): Response bytes.
+
+    Returns:
+        str: netperf UDP_RR command, values only CSV output of NETPERF_RR_FIELDS (latencies in usec).
+    """
+    return (
+        f"netperf -H {ip} -t UDP_RR -l {duration} -P 0 -- "
+        f"-r {request_size},{response_size} -o {','.join(NETPERF_RR_FIELDS)}"
+    )
+
+
+class LatencyResult(object):
+    """
+    Latency probe result, RTTs in milliseconds.
+    """
+    def __init__(self, probe, rtts=None, rtt_min=None, rtt_avg=None, rtt_max=None, rtt_mdev=None,
+                 transmitted=None, received=None, loss_percent=None, p50=None, p90=None, p99=None,
+                 transaction_rate=None):
+        """
+        Args:
+            probe (str): ping, flood or udp_rr.
+            rtts (list): Per packet RTTs (ping only).
+            rtt_min (float): Minimum RTT.
+            rtt_avg (float): Average RTT.
+            rtt_max (float): Maximum RTT.
+            rtt_mdev (float): RTT mean deviation (ping only).
+            transmitted (int): Packets sent.
+            received (int): Packets received.
+            loss_percent (float): Packet loss percent.
+            p50 (float): RTT median.
+            p90 (float): RTT 90th percentile.
+            p99 (float): RTT 99th percentile.
+            transaction_rate (float): Transactions per second (udp_rr only).
+        """
+        self.probe = probe
+        self.rtts = rtts or []
+        self.rtt_min = rtt_min
+        self.rtt_avg = rtt_avg
+        self.rtt_max = rtt_max
+        self.rtt_mdev = rtt_mdev
+        self.transmitted = transmitted
+        self.received = received
+        self.loss_percent = loss_percent
+        self.p50 = p50
+        self.p90 = p90
+        self.p99 = p99
+        self.transaction_rate = transaction_rate
+
+    @classmethod
+    def from_ping(cls, output, flood=False):
+        """
+        Args:
+            output (str): ping output.
+            flood (bool): True if the output is of a flood ping (summary only).
+
+        Returns:
+            LatencyResult: Parsed result.
+
+        Raises:
+            ValueError: If output has no ping statistics.
+        """
+        loss = PING_LOSS_RE.search(output)
+        if not loss:
+            raise ValueError(f"No ping statistics in output: {output!r}")
+
+        rtts = [float(i.group(2)) for i in PING_REPLY_RE.finditer(output)]
+        rtt = PING_RTT_RE.search(output)
+        rtt_min, rtt_avg, rtt_max, rtt_mdev = (float(i) for i in rtt.groups()) if rtt else (None,) * 4
+        rtt_percentiles = percentiles(values=rtts, percents=(50, 90, 99))
+        return cls(
+            probe="flood" if flood else "ping",
+            rtts=rtts,
+            rtt_min=rtt_min,
+            rtt_avg=rtt_avg,
+            rtt_max=rtt_max,
+            rtt_mdev=rtt_mdev,
+            transmitted=int(loss.group(1)),
+            received=int(loss.group(2)),
+            loss_percent=float(loss.group(3)),
+            p50=rtt_percentiles.get("p50"),
+            p90=rtt_percentiles.get("p90"),
+            p99=rtt_percentiles.get("p99"),
+        )
+
+    @classmethod
+    def from_netperf_rr(cls, output):
+        """
+        Args:
+            output (str): netperf_rr_command() output.
+
+        Returns:
+            LatencyResult: Parsed result.
+
+        Raises:
+            ValueError: If output has no netperf results line.
+        """
+        lines = [i.strip() for i in output.splitlines() if i.count(",") == len(NETPERF_RR_FIELDS) - 1]
+        if not lines:
+            raise ValueError(f"No netperf results in output: {output!r}")
+
+        values = dict(zip(NETPERF_RR_FIELDS, (float(i) for i in lines[-1].split(","))))
+        usec_to_ms = 1000.0
+        return cls(
+            probe="udp_rr",
+            rtt_min=values["MIN_LATENCY"] / usec_to_ms,
+            rtt_avg=values["MEAN_LATENCY"] / usec_to_ms,
+            rtt_max=values["MAX_LATENCY"] / usec_to_ms,
+            p50=values["P50_LATENCY"] / usec_to_ms,
+            p90=values["P90_LATENCY"] / usec_to_ms,
+            p99=values["P99_LATENCY"] / usec_to_ms,
+            transaction_rate=values["TRANSACTION_RATE"],
+        )
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: Result.
+        """
+        return dict(vars(self))
+
+    def __repr__(self):
+        return (
+            f"{self.probe}: p50={self.p50}ms p99={self.p99}ms min/avg/max={self.rtt_min}/{self.rtt_avg}/"
+            f"{self.rtt_max}ms loss={self.loss_percent}%"
+        )
+
+
+def histogram(values, buckets=HISTOGRAM_BUCKETS_MS):
+    """
+    Args:
+        values (list): RTTs in milliseconds.
+        buckets (tuple): Buckets upper bounds.
+
+    Returns:
+        list: (upper bound, count) per bucket, the last bucket (None) counts values above all bounds.
+    """
+    counts = [0] * (len(buckets) + 1)
+    for value in values:
+        idx = next((idx for idx, bound in enumerate(buckets) if value <= bound), len(buckets))
+        counts[idx] += 1
+    return list(zip(list(buckets) + [None], counts))
+
+
+def render_histogram(values, buckets=HISTOGRAM_BUCKETS_MS, width=40):
+    """
+    Args:
+        values (list): RTTs in milliseconds.
+        buckets (tuple): Buckets upper bounds.
+        width (int): Width of the largest bar.
+
+    Returns:
+        str: Text histogram of the non empty buckets.
+    """
+    hist = histogram(values=values, buckets=buckets)
+    top = max([count for _, count in hist] + [1])
+    lines = []
+    for bound, count in hist:
+        if count:
+            label = f"<= {bound}ms" if bound is not None else f"> {buckets[-1]}ms"
+            lines.append(f"{label:>12} {count:6} {'#' * max(1, int(width * count / top))}")
+    return "\n".join(lines)
+
+
+def check_thresholds(result, thresholds):
+    """
+    Args:
+        result (LatencyResult): Probe result.
+        thresholds (dict): Attribute (p50, p99, loss_percent...): maximum value, None values are ignored.
+
+    Returns:
+        list: Violations descriptions.
+    """
+    violations = []
+    for attr, limit in (thresholds or {}).items():
+        value = getattr(result, attr)
+        if limit is not None and value is not None and value > limit:
+            violations.append(f"{result.probe} {attr}={value} > {limit}")
+    return violations
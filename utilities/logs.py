@@ -0,0 +1,372 @@
+"""
+Size-aware lazy call logging: @generate_logs() messages are formatted only when emitted, large arguments and
+results are summarized, and repeated messages of polling loops are sampled. Settings are per module.
+"""
+
+import functools
+import hashlib
+import inspect
+import logging
+import re
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+DEFAULTS = {
+    #  Longer strings are truncated, with their length and hash
+    "max_length": 256,
+    #  Longer lists and dicts show their first items and their size
+    "max_items": 5,
+    #  Seconds a repeated call message is suppressed after it was logged, 0 to log every call
+    "sample_interval": 30,
+}
+_MODULE_SETTINGS = {}
+_SETTINGS_CACHE = {}
+_SETTINGS_LOCK = threading.Lock()
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def configure(module, **settings):
+    """
+    Set logging settings of a module and its submodules
+
+    Args:
+        module (str): Module name prefix (e.g. "resources" or "resources.resource").
+        settings (dict): DEFAULTS keys.
+
+    Examples:
+        configure(module="resources", sample_interval=60, max_items=3)
+    """
+    unknown = set(settings) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown logging settings {sorted(unknown)}, expected {sorted(DEFAULTS)}")
+
+    with _SETTINGS_LOCK:
+        _MODULE_SETTINGS.setdefault(module, {}).update(settings)
+        _SETTINGS_CACHE.clear()
+
+
+def parse_config(value):
+    """
+    Parse a --log-config value
+
+    Args:
+        value (str): "module=key:value,key:value", e.g. "resources=sample_interval:60,max_items:3".
+
+    Returns:
+        tuple: Module, settings dict.
+    """
+    module, _, settings = value.partition("=")
+    parsed = {}
+    for setting in filter(None, settings.split(",")):
+        key, _, val = setting.partition(":")
+        parsed[key.strip()] = int(val)
+    return module.strip(), parsed
+
+
+def module_settings(module):
+    """
+    Args:
+        module (str): Module name.
+
+    Returns:
+        dict: DEFAULTS updated by the settings of the module prefixes, the longest prefix last.
+    """
+    settings = _SETTINGS_CACHE.get(module)
+    if settings is not None:
+        return settings
+
+    with _SETTINGS_LOCK:
+        settings = dict(DEFAULTS)
+        for prefix in sorted(_MODULE_SETTINGS, key=len):
+            if module == prefix or module.startswith(f"{prefix}."):
+                settings.update(_MODULE_SETTINGS[prefix])
+        _SETTINGS_CACHE[module] = settings
+    return settings
+
+
+def _name(value):
+    """
+    Returns:
+        str: Kubernetes object or named object name, None if it has none.
+    """
+    if isinstance(value, dict):
+        metadata = value.get("metadata")
+        return metadata.get("name") if isinstance(metadata, dict) else None
+
+    metadata = getattr(value, "metadata", None)
+    name = getattr(metadata, "name", None) if metadata is not None else None
+    return name or getattr(value, "name", None) or getattr(value, "id", None)
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()[:8]
+
+
+def summarize(value, max_length=DEFAULTS["max_length"], max_items=DEFAULTS["max_items"]):
+    """
+    Short form of a value for a log message
+
+    Objects are replaced by their names, long strings by their head, length and hash, long collections by their
+    first items and size.
+
+    Args:
+        value (any): Value.
+        max_length (int): Maximum string length.
+        max_items (int): Maximum collection items.
+
+    Returns:
+        any: Summary.
+    """
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+
+    if isinstance(value, str):
+        if len(value) <= max_length:
+            return value
+        return f"{value[:max_length]}...<{len(value)} chars sha1:{_digest(value)}>"
+
+    if isinstance(value, _SCALARS):
+        return value
+
+    name = _name(value)
+    if name is not None:
+        return name
+
+    if isinstance(value, dict):
+        summary = dict(
+            (key, summarize(value=val, max_length=max_length, max_items=max_items))
+            for key, val in list(value.items())[:max_items] if val is not None
+        )
+        if len(value) > max_items:
+            summary["..."] = f"<{len(value)} keys>"
+        return summary
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        summary = [summarize(value=i, max_length=max_length, max_items=max_items) for i in items[:max_items]]
+        if len(items) > max_items:
+            summary.append(f"...<{len(items)} items>")
+        return summary
+
+    text = str(value)
+    return text if len(text) <= max_length else f"{text[:max_length]}...<{len(text)} chars>"
+
+
+class Lazy(object):
+    """
+    Log argument formatted only if the record is emitted.
+
+    Examples:
+        LOGGER.debug("Pods: %s", Lazy(summarize, value=pods))
+    """
+    __slots__ = ("func", "kwargs")
+
+    def __init__(self, func, **kwargs):
+        self.func = func
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(**self.kwargs))
+
+
+class Sampler(object):
+    """
+    Log a repeated message once per interval, with the number of times it was suppressed meanwhile.
+    """
+    def __init__(self):
+        self._last = {}
+        ''' Message key: [last logged time, suppressed count]. '''
+        self._lock = threading.Lock()
+
+    def check(self, key, interval):
+        """
+        Args:
+            key (hashable): Message key.
+            interval (float): Seconds to suppress the message after it was logged, 0 to never suppress.
+
+        Returns:
+            int: Suppressed count since the message was last logged, None to suppress it now.
+        """
+        if not interval:
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is None or now - last[0] >= interval:
+                self._last[key] = [now, 0]
+                return last[1] if last else 0
+
+            last[1] += 1
+            return None
+
+
+SAMPLER = Sampler()
+
+
+class _CallLog(object):
+    """
+    A decorated function call, its message is formatted only when logged.
+    """
+    __slots__ = ("spec", "arguments", "settings", "suppressed")
+
+    def __init__(self, spec, arguments, settings, suppressed=0):
+        self.spec = spec
+        self.arguments = arguments
+        self.settings = settings
+        self.suppressed = suppressed
+
+    def message(self, repeated=True):
+        """
+        Args:
+            repeated (bool): True to add how many times the message was suppressed.
+
+        Returns:
+            str: Docstring first line with the arguments it names filled in, the other arguments appended.
+        """
+        action = self.spec.action
+        rest = {}
+        for key, value in self.arguments.items():
+            if key == "self" or value is None:
+                continue
+
+            value = summarize(
+                value=value, max_length=self.settings["max_length"], max_items=self.settings["max_items"]
+            )
+            pattern = self.spec.words.get(key)
+            if pattern is not None and not isinstance(value, bool):
+                if isinstance(value, list) and all(isinstance(i, str) for i in value):
+                    value = ", ".join(value)
+                action = pattern.sub(lambda match: f"{match.group()} {value}", action, count=1)
+            else:
+                rest[key] = value
+
+        message = f"{action} with {rest}" if rest else action
+        if repeated and self.suppressed:
+            message += f" (repeated {self.suppressed} times since last logged)"
+        return message
+
+    def __str__(self):
+        return self.message()
+
+    def failed(self):
+        """
+        Returns:
+            Lazy: Failure message.
+        """
+        return Lazy(lambda: f"Failed to {self.message(repeated=False).lower()}")
+
+
+class _FuncSpec(object):
+    """
+    What generate_logs needs of a function, resolved once at decoration.
+    """
+    def __init__(self, func):
+        self.signature = inspect.signature(func)
+        doc = inspect.getdoc(func) or func.__name__
+        self.action = doc.split("\n")[0].strip()
+        action_words = set(re.sub("[^0-9a-zA-Z|_ ]+", "", self.action.lower()).split())
+        self.words = dict(
+            (name, re.compile(rf"\b{re.escape(name)}\b", re.IGNORECASE))
+            for name in self.signature.parameters if name.lower() in action_words
+        )
+        self.logger = logging.getLogger(func.__module__)
+        self.module = func.__module__
+        self.qualname = func.__qualname__
+
+    def arguments(self, args, kwargs):
+        """
+        Returns:
+            dict: Argument name: value, defaults included, **kwargs flattened.
+        """
+        try:
+            bound = self.signature.bind(*args, **kwargs)
+        except TypeError:
+            #  The call itself fails, log what was passed
+            return dict(kwargs)
+
+        bound.apply_defaults()
+        arguments = {}
+        for name, value in bound.arguments.items():
+            kind = self.signature.parameters[name].kind
+            if kind == inspect.Parameter.VAR_KEYWORD:
+                arguments.update(value)
+            elif kind != inspect.Parameter.VAR_POSITIONAL:
+                arguments[name] = value
+        return arguments
+
+    def sample_key(self, arguments):
+        """
+        Returns:
+            tuple: Key of repeated calls: function, scalar arguments and the called object name and namespace.
+        """
+        key = [self.qualname]
+        for name, value in arguments.items():
+            if name == "self":
+                key.append((getattr(value, "name", None), getattr(value, "namespace", None)))
+            elif isinstance(value, _SCALARS):
+                key.append((name, value))
+        return tuple(key)
+
+
+def generate_logs(info=True, error=True, warn=False):
+    """
+    Log function calls: INFO with the docstring first line and the call arguments, ERROR (or WARNING) if the
+    function returned a false value or raised.
+
+    Drop-in replacement of autologs generate_logs. Messages are built only if the logger is enabled for
+    them, arguments are summarized (see summarize()), repeated INFO messages of the same call are sampled
+    per the module sample_interval (see configure()) and the result summary is logged at DEBUG.
+
+    Args:
+        info (bool): True to get INFO log.
+        error (bool): True to get ERROR log.
+        warn (bool): True to get WARNING log instead of ERROR for false results.
+
+    Returns:
+        function: Decorator.
+    """
+    def decorator(func):
+        spec = _FuncSpec(func=func)
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            logger = spec.logger
+            settings = module_settings(module=spec.module)
+            #  Arguments are bound only if a message may be logged, the message is formatted only if it is
+            call = None
+            if info and logger.isEnabledFor(logging.INFO):
+                arguments = spec.arguments(args=args, kwargs=kwargs)
+                suppressed = SAMPLER.check(
+                    key=spec.sample_key(arguments=arguments), interval=settings["sample_interval"]
+                )
+                call = _CallLog(spec=spec, arguments=arguments, settings=settings, suppressed=suppressed or 0)
+                if suppressed is not None:
+                    logger.info("%s", call)
+
+            try:
+                res = func(*args, **kwargs)
+            except Exception as exp:
+                if error:
+                    call = call or _CallLog(
+                        spec=spec, arguments=spec.arguments(args=args, kwargs=kwargs), settings=settings
+                    )
+                    logger.error("%s", call.failed())
+                    logger.error(exp)
+                raise
+
+            if not res and (warn or error):
+                call = call or _CallLog(
+                    spec=spec, arguments=spec.arguments(args=args, kwargs=kwargs), settings=settings
+                )
+                logger.log(logging.WARNING if warn else logging.ERROR, "%s", call.failed())
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s returned %s", spec.qualname,
+                    Lazy(summarize, value=res, max_length=settings["max_length"], max_items=settings["max_items"])
+                )
+            return res
+
+        return inner
+    return decorator
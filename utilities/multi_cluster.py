@@ -0,0 +1,274 @@
+"""
+Multi-cluster runner: the same suite against several clusters concurrently, one pytest process per cluster (the
+suite keeps its session state in module globals), the per cluster junit reports merged into one.
+
+Run from the repository root:
+    python -m utilities.multi_cluster --cluster a=/clusters/a/kubeconfig --cluster b=/clusters/b/kubeconfig \
+        -- tests/network
+    python -m utilities.multi_cluster --fake 2 -- tests --collect-only
+"""
+
+import argparse
+import concurrent.futures
+import logging
+import os
+import sys
+import threading
+import xml.etree.ElementTree as ET
+
+from resources.cluster import ClusterContext
+from utilities import commands
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_OUTPUT_DIR = "multi-cluster-results"
+JUNIT_FILE = "junit.xml"
+LOG_FILE = "pytest.log"
+COUNTERS = ("tests", "failures", "errors", "skipped")
+#  Lines of the pytest output in the report of a cluster run without a junit report
+LOG_TAIL = 50
+
+
+class ClusterRun(object):
+    """
+    Result of the suite run against one cluster.
+    """
+    def __init__(self, context, rc, duration, directory):
+        """
+        Args:
+            context (ClusterContext): Cluster.
+            rc (int): pytest exit code.
+            duration (float): Run seconds.
+            directory (str): Run directory (junit report and pytest output).
+        """
+        self.context = context
+        self.rc = rc
+        self.duration = duration
+        self.directory = directory
+        self.counters = dict((i, 0) for i in COUNTERS)
+        ''' Counter: tests, from the junit report once merged. '''
+
+    @property
+    def junit(self):
+        return os.path.join(self.directory, JUNIT_FILE)
+
+    @property
+    def log(self):
+        return os.path.join(self.directory, LOG_FILE)
+
+
+def parse_cluster(value):
+    """
+    Args:
+        value (str): "name=kubeconfig" or "kubeconfig".
+
+    Returns:
+        ClusterContext: Cluster, named after its kubeconfig directory if no name is given.
+    """
+    name, sep, kubeconfig = value.partition("=")
+    if not sep:
+        name, kubeconfig = None, value
+    if not os.path.exists(kubeconfig):
+        raise argparse.ArgumentTypeError(f"kubeconfig {kubeconfig} does not exist")
+    return ClusterContext(kubeconfig=kubeconfig, name=name)
+
+
+def run_cluster(context, pytest_args, output_dir, timeout=None):
+    """
+    Run the suite against a cluster, its output goes to <output_dir>/<cluster>/pytest.log
+
+    Args:
+        context (ClusterContext): Cluster.
+        pytest_args (list): pytest arguments.
+        output_dir (str): Runs directory.
+        timeout (float): Seconds before the run is killed, None to wait until it exits.
+
+    Returns:
+        ClusterRun: Run result.
+    """
+    directory = os.path.join(output_dir, context.name)
+    os.makedirs(directory, exist_ok=True)
+    junit = os.path.join(directory, JUNIT_FILE)
+    if os.path.exists(junit):
+        os.remove(junit)
+
+    lock = threading.Lock()
+    with open(os.path.join(directory, LOG_FILE), "w") as fd:
+
+        def sink(text):
+            with lock:
+                fd.write(text)
+
+        LOGGER.info(f"Running {' '.join(pytest_args)} against {context}")
+        result = commands.run(
+            command=[sys.executable, "-m", "pytest", *pytest_args, f"--junitxml={junit}"], timeout=timeout,
+            stdout_sink=sink, stderr_sink=sink, env=context.env()
+        )
+    LOGGER.info(f"{context.name}: pytest exited with {result.rc} in {result.duration:.1f}s")
+    return ClusterRun(context=context, rc=result.rc, duration=result.duration, directory=directory)
+
+
+def _suites(run):
+    """
+    Args:
+        run (ClusterRun): Cluster run.
+
+    Returns:
+        list: testsuite elements of the run junit report, a single errored one if the run wrote no report.
+    """
+    if os.path.exists(run.junit):
+        try:
+            root = ET.parse(run.junit).getroot()
+            return [root] if root.tag == "testsuite" else root.findall("testsuite")
+        except ET.ParseError as exp:
+            LOGGER.error(f"{run.context.name}: invalid junit report {run.junit}: {exp}")
+
+    with open(run.log, errors="replace") as fd:
+        tail = "".join(fd.readlines()[-LOG_TAIL:])
+    suite = ET.Element("testsuite", tests="1", errors="1", failures="0", skipped="0", time=f"{run.duration:.3f}")
+    case = ET.SubElement(suite, "testcase", classname="pytest", name="session", time=f"{run.duration:.3f}")
+    error = ET.SubElement(case, "error", message=f"pytest exited with {run.rc} without a junit report")
+    error.text = tail
+    return [suite]
+
+
+def merge_junit(runs, path):
+    """
+    Merge the junit reports of the runs into one, a testsuite per cluster with the cluster name prefixed to the
+    test cases class names, set the runs counters
+
+    Args:
+        runs (list): ClusterRun of every cluster.
+        path (str): Merged report path.
+
+    Returns:
+        str: Merged report path.
+    """
+    root = ET.Element("testsuites", name="multi-cluster")
+    totals = dict((i, 0) for i in COUNTERS)
+    for run in runs:
+        for suite in _suites(run=run):
+            suite.set("name", run.context.name)
+            properties = suite.find("properties")
+            if properties is None:
+                properties = ET.Element("properties")
+                suite.insert(0, properties)
+            ET.SubElement(properties, "property", name="cluster", value=run.context.name)
+            ET.SubElement(properties, "property", name="kubeconfig", value=run.context.kubeconfig or "")
+            for case in suite.iter("testcase"):
+                case.set("classname", f"{run.context.name}.{case.get('classname', '')}".rstrip("."))
+
+            for counter in COUNTERS:
+                run.counters[counter] += int(suite.get(counter, 0))
+            root.append(suite)
+
+        for counter in COUNTERS:
+            totals[counter] += run.counters[counter]
+
+    for counter, value in totals.items():
+        root.set(counter, str(value))
+    root.set("time", f"{max((i.duration for i in runs), default=0):.3f}")
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+    return path
+
+
+def summary(runs):
+    """
+    Args:
+        runs (list): ClusterRun of every cluster, merged.
+
+    Returns:
+        str: Per cluster results table.
+    """
+    width = max([len(i.context.name) for i in runs] + [len("cluster")])
+    lines = [f"{'cluster':<{width}} {'rc':>3} {'tests':>6} {'failed':>6} {'errors':>6} {'skipped':>7} {'time':>8}"]
+    lines.extend(
+        f"{i.context.name:<{width}} {i.rc:>3} {i.counters['tests']:>6} {i.counters['failures']:>6} "
+        f"{i.counters['errors']:>6} {i.counters['skipped']:>7} {i.duration:>7.1f}s"
+        for i in runs
+    )
+    return "\n".join(lines)
+
+
+def run(contexts, pytest_args, output_dir=DEFAULT_OUTPUT_DIR, max_parallel=None, timeout=None):
+    """
+    Run the suite against the clusters concurrently and merge the results
+
+    Args:
+        contexts (list): ClusterContext of every cluster, names must be unique.
+        pytest_args (list): pytest arguments.
+        output_dir (str): Runs directory, the merged report is <output_dir>/junit.xml.
+        max_parallel (int): Maximum concurrent runs, all clusters at once if not set.
+        timeout (float): Seconds before a run is killed, None to wait until it exits.
+
+    Returns:
+        list: ClusterRun of every cluster, in contexts order.
+    """
+    names = [i.name for i in contexts]
+    duplicates = sorted(set(i for i in names if names.count(i) > 1))
+    if duplicates:
+        raise ValueError(f"Cluster names must be unique, duplicated: {', '.join(duplicates)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel or len(contexts)) as executor:
+        runs = list(
+            executor.map(
+                lambda context: run_cluster(
+                    context=context, pytest_args=pytest_args, output_dir=output_dir, timeout=timeout
+                ),
+                contexts
+            )
+        )
+
+    LOGGER.info(f"Merged junit report: {merge_junit(runs=runs, path=os.path.join(output_dir, JUNIT_FILE))}")
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the suite against several clusters concurrently",
+        usage="%(prog)s [options] -- [pytest arguments]"
+    )
+    parser.add_argument(
+        "--cluster", dest="contexts", action="append", default=[], type=parse_cluster,
+        help="Cluster kubeconfig, name=kubeconfig to name it (repeat for every cluster)"
+    )
+    parser.add_argument("--fake", type=int, default=0, help="Number of local fake API servers to add as clusters")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Per cluster runs and merged report")
+    parser.add_argument("--max-parallel", type=int, help="Maximum concurrent runs, all clusters at once if not set")
+    parser.add_argument("--timeout", type=float, help="Seconds before a cluster run is killed")
+    parser.add_argument("pytest_args", nargs=argparse.REMAINDER, help="pytest arguments, after --")
+    args = parser.parse_args()
+    pytest_args = args.pytest_args[1:] if args.pytest_args[:1] == ["--"] else args.pytest_args
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    fake_servers = []
+    contexts = list(args.contexts)
+    try:
+        if args.fake:
+            from utilities.fake_apiserver import FakeAPIServer
+
+            for idx in range(args.fake):
+                name = f"fake-{idx}"
+                fake_servers.append(FakeAPIServer().start())
+                kubeconfig = fake_servers[-1].write_kubeconfig(
+                    path=os.path.join(args.output_dir, name, "kubeconfig"), name=name
+                )
+                contexts.append(ClusterContext(kubeconfig=kubeconfig, name=name))
+
+        if not contexts:
+            parser.error("No cluster, use --cluster or --fake")
+
+        runs = run(
+            contexts=contexts, pytest_args=pytest_args, output_dir=args.output_dir, max_parallel=args.max_parallel,
+            timeout=args.timeout
+        )
+    finally:
+        for fake_server in fake_servers:
+            fake_server.stop()
+
+    print(summary(runs=runs))
+    return max((abs(i.rc) for i in runs), default=0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Guest network throughput benchmark with iperf3.
+"""
+
+import itertools
+import json
+import logging
+import os
+import statistics
+import time
+
+LOGGER = logging.getLogger(__name__)
+TCP = "tcp"
+UDP = "udp"
+FORWARD = "forward"
+REVERSE = "reverse"
+PERCENTILES = (10, 50, 90, 99)
+
+
+class IperfRun(object):
+    """
+    One iperf3 client run configuration.
+    """
+    def __init__(self, protocol=TCP, streams=1, direction=FORWARD, message_size=None, duration=5):
+        """
+        Args:
+            protocol (str): TCP or UDP.
+            streams (int): Number of parallel streams (-P).
+            direction (str): FORWARD (client sends) or REVERSE (server sends, -R).
+            message_size (int): Read/write buffer length, datagram size for UDP (-l), None for iperf3 default.
+            duration (int): Seconds to transmit (-t).
+        """
+        self.protocol = protocol
+        self.streams = streams
+        self.direction = direction
+        self.message_size = message_size
+        self.duration = duration
+
+    def command(self, server_ip):
+        """
+        Args:
+            server_ip (str): iperf3 server IP.
+
+        Returns:
+            str: iperf3 client command with JSON output.
+        """
+        cmd = f"iperf3 -c {server_ip} -t {self.duration} -P {self.streams} -J"
+        if self.protocol == UDP:
+            cmd += " -u -b 0"
+
+        if self.direction == REVERSE:
+            cmd += " -R"
+
+        if self.message_size:
+            cmd += f" -l {self.message_size}"
+        return cmd
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: Run configuration.
+        """
+        return {
+            "protocol": self.protocol,
+            "streams": self.streams,
+            "direction": self.direction,
+            "message_size": self.message_size,
+            "duration": self.duration,
+        }
+
+    def __repr__(self):
+        return f"{self.protocol}-{self.direction}-P{self.streams}-l{self.message_size or 'default'}"
+
+
+class IperfResult(object):
+    """
+    Parsed iperf3 JSON output.
+    """
+    def __init__(self, bits_per_second, intervals, jitter_ms=None, lost_percent=None, retransmits=None):
+        """
+        Args:
+            bits_per_second (float): Received throughput.
+            intervals (list): Per interval throughput samples (bits per second).
+            jitter_ms (float): UDP jitter.
+            lost_percent (float): UDP lost datagrams percent.
+            retransmits (int): TCP retransmits.
+        """
+        self.bits_per_second = bits_per_second
+        self.intervals = intervals
+        self.jitter_ms = jitter_ms
+        self.lost_percent = lost_percent
+        self.retransmits = retransmits
+
+    @classmethod
+    def from_json(cls, iperf_json, protocol=None):
+        """
+        Args:
+            iperf_json (dict): iperf3 -J output.
+            protocol (str): TCP or UDP, the protocol iperf3 recorded in start.test_start if not set.
+
+        Returns:
+            IperfResult: Parsed result.
+
+        Raises:
+            ValueError: If iperf3 reported an error.
+        """
+        if iperf_json.get("error"):
+            raise ValueError(f"iperf3 failed: {iperf_json['error']}")
+
+        end = iperf_json.get("end", {})
+        protocol = (protocol or iperf_json.get("start", {}).get("test_start", {}).get("protocol") or TCP).lower()
+        intervals = [i.get("sum", {}).get("bits_per_second", 0) for i in iperf_json.get("intervals", [])]
+        if protocol == TCP:
+            return cls(
+                bits_per_second=end["sum_received"]["bits_per_second"],
+                intervals=intervals,
+                retransmits=end.get("sum_sent", {}).get("retransmits"),
+            )
+
+        #  UDP, receiver side numbers: sum_received in newer iperf3 releases, sum in older ones
+        summary = end.get("sum_received") or end.get("sum", {})
+        losses = summary if "lost_percent" in summary else end.get("sum", {})
+        return cls(
+            bits_per_second=summary.get("bits_per_second", 0),
+            intervals=intervals,
+            jitter_ms=losses.get("jitter_ms"),
+            lost_percent=losses.get("lost_percent"),
+        )
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: Result.
+        """
+        return {
+            "bits_per_second": self.bits_per_second,
+            "intervals": self.intervals,
+            "jitter_ms": self.jitter_ms,
+            "lost_percent": self.lost_percent,
+            "retransmits": self.retransmits,
+        }
+
+
+def percentiles(values, percents=PERCENTILES):
+    """
+    Args:
+        values (list): Samples.
+        percents (tuple): Percentiles to compute (1 - 99).
+
+    Returns:
+        dict: p<percent>: value, empty if there are no samples.
+    """
+    values = [i for i in values if i is not None]
+    if not values:
+        return {}
+
+    if len(values) == 1:
+        return dict((f"p{p}", values[0]) for p in percents)
+
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return dict((f"p{p}", cuts[p - 1]) for p in percents)
+
+
+def summarize(results):
+    """
+    Summarize the repeats of one run configuration
+
+    Args:
+        results (list): IperfResult list.
+
+    Returns:
+        dict: Throughput median and percentiles across repeats, per interval percentiles, jitter, loss.
+    """
+    throughput = [i.bits_per_second for i in results]
+    return {
+        "repeats": len(results),
+        "bits_per_second_median": statistics.median(throughput),
+        "bits_per_second": percentiles(throughput),
+        "interval_bits_per_second": percentiles(list(itertools.chain.from_iterable(i.intervals for i in results))),
+        "jitter_ms": percentiles([i.jitter_ms for i in results]),
+        "lost_percent": percentiles([i.lost_percent for i in results]),
+        "retransmits": percentiles([i.retransmits for i in results]),
+    }
+
+
+def benchmark_matrix(protocols=(TCP, UDP), streams=(1,), directions=(FORWARD,), message_sizes=None, duration=5):
+    """
+    Build all runs configurations
+
+    Args:
+        protocols (tuple): Protocols.
+        streams (tuple): Parallel streams counts.
+        directions (tuple): Directions.
+        message_sizes (dict): Protocol: message sizes, missing protocol uses iperf3 default.
+        duration (int): Seconds per run.
+
+    Returns:
+        list: IperfRun list.
+    """
+    runs = []
+    for protocol in protocols:
+        sizes = (message_sizes or {}).get(protocol) or [None]
+        for stream, direction, size in itertools.product(streams, directions, sizes):
+            runs.append(
+                IperfRun(protocol=protocol, streams=stream, direction=direction, message_size=size, duration=duration)
+            )
+    return runs
+
+
+class ResultsWriter(object):
+    """
+    Append benchmark records to a JSON lines file.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Results file path.
+        """
+        self.path = path
+
+    def write(self, records):
+        """
+        Args:
+            records (list): Records (dicts) to append.
+        """
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+
+        with open(self.path, "a") as fd:
+            for record in records:
+                fd.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+class GuestNetworkBenchmark(object):
+    """
+    Run an iperf3 runs matrix from a client guest to a server guest, with repeats.
+
+    The guest transport is abstracted by `run_json`, a function which runs a command on the client guest
+    and returns its JSON output as dict.
+
+    Examples:
+        benchmark = GuestNetworkBenchmark(run_json=run_json, network="ovs", server_ip="192.168.0.1", repeats=3)
+        summaries = benchmark.run(runs=benchmark_matrix(protocols=(TCP, UDP), streams=(1, 4)))
+    """
+    def __init__(self, run_json, network, server_ip, repeats=3, labels=None):
+        """
+        Args:
+            run_json (function): func(command) -> dict, run command on the client guest.
+            network (str): Network type (pod, ovs, vxlan, bond).
+            server_ip (str): iperf3 server IP on this network.
+            repeats (int): Repeats of every run configuration.
+            labels (dict): Extra fields for every record (VM names, run id...).
+        """
+        self.run_json = run_json
+        self.network = network
+        self.server_ip = server_ip
+        self.repeats = repeats
+        self.labels = labels or {}
+        self.records = []
+        ''' Per repeat records. '''
+
+    def _record(self, run, **fields):
+        """
+        Returns:
+            dict: Record of run with the benchmark labels.
+        """
+        record = dict(self.labels, network=self.network, run=repr(run), timestamp=time.time(), **run.as_dict())
+        record.update(fields)
+        return record
+
+    def run(self, runs):
+        """
+        Run every configuration `repeats` times
+
+        Args:
+            runs (list): IperfRun list.
+
+        Returns:
+            list: Summary record per run configuration.
+        """
+        summaries = []
+        for run in runs:
+            results = []
+            for repeat in range(self.repeats):
+                LOGGER.info(f"{self.network}: iperf3 {run} repeat {repeat + 1}/{self.repeats}")
+                result = IperfResult.from_json(
+                    iperf_json=self.run_json(run.command(server_ip=self.server_ip)), protocol=run.protocol
+                )
+                results.append(result)
+                self.records.append(self._record(run=run, repeat=repeat, **result.as_dict()))
+
+            summary = self._record(run=run, summary=summarize(results=results))
+            LOGGER.info(
+                f"{self.network}: iperf3 {run} median {summary['summary']['bits_per_second_median'] / 1e9:.2f} Gbps"
+            )
+            summaries.append(summary)
+        return summaries
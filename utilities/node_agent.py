@@ -0,0 +1,207 @@
+"""
+Streaming node agent: netlink link and OVS interface events from a host network pod, over one exec stream.
+"""
+
+import json
+import logging
+import subprocess
+import threading
+import time
+
+from utilities import commands
+
+LOGGER = logging.getLogger(__name__)
+OVS_DB_SOCKET = "unix:/host/run/openvswitch/db.sock"
+LINK = "link"
+OVS = "ovs"
+AGENT = "agent"
+READY_TIMEOUT = 30
+
+#  `ip -o monitor link` prints "[Deleted ]<ifindex>: <name>[@<peer>]: <flags> ...", one line per RTM_NEWLINK/DELLINK
+LINK_MONITOR = (
+    "ip -o monitor link | awk '{"
+    "ev=\"new\"; i=1; if ($1==\"Deleted\") {ev=\"del\"; i=2}; "
+    "idx=$i; sub(\":\", \"\", idx); name=$(i+1); sub(\":$\", \"\", name); peer=\"\"; "
+    "if (split(name, p, \"@\") > 1) {name=p[1]; peer=p[2]; sub(\"^if\", \"\", peer)}; "
+    "printf \"{\\\"source\\\":\\\"link\\\",\\\"event\\\":\\\"%s\\\",\\\"ifindex\\\":\\\"%s\\\",\\\"name\\\":\\\"%s\\\","
+    "\\\"peer_ifindex\\\":\\\"%s\\\"}\\n\", ev, idx, name, peer; fflush()}'"
+)
+#  ovsdb-client table output rows: "<uuid> <initial|insert|delete|old|new> <name> <ifindex>"
+OVS_MONITOR = (
+    f"ovsdb-client monitor {OVS_DB_SOCKET} Open_vSwitch Interface name,ifindex | awk '"
+    "$2==\"initial\" || $2==\"insert\" || $2==\"delete\" {"
+    "name=$3; gsub(\"\\\"\", \"\", name); "
+    "printf \"{\\\"source\\\":\\\"ovs\\\",\\\"event\\\":\\\"%s\\\",\\\"name\\\":\\\"%s\\\","
+    "\\\"ifindex\\\":\\\"%s\\\"}\\n\", "
+    "$2, name, $4; fflush()}'"
+)
+AGENT_SCRIPT = (
+    f"{LINK_MONITOR} & "
+    f"if command -v ovsdb-client > /dev/null; then {OVS_MONITOR} & fi; "
+    "echo '{\"source\":\"agent\",\"event\":\"ready\"}'; wait"
+)
+
+
+def parse_event(line):
+    """
+    Args:
+        line (str): Agent JSON line.
+
+    Returns:
+        dict: Event, ifindex and peer_ifindex as int (None if unknown), None if the line is not an event.
+    """
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+
+    for key in ("ifindex", "peer_ifindex"):
+        if key in event:
+            value = str(event[key]).strip()
+            event[key] = int(value) if value.isdigit() else None
+    return event
+
+
+class NodeAgent(object):
+    """
+    Stream link and OVS interface events of a node, from a host network pod (ovs-cni) on the node.
+
+    Events are kept in order with their receive time, waits match a predicate against the events received
+    since a cursor, so an event which arrived before the wait started is not missed.
+
+    Examples:
+        with NodeAgent(pod="ovs-cni-amd64-x", namespace="kube-system", container="ovs-cni-marker") as agent:
+            cursor = agent.cursor()
+            vm.delete()
+            agent.wait_for(predicate=lambda e: e["event"] == "del" and e["ifindex"] == 12, since=cursor)
+    """
+    def __init__(self, pod, namespace, container=None):
+        """
+        Args:
+            pod (str): Host network pod name.
+            namespace (str): Pod namespace.
+            container (str): Container name.
+        """
+        self.pod = pod
+        self.namespace = namespace
+        self.container = container
+        self.events = []
+        self._cond = threading.Condition()
+        self._proc = None
+        self._reader = None
+
+    def start(self, timeout=READY_TIMEOUT):
+        """
+        Start the agent and wait until it is streaming
+
+        Args:
+            timeout (int): Time to wait for the agent.
+
+        Raises:
+            TimeoutError: If the agent did not get ready.
+        """
+        container = f" -c {self.container}" if self.container else ""
+        cmd = commands.oc_args(command=f"exec -i {self.pod}{container}", namespace=self.namespace)
+        cmd += ["--", "sh", "-c", AGENT_SCRIPT]
+        LOGGER.info(f"Starting node agent on {self.pod}")
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+            bufsize=1
+        )
+        self._reader = threading.Thread(target=self._read, name=f"node-agent-{self.pod}", daemon=True)
+        self._reader.start()
+        self.wait_for(predicate=lambda event: event.get("source") == AGENT, timeout=timeout)
+
+    def _read(self):
+        """
+        Read the agent stream until it ends
+        """
+        for line in self._proc.stdout:
+            event = parse_event(line=line)
+            if event is None:
+                continue
+
+            event["received"] = time.monotonic()
+            with self._cond:
+                self.events.append(event)
+                self._cond.notify_all()
+
+        with self._cond:
+            self._cond.notify_all()
+
+    def cursor(self):
+        """
+        Returns:
+            int: Position of the next event, to wait for events from now on.
+        """
+        with self._cond:
+            return len(self.events)
+
+    def wait_for(self, predicate, timeout=READY_TIMEOUT, since=0):
+        """
+        Wait for an event
+
+        Args:
+            predicate (function): func(event) -> bool.
+            timeout (int): Time to wait.
+            since (int): Cursor (from cursor()) of the first event to match.
+
+        Returns:
+            dict: First matching event.
+
+        Raises:
+            TimeoutError: If no event matched in time or the agent stream ended.
+        """
+        deadline = time.monotonic() + timeout
+        position = since
+        with self._cond:
+            while True:
+                for event in self.events[position:]:
+                    if predicate(event):
+                        return event
+                position = len(self.events)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._reader.is_alive():
+                    raise TimeoutError(f"{self.pod}: no matching node agent event after {timeout}s")
+                self._cond.wait(timeout=remaining)
+
+    def wait_for_all(self, predicates, timeout=READY_TIMEOUT, since=0):
+        """
+        Wait until every predicate matched an event
+
+        Args:
+            predicates (list): func(event) -> bool list.
+            timeout (int): Time to wait for all of them.
+            since (int): Cursor of the first event to match.
+
+        Returns:
+            list: First matching event per predicate.
+        """
+        deadline = time.monotonic() + timeout
+        return [
+            self.wait_for(predicate=predicate, timeout=max(deadline - time.monotonic(), 0), since=since)
+            for predicate in predicates
+        ]
+
+    def stop(self):
+        """
+        Stop the agent, closing stdin ends the exec session and the monitors with it
+        """
+        if self._proc is None:
+            return
+
+        self._proc.stdin.close()
+        self._proc.terminate()
+        try:
+            self._proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+        self._proc = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,297 @@
+"""
+Performance results history and statistical regression detection against a rolling baseline.
+
+Report the trend of a history DB:
+    python -m utilities.perf_baseline benchmark-results/baseline.sqlite
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sqlite3
+import statistics
+import time
+
+LOGGER = logging.getLogger(__name__)
+BASELINE_SIZE = 30
+MIN_BASELINE_SIZE = 6
+ALPHA = 0.05
+MAX_DROP = 0.10
+CONFIDENCE = 0.95
+BOOTSTRAP_RESAMPLES = 2000
+
+
+def fingerprint(**keys):
+    """
+    Build the key results are compared by
+
+    Args:
+        keys (dict): Environment identity (cluster, nic_driver, network, guest_image...).
+
+    Returns:
+        str: Canonical fingerprint.
+
+    Examples:
+        fingerprint(cluster="api.cluster-a:6443/v1.13", nic_driver="ixgbe", network="ovs", guest_image="fedora")
+    """
+    return json.dumps(keys, sort_keys=True)
+
+
+class BaselineStore(object):
+    """
+    Local sqlite history of performance results, keyed by environment fingerprint and metric.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): sqlite DB file path.
+        """
+        self.path = path
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "fingerprint TEXT NOT NULL, metric TEXT NOT NULL, value REAL NOT NULL, "
+                "run_id TEXT, timestamp REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_key ON results (fingerprint, metric, timestamp)")
+
+    def _connect(self):
+        """
+        Returns:
+            sqlite3.Connection: DB connection.
+        """
+        return sqlite3.connect(self.path, timeout=60)
+
+    def add(self, fingerprint_, metric, values, run_id=None):
+        """
+        Store results
+
+        Args:
+            fingerprint_ (str): Environment fingerprint (from fingerprint()).
+            metric (str): Metric name.
+            values (list): Samples (repeats) of this run.
+            run_id (str): Test run id.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO results (fingerprint, metric, value, run_id, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(fingerprint_, metric, value, run_id, now) for value in values]
+            )
+
+    def baseline(self, fingerprint_, metric, exclude_run_id=None, size=BASELINE_SIZE):
+        """
+        Get the rolling baseline: the latest samples of previous runs
+
+        Args:
+            fingerprint_ (str): Environment fingerprint.
+            metric (str): Metric name.
+            exclude_run_id (str): Run to exclude (the current one).
+            size (int): Maximum number of samples.
+
+        Returns:
+            list: Samples, latest first.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT value FROM results WHERE fingerprint = ? AND metric = ? AND run_id IS NOT ? "
+                "ORDER BY timestamp DESC LIMIT ?", (fingerprint_, metric, exclude_run_id, size)
+            )
+            return [row[0] for row in rows]
+
+    def runs(self, fingerprint_=None):
+        """
+        Get per run medians
+
+        Args:
+            fingerprint_ (str): Environment fingerprint, None for all.
+
+        Returns:
+            dict: (fingerprint, metric): [(timestamp, run median), ...] oldest first.
+        """
+        query = "SELECT fingerprint, metric, run_id, MIN(timestamp), GROUP_CONCAT(value) FROM results"
+        args = ()
+        if fingerprint_:
+            query += " WHERE fingerprint = ?"
+            args = (fingerprint_,)
+
+        query += " GROUP BY fingerprint, metric, run_id ORDER BY MIN(timestamp)"
+        runs = {}
+        with self._connect() as conn:
+            for fp, metric, _, timestamp, values in conn.execute(query, args):
+                samples = [float(i) for i in values.split(",")]
+                runs.setdefault((fp, metric), []).append((timestamp, statistics.median(samples)))
+        return runs
+
+
+def mann_whitney_u(current, baseline):
+    """
+    One sided Mann-Whitney U test: are the current samples stochastically smaller than the baseline
+
+    Normal approximation with ties correction.
+
+    Args:
+        current (list): Current samples.
+        baseline (list): Baseline samples.
+
+    Returns:
+        tuple: U statistic of current, p-value.
+    """
+    n1, n2 = len(current), len(baseline)
+    ranked = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    idx = 0
+    while idx < len(ranked):
+        end = idx
+        while end + 1 < len(ranked) and ranked[end + 1][0] == ranked[idx][0]:
+            end += 1
+
+        for tie_idx in range(idx, end + 1):
+            ranks[tie_idx] = (idx + end) / 2.0 + 1
+        tied = end - idx + 1
+        ties += tied ** 3 - tied
+        idx = end + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+
+    #  Continuity correction
+    z = (u - mean + 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(-z / math.sqrt(2))
+
+
+def median_drop(current, baseline, confidence=CONFIDENCE, resamples=BOOTSTRAP_RESAMPLES):
+    """
+    Relative drop of the current median from the baseline median, with bootstrap confidence bounds
+
+    Args:
+        current (list): Current samples.
+        baseline (list): Baseline samples.
+        confidence (float): Confidence level of the bounds.
+        resamples (int): Bootstrap resamples.
+
+    Returns:
+        tuple: Drop (0.1 is 10% lower), (lower bound, upper bound).
+    """
+    def drop(cur, base):
+        base_median = statistics.median(base)
+        return (base_median - statistics.median(cur)) / base_median if base_median else 0.0
+
+    rand = random.Random(0)
+    drops = sorted(
+        drop(cur=rand.choices(current, k=len(current)), base=rand.choices(baseline, k=len(baseline)))
+        for _ in range(resamples)
+    )
+    tail = (1 - confidence) / 2
+    return drop(cur=current, base=baseline), (drops[int(tail * resamples)], drops[int((1 - tail) * resamples) - 1])
+
+
+class RegressionResult(object):
+    """
+    Regression check result.
+    """
+    def __init__(self, metric, regressed, reason, p_value=None, drop=None, drop_bounds=None):
+        """
+        Args:
+            metric (str): Metric name.
+            regressed (bool): True if the metric regressed.
+            reason (str): Decision details.
+            p_value (float): Mann-Whitney p-value.
+            drop (float): Relative median degradation.
+            drop_bounds (tuple): Degradation confidence bounds.
+        """
+        self.metric = metric
+        self.regressed = regressed
+        self.reason = reason
+        self.p_value = p_value
+        self.drop = drop
+        self.drop_bounds = drop_bounds
+
+    def __repr__(self):
+        return f"{self.metric}: {'REGRESSION' if self.regressed else 'ok'} ({self.reason})"
+
+
+def detect_regression(
+    metric, current, baseline, higher_is_better=True, alpha=ALPHA, max_drop=MAX_DROP, min_baseline=MIN_BASELINE_SIZE
+):
+    """
+    Detect a regression of the current samples against the baseline
+
+    A regression needs both a significant Mann-Whitney test (p < alpha) and a median drop whose lower
+    confidence bound exceeds max_drop, so noise and tiny (but significant) shifts do not fail tests.
+
+    Args:
+        metric (str): Metric name.
+        current (list): Current samples.
+        baseline (list): Baseline samples.
+        higher_is_better (bool): False for metrics like latency.
+        alpha (float): Significance level.
+        max_drop (float): Tolerated relative degradation of the median.
+        min_baseline (int): Minimum baseline samples to decide.
+
+    Returns:
+        RegressionResult: Result.
+    """
+    if len(baseline) < min_baseline or not current:
+        return RegressionResult(
+            metric=metric, regressed=False, reason=f"baseline too small ({len(baseline)}/{min_baseline} samples)"
+        )
+
+    if not higher_is_better:
+        current = [-i for i in current]
+        baseline = [-i for i in baseline]
+
+    _, p_value = mann_whitney_u(current=current, baseline=baseline)
+    drop, bounds = median_drop(current=current, baseline=baseline)
+    if not higher_is_better:
+        drop, bounds = -drop, (-bounds[1], -bounds[0])
+
+    regressed = p_value < alpha and bounds[0] > max_drop
+    reason = (
+        f"median drop {drop:.1%} [{bounds[0]:.1%}, {bounds[1]:.1%}], "
+        f"Mann-Whitney p={p_value:.4f}, {len(current)} vs {len(baseline)} samples"
+    )
+    return RegressionResult(
+        metric=metric, regressed=regressed, reason=reason, p_value=p_value, drop=drop, drop_bounds=bounds
+    )
+
+
+def trend_report(store, fingerprint_=None, last=10):
+    """
+    Per fingerprint and metric trend of the runs medians
+
+    Args:
+        store (BaselineStore): Results history.
+        fingerprint_ (str): Environment fingerprint, None for all.
+        last (int): Number of last runs to show.
+
+    Returns:
+        str: Report.
+    """
+    lines = []
+    for (fp, metric), runs in sorted(store.runs(fingerprint_=fingerprint_).items()):
+        medians = [median for _, median in runs]
+        change = (medians[-1] - medians[0]) / medians[0] if medians[0] else 0.0
+        trend = " ".join(f"{i:.4g}" for i in medians[-last:])
+        lines.append(f"{fp} {metric}: {len(runs)} runs, first->last {change:+.1%}: {trend}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance results trend report")
+    parser.add_argument("db", help="Baseline sqlite DB")
+    parser.add_argument("--last", type=int, default=10, help="Number of last runs to show")
+    args = parser.parse_args()
+    print(trend_report(store=BaselineStore(path=args.db), last=args.last))
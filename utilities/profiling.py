@@ -0,0 +1,314 @@
+"""
+Opt-in profiling of tests, fixtures and the resource layer: deterministic (cProfile, pstats files) or sampling
+(collapsed stacks files, flamegraph.pl/speedscope input), with a top-N hot functions summary.
+"""
+
+import collections
+import contextlib
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+
+import pytest
+
+LOGGER = logging.getLogger(__name__)
+DETERMINISTIC = "deterministic"
+SAMPLING = "sampling"
+MODES = (DETERMINISTIC, SAMPLING)
+SAMPLE_INTERVAL = 0.005
+DEFAULT_DIR = ".cnv-tests-profiles"
+TOP = 15
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "")
+
+
+def frame_name(code):
+    """
+    Args:
+        code (code): Frame code object.
+
+    Returns:
+        str: function (file:line) label of a stack frame.
+    """
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler(object):
+    """
+    Profile the code run inside the context.
+
+    Deterministic mode traces every call of the profiled thread (exact, slower). Sampling mode snapshots the
+    stacks every interval (low overhead, statistical), of the profiled thread or of all threads.
+
+    Examples:
+        with Profiler(mode=SAMPLING, all_threads=True) as profiler:
+            create_many(vms=vms)
+        profiler.write(path="create_many")
+        print(profiler.summary())
+    """
+    def __init__(self, mode=DETERMINISTIC, interval=SAMPLE_INTERVAL, all_threads=False, include=None):
+        """
+        Args:
+            mode (str): DETERMINISTIC or SAMPLING.
+            interval (float): Seconds between samples (sampling).
+            all_threads (bool): True to sample all threads (sampling), the entering thread only otherwise.
+            include (str): Path prefix, keep only stacks through files under it, from the first such frame
+                (sampling), and only functions of files under it in the summary (deterministic).
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode}, one of {MODES}")
+
+        self.mode = mode
+        self.interval = interval
+        self.all_threads = all_threads
+        self.include = include
+        self.duration = None
+        self.stacks = collections.Counter()
+        ''' Collapsed stack ("outer;...;inner"): samples (sampling). '''
+        self._profile = None
+        self._thread_id = None
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._start = None
+        self._ticks = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.mode == DETERMINISTIC:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._thread_id = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.mode == DETERMINISTIC:
+            self._profile.disable()
+        else:
+            self._stopped.set()
+            self._sampler.join()
+        self.duration = time.perf_counter() - self._start
+
+    def _sample(self):
+        """
+        Snapshot the profiled stacks every interval until stopped
+        """
+        sampler_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            self._ticks += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id or (not self.all_threads and thread_id != self._thread_id):
+                    continue
+
+                stack = self._stack(frame=frame)
+                if stack:
+                    self.stacks[";".join(stack)] += 1
+
+    def _stack(self, frame):
+        """
+        Args:
+            frame (frame): Innermost frame.
+
+        Returns:
+            list: Frames labels, outermost first, cut to start at the first included frame (empty if none).
+        """
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        if self.include:
+            first = next((idx for idx, code in enumerate(codes) if code.co_filename.startswith(self.include)), None)
+            if first is None:
+                return []
+            codes = codes[first:]
+        return [frame_name(code=code) for code in codes]
+
+    def top(self, n=TOP):
+        """
+        Hottest functions
+
+        Args:
+            n (int): Number of functions.
+
+        Returns:
+            list: (function, self seconds, cumulative seconds, calls or samples) by self seconds.
+        """
+        rows = []
+        if self.mode == DETERMINISTIC:
+            stats = pstats.Stats(self._profile)
+            for (filename, line, name), (_, calls, self_time, cumulative, _) in stats.stats.items():
+                if self.include and not filename.startswith(self.include):
+                    continue
+                rows.append((f"{name} ({os.path.basename(filename)}:{line})", self_time, cumulative, calls))
+        else:
+            #  The sampler needs the GIL, busy threads hold it up to the switch interval, use the real ticks period
+            period = self.duration / self._ticks if self._ticks else self.interval
+            leaf = collections.Counter()
+            inclusive = collections.Counter()
+            for stack, count in self.stacks.items():
+                frames = stack.split(";")
+                leaf[frames[-1]] += count
+                for frame in set(frames):
+                    inclusive[frame] += count
+            rows = [
+                (frame, leaf[frame] * period, count * period, count)
+                for frame, count in inclusive.items()
+            ]
+        return sorted(rows, key=lambda row: row[1], reverse=True)[:n]
+
+    def summary(self, n=TOP):
+        """
+        Args:
+            n (int): Number of functions.
+
+        Returns:
+            str: Top-N hot functions table.
+        """
+        count = "calls" if self.mode == DETERMINISTIC else "samples"
+        lines = [f"{'self':>9} {'cumulative':>11} {count:>8}  function"]
+        lines.extend(
+            f"{self_time:8.3f}s {cumulative:10.3f}s {calls:8}  {name}"
+            for name, self_time, cumulative, calls in self.top(n=n)
+        )
+        return "\n".join(lines)
+
+    def write(self, path):
+        """
+        Write the profile, pstats (deterministic) or collapsed stacks (sampling)
+
+        Args:
+            path (str): File path without extension.
+
+        Returns:
+            str: Written file path.
+        """
+        if self.mode == DETERMINISTIC:
+            path = f"{path}.pstats"
+            self._profile.dump_stats(path)
+        else:
+            path = f"{path}.collapsed"
+            with open(path, "w") as fd:
+                fd.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+        return path
+
+
+@contextlib.contextmanager
+def profile_resources(mode=SAMPLING, path=None, top=TOP, interval=SAMPLE_INTERVAL):
+    """
+    Profile only the resource layer (stacks through the resources package, its callees included), outside pytest
+    too, log the hot functions summary
+
+    Samples all threads, the resource layer runs API calls in thread pools.
+
+    Args:
+        mode (str): SAMPLING (resource layer stacks) or DETERMINISTIC (resource layer functions in the summary).
+        path (str): File path without extension to write the profile to, None to not write it.
+        top (int): Number of functions in the summary.
+        interval (float): Seconds between samples (sampling).
+
+    Yields:
+        Profiler: The profiler.
+
+    Examples:
+        with profile_resources(path="/tmp/create-vms"):
+            create_many(vms=vms)
+    """
+    with Profiler(mode=mode, interval=interval, all_threads=True, include=RESOURCES_DIR) as profiler:
+        yield profiler
+
+    if path:
+        LOGGER.info(f"Resource layer profile written to {profiler.write(path=path)}")
+    LOGGER.info(f"Resource layer hot functions ({profiler.duration:.2f}s):\n{profiler.summary(n=top)}")
+
+
+def profile_file_name(nodeid, fixture=None):
+    """
+    Args:
+        nodeid (str): Test node id.
+        fixture (str): Fixture name, None for the test itself.
+
+    Returns:
+        str: File name (without extension) of the profile of a test or a fixture setup.
+    """
+    name = f"{nodeid}::{fixture}" if fixture else nodeid
+    return re.sub(r"[^\w.-]+", "_", name).strip("_")
+
+
+class ProfilingPlugin(object):
+    """
+    pytest plugin: profile tests marked with `profile` and the setup of chosen fixtures, write a profile per node
+    id and show the hot functions summaries at the end.
+
+    Without marked tests nor fixtures among the collected tests, every test is profiled.
+    """
+    def __init__(self, mode, output_dir=DEFAULT_DIR, fixtures=(), top=TOP, interval=SAMPLE_INTERVAL):
+        """
+        Args:
+            mode (str): DETERMINISTIC or SAMPLING.
+            output_dir (str): Profiles directory.
+            fixtures (list): Names of the fixtures to profile the setup of.
+            top (int): Number of functions per summary.
+            interval (float): Seconds between samples (sampling).
+        """
+        self.mode = mode
+        self.output_dir = output_dir
+        self.fixtures = set(fixtures)
+        self.top = top
+        self.interval = interval
+        self.all_tests = False
+        self.profiles = []
+        ''' (name, Profiler, profile file path) of the profiled tests and fixtures. '''
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        used = set(fixture for item in items for fixture in getattr(item, "fixturenames", ()))
+        self.all_tests = not (self.fixtures & used) and not any(item.get_closest_marker("profile") for item in items)
+
+    @contextlib.contextmanager
+    def _profiled(self, name, nodeid, fixture=None):
+        """
+        Profile the code run inside the context, write its profile file
+
+        Args:
+            name (str): Profile name in the summary.
+            nodeid (str): Test node id.
+            fixture (str): Fixture name, None for the test itself.
+        """
+        with Profiler(mode=self.mode, interval=self.interval) as profiler:
+            yield
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = profiler.write(path=os.path.join(self.output_dir, profile_file_name(nodeid=nodeid, fixture=fixture)))
+        self.profiles.append((name, profiler, path))
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        if fixturedef.argname not in self.fixtures:
+            yield
+            return
+
+        with self._profiled(
+            name=f"fixture {fixturedef.argname} ({request.node.nodeid})", nodeid=request.node.nodeid,
+            fixture=fixturedef.argname
+        ):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        if not (self.all_tests or item.get_closest_marker("profile")):
+            yield
+            return
+
+        with self._profiled(name=f"test {item.nodeid}", nodeid=item.nodeid):
+            yield
+
+    def pytest_terminal_summary(self, terminalreporter):
+        for name, profiler, path in self.profiles:
+            terminalreporter.write_sep("-", f"profile: {name} ({profiler.duration:.2f}s) {path}")
+            terminalreporter.write_line(profiler.summary(n=self.top))
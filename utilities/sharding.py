@@ -0,0 +1,169 @@
+"""
+pytest-xdist helpers: per worker resource names and cluster wide setup coordination between workers.
+"""
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import tempfile
+
+LOGGER = logging.getLogger(__name__)
+XDIST_WORKER_ENV = "PYTEST_XDIST_WORKER"
+XDIST_TESTRUNUID_ENV = "PYTEST_XDIST_TESTRUNUID"
+
+
+def worker_id():
+    """
+    Get xdist worker id
+
+    Returns:
+        str: Worker id (gw0, gw1...), empty string when not running under xdist.
+    """
+    return os.getenv(XDIST_WORKER_ENV, "")
+
+
+def worker_index():
+    """
+    Get xdist worker index
+
+    Returns:
+        int: Worker number (0 for gw0), 0 when not running under xdist.
+    """
+    worker = worker_id()
+    return int(worker[2:]) if worker.startswith("gw") else 0
+
+
+def testrun_uid():
+    """
+    Get the test run unique id shared by all xdist workers
+
+    Returns:
+        str: Test run id, None when not running under xdist.
+    """
+    return os.getenv(XDIST_TESTRUNUID_ENV)
+
+
+def sharded_name(name):
+    """
+    Get per worker resource name
+
+    Args:
+        name (str): Resource base name.
+
+    Returns:
+        str: name-<worker id> under xdist, name otherwise.
+
+    Examples:
+        sharded_name("cnv-network-ns") -> "cnv-network-ns-gw3"
+    """
+    worker = worker_id()
+    return f"{name}-{worker}" if worker else name
+
+
+class ClusterWideSetup(object):
+    """
+    Run cluster wide setup once per test run, regardless of the number of xdist workers.
+
+    The first worker to take the file lock (the leader) runs the setup and publishes its result, the other
+    workers read it. The last worker to release the setup runs the teardown.
+    Without xdist setup and teardown functions are called directly.
+
+    Examples:
+        bridges = ClusterWideSetup(name="ovs-bridges")
+        request.addfinalizer(lambda: bridges.teardown(func=remove_bridges))
+        state = bridges.setup(func=create_bridges)
+    """
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Setup name, unique per test run.
+        """
+        self.name = name
+        self.uid = testrun_uid()
+        self.base_dir = os.path.join(tempfile.gettempdir(), f"cnv-tests-{self.uid}")
+        self.lock_file = os.path.join(self.base_dir, f"{self.name}.lock")
+        self.state_file = os.path.join(self.base_dir, f"{self.name}.json")
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """
+        Hold the setup file lock (blocks while another worker holds it)
+        """
+        os.makedirs(self.base_dir, exist_ok=True)
+        with open(self.lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_state(self):
+        """
+        Returns:
+            dict: Published setup state, None if setup was not done yet.
+        """
+        if not os.path.exists(self.state_file):
+            return None
+
+        with open(self.state_file) as fd:
+            return json.load(fd)
+
+    def _write_state(self, state):
+        """
+        Args:
+            state (dict): Setup state to publish.
+        """
+        with open(self.state_file, "w") as fd:
+            json.dump(state, fd)
+
+    def setup(self, func):
+        """
+        Run func if no other worker did it yet, otherwise wait for the leader and return its result
+
+        Args:
+            func (function): Setup function, its return value must be JSON serializable.
+
+        Returns:
+            any: func return value (from this worker or from the leader).
+        """
+        if not self.uid:
+            return func()
+
+        with self._lock():
+            state = self._read_state()
+            if state is None:
+                LOGGER.info(f"{self.name}: worker {worker_id()} is the leader, running cluster wide setup")
+                state = {"result": func(), "users": 0}
+            else:
+                LOGGER.info(f"{self.name}: cluster wide setup already done by the leader")
+
+            state["users"] += 1
+            self._write_state(state=state)
+            return state["result"]
+
+    def teardown(self, func):
+        """
+        Release the setup, run func if this is the last worker using it
+
+        Args:
+            func (function): Teardown function.
+        """
+        if not self.uid:
+            func()
+            return
+
+        with self._lock():
+            state = self._read_state()
+            if state is None:
+                return
+
+            state["users"] -= 1
+            if state["users"] > 0:
+                self._write_state(state=state)
+                return
+
+            LOGGER.info(f"{self.name}: worker {worker_id()} is the last user, running cluster wide teardown")
+            os.remove(self.state_file)
+            func()
@@ -0,0 +1,298 @@
+"""
+SSH guest transport: one connection per VM, every command on its own channel, so commands run concurrently,
+stdout and stderr are kept apart and files are transferred over SFTP.
+"""
+
+import codecs
+import logging
+import os
+import select
+import threading
+import time
+
+from utilities import stream_expect
+from utilities.commands import CommandResult
+from utilities.guest import TIMEOUT
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+LOGGER = logging.getLogger(__name__)
+AVAILABLE = paramiko is not None
+PORT = 22
+CONNECT_TIMEOUT = 30
+KEY_BITS = 2048
+#  (host, port, username): [transport, users]
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+class SSHNotAvailable(Exception):
+    pass
+
+
+def _require_paramiko():
+    if not AVAILABLE:
+        raise SSHNotAvailable("paramiko is not installed")
+
+
+def generate_key_pair(private_key_file, comment="cnv-tests"):
+    """
+    Generate an RSA key pair, reuse it if private_key_file exists
+
+    Args:
+        private_key_file (str): Private key file, the public key is written next to it with a .pub suffix.
+        comment (str): Public key comment.
+
+    Returns:
+        str: Public key (authorized_keys format).
+    """
+    _require_paramiko()
+    if os.path.exists(private_key_file):
+        key = paramiko.RSAKey.from_private_key_file(filename=private_key_file)
+    else:
+        LOGGER.info(f"Generating SSH key {private_key_file}")
+        os.makedirs(os.path.dirname(os.path.abspath(private_key_file)), exist_ok=True)
+        key = paramiko.RSAKey.generate(bits=KEY_BITS)
+        key.write_private_key_file(filename=private_key_file)
+        os.chmod(private_key_file, 0o600)
+
+    public_key = f"{key.get_name()} {key.get_base64()} {comment}"
+    with open(f"{private_key_file}.pub", "w") as fd:
+        fd.write(f"{public_key}\n")
+    return public_key
+
+
+def _connect(host, port, username, key_filename, proxy_command, timeout):
+    """
+    Returns:
+        Transport: Authenticated transport.
+    """
+    sock = paramiko.ProxyCommand(command_line=proxy_command) if proxy_command else (host, port)
+    transport = paramiko.Transport(sock=sock)
+    transport.start_client(timeout=timeout)
+    transport.auth_publickey(username=username, key=paramiko.RSAKey.from_private_key_file(filename=key_filename))
+    #  Keep idle connections through NAT and port forwarding
+    transport.set_keepalive(interval=15)
+    return transport
+
+
+class SSHSession(object):
+    """
+    Guest session over SSH.
+
+    Sessions to the same host and user share one connection, opened by the first one and closed by the last one.
+    The interface matches guest.ConsoleSession.
+
+    Examples:
+        with SSHSession(host="10.128.0.12", key_filename="ssh-keys/id_rsa") as session:
+            session.put(local="iperf3.json", remote="/tmp/iperf3.json")
+            results = session.run_concurrent(commands=["ping -c 3 192.168.0.2", "ping -c 3 192.168.1.2"])
+    """
+    def __init__(
+        self, host, key_filename, username="fedora", port=PORT, proxy_command=None, connect_timeout=CONNECT_TIMEOUT
+    ):
+        """
+        Args:
+            host (str): Guest address.
+            key_filename (str): Private key file.
+            username (str): Username for login.
+            port (int): SSH port.
+            proxy_command (str): Command whose stdin/stdout reach the guest SSH port, instead of connecting to
+                host:port (e.g. "virtctl port-forward --stdio=true vmi/vm-fedora-1.cnv-network-ns 22").
+            connect_timeout (int): Time to wait for the connection and the SSH banner.
+        """
+        _require_paramiko()
+        self.host = host
+        self.key_filename = key_filename
+        self.username = username
+        self.port = port
+        self.proxy_command = proxy_command
+        self.connect_timeout = connect_timeout
+        self.transport = None
+        self._sftp = None
+        self._sftp_lock = threading.Lock()
+
+    @property
+    def _key(self):
+        return self.host, self.port, self.username
+
+    def __enter__(self):
+        with _CONNECTIONS_LOCK:
+            connection = _CONNECTIONS.get(self._key)
+            if connection and connection[0].is_active():
+                connection[1] += 1
+                self.transport = connection[0]
+                return self
+
+            self.transport = _connect(
+                host=self.host, port=self.port, username=self.username, key_filename=self.key_filename,
+                proxy_command=self.proxy_command, timeout=self.connect_timeout
+            )
+            _CONNECTIONS[self._key] = [self.transport, 1]
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._sftp:
+            self._sftp.close()
+            self._sftp = None
+
+        with _CONNECTIONS_LOCK:
+            connection = _CONNECTIONS.get(self._key)
+            if connection and connection[0] is self.transport:
+                connection[1] -= 1
+                if connection[1] > 0:
+                    return
+                del _CONNECTIONS[self._key]
+        self.transport.close()
+
+    def _exec(self, command, timeout, stdout_sink, stderr_sink):
+        """
+        Run command on a new channel, pass its output to the sinks as it arrives
+
+        Returns:
+            tuple: Exit code, seconds.
+
+        Raises:
+            TimeoutError: If the command did not exit in time.
+        """
+        start = time.monotonic()
+        expires = start + timeout
+        channel = self.transport.open_session(timeout=timeout)
+        #  A chunk may end in the middle of a multi byte character
+        stdout = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        stderr = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            channel.exec_command(command=command)
+            while True:
+                while channel.recv_ready():
+                    stdout_sink(stdout.decode(channel.recv(stream_expect.CHUNK_SIZE)))
+                while channel.recv_stderr_ready():
+                    stderr_sink(stderr.decode(channel.recv_stderr(stream_expect.CHUNK_SIZE)))
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    return channel.recv_exit_status(), time.monotonic() - start
+
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"{self.host}: {command!r} did not exit in {timeout} seconds")
+                select.select([channel], [], [], remaining)
+        finally:
+            channel.close()
+
+    def run(self, command, timeout=TIMEOUT):
+        """
+        Run a command
+
+        Args:
+            command (str): Command.
+            timeout (int): Time to wait for the command.
+
+        Returns:
+            CommandResult: Result, with stdout and stderr apart.
+        """
+        stdout, stderr = [], []
+        rc, duration = self._exec(
+            command=command, timeout=timeout, stdout_sink=stdout.append, stderr_sink=stderr.append
+        )
+        return CommandResult(command=command, rc=rc, stdout="".join(stdout), stderr="".join(stderr), duration=duration)
+
+    def run_batch(self, commands, timeout=TIMEOUT):
+        """
+        Run commands one after the other
+
+        Args:
+            commands (list): Commands.
+            timeout (int): Time to wait for all of them.
+
+        Returns:
+            list: CommandResult per command.
+        """
+        expires = time.monotonic() + timeout
+        return [self.run(command=command, timeout=max(expires - time.monotonic(), 0)) for command in commands]
+
+    def run_concurrent(self, commands, timeout=TIMEOUT):
+        """
+        Run commands at the same time, each on its own channel
+
+        Args:
+            commands (list): Commands.
+            timeout (int): Time to wait for all of them.
+
+        Returns:
+            list: CommandResult per command.
+        """
+        results = [None] * len(commands)
+        errors = []
+
+        def _run(idx):
+            try:
+                results[idx] = self.run(command=commands[idx], timeout=timeout)
+            except Exception as exp:
+                errors.append(exp)
+
+        threads = [threading.Thread(target=_run, args=(idx,), daemon=True) for idx in range(len(commands))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return results
+
+    def run_json(self, command, timeout=TIMEOUT):
+        """
+        Run a command with JSON output, parsed as it streams
+
+        Args:
+            command (str): Command.
+            timeout (int): Time to wait for the command.
+
+        Returns:
+            dict: The first JSON object the command printed.
+
+        Raises:
+            ValueError: If the command printed no JSON object.
+        """
+        extractor = stream_expect.JsonStreamExtractor()
+        stderr = []
+        self._exec(command=command, timeout=timeout, stdout_sink=extractor.feed, stderr_sink=stderr.append)
+        if not extractor.objects:
+            raise ValueError(f"{self.host}: no JSON output from {command}: {''.join(stderr)}")
+        return extractor.objects[0]
+
+    @property
+    def sftp(self):
+        """
+        Returns:
+            SFTPClient: SFTP client on the session connection, opened on first use.
+        """
+        with self._sftp_lock:
+            if self._sftp is None:
+                self._sftp = paramiko.SFTPClient.from_transport(t=self.transport)
+            return self._sftp
+
+    def put(self, local, remote, mode=None):
+        """
+        Copy a local file to the guest
+
+        Args:
+            local (str): Local file.
+            remote (str): Guest path.
+            mode (int): Guest file mode (e.g. 0o755 for a binary).
+        """
+        self.sftp.put(localpath=local, remotepath=remote)
+        if mode is not None:
+            self.sftp.chmod(path=remote, mode=mode)
+
+    def get(self, remote, local):
+        """
+        Copy a guest file to the local host
+
+        Args:
+            remote (str): Guest path.
+            local (str): Local file.
+        """
+        self.sftp.get(remotepath=remote, localpath=local)
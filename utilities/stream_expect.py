@@ -0,0 +1,276 @@
+"""
+Incremental expect engine for console streams: bounded buffer and search window, streaming JSON extraction and
+nonce framed exit codes.
+"""
+
+import json
+import logging
+import re
+import time
+import uuid
+
+import pexpect
+
+LOGGER = logging.getLogger(__name__)
+CHUNK_SIZE = 8192
+SEARCH_WINDOW = 256
+MAX_BUFFER = 1024 * 1024
+JSON_TOKENS = re.compile(r'[{}"\\]')
+
+
+def nonce():
+    """
+    Returns:
+        str: Random marker for command output framing.
+    """
+    return f"CNV{uuid.uuid4().hex[:12]}"
+
+
+def split_marker(marker):
+    """
+    Type a marker split by empty quotes, the shell prints it whole but the terminal echo of the command line
+    does not match it.
+
+    Args:
+        marker (str): Marker.
+
+    Returns:
+        str: Marker to use in a command line.
+    """
+    return f"{marker[:3]}''{marker[3:]}"
+
+
+class RingBuffer(object):
+    """
+    Text buffer bounded to maxlen characters, the oldest text is dropped first.
+    """
+    def __init__(self, maxlen=MAX_BUFFER):
+        """
+        Args:
+            maxlen (int): Maximum buffered characters.
+        """
+        self.maxlen = maxlen
+        self.text = ""
+        self.dropped = 0
+        ''' Characters dropped because the buffer was full. '''
+
+    def append(self, text):
+        """
+        Args:
+            text (str): Text to add.
+        """
+        self.text += text
+        overflow = len(self.text) - self.maxlen
+        if overflow > 0:
+            self.text = self.text[overflow:]
+            self.dropped += overflow
+
+    def consume(self, end):
+        """
+        Drop the text before end
+
+        Args:
+            end (int): Position.
+
+        Returns:
+            str: Dropped text.
+        """
+        consumed, self.text = self.text[:end], self.text[end:]
+        return consumed
+
+    def __len__(self):
+        return len(self.text)
+
+
+class JsonStreamExtractor(object):
+    """
+    Extract top level JSON objects from a text stream in one pass.
+
+    Only the text of the object being read is kept, text between objects is skipped.
+    """
+    def __init__(self):
+        self.objects = []
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = None
+
+    def feed(self, text):
+        """
+        Args:
+            text (str): Next stream chunk.
+
+        Returns:
+            list: Objects completed in this chunk.
+        """
+        completed = []
+        start = 0 if self._depth else None
+        for token in JSON_TOKENS.finditer(text):
+            char, pos = token.group(), token.start()
+            if self._in_string:
+                if pos == self._escaped_at:
+                    self._escaped_at = None
+                elif char == "\\":
+                    self._escaped_at = pos + 1
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"' and self._depth:
+                self._in_string = True
+            elif char == "{":
+                if not self._depth:
+                    start = pos
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if not self._depth:
+                    self._parts.append(text[start:pos + 1])
+                    completed.append(json.loads("".join(self._parts)))
+                    self._parts = []
+                    start = None
+
+        #  A backslash ending the chunk escapes the first character of the next one
+        self._escaped_at = 0 if self._escaped_at == len(text) else None
+        if self._depth and start is not None:
+            self._parts.append(text[start:])
+        self.objects.extend(completed)
+        return completed
+
+
+class StreamMatcher(object):
+    """
+    Incremental expect over a pexpect child.
+
+    Read text is searched once: every search starts a bounded window before the end of the text already searched,
+    so long outputs are not rescanned on every read, and the buffer is bounded.
+
+    Examples:
+        matcher = StreamMatcher(child=vm_console)
+        rc = matcher.exit_code(command="ping -c 3 10.0.0.1", timeout=30)
+    """
+    def __init__(self, child, window=SEARCH_WINDOW, max_buffer=MAX_BUFFER, chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            child (spawn): pexpect child (logged in console).
+            window (int): Characters searched again before new text, must cover the longest expected match.
+            max_buffer (int): Maximum buffered characters.
+            chunk_size (int): Maximum characters per read.
+        """
+        self.child = child
+        self.window = window
+        self.chunk_size = chunk_size
+        self.buffer = RingBuffer(maxlen=max_buffer)
+        self._searched = 0
+
+    def _read(self, expires):
+        """
+        Read the next chunk into the buffer
+
+        Args:
+            expires (float): Monotonic time to give up.
+
+        Raises:
+            pexpect.TIMEOUT: If nothing was read before expires.
+            pexpect.EOF: If the child closed.
+        """
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise pexpect.TIMEOUT(f"Timeout, last output: {self.buffer.text[-self.window:]!r}")
+
+        chunk = self.child.read_nonblocking(size=self.chunk_size, timeout=remaining)
+        before = len(self.buffer)
+        self.buffer.append(chunk)
+        #  Keep the searched position in step with text dropped from the head
+        self._searched = max(0, self._searched - (before + len(chunk) - len(self.buffer)))
+
+    def _search(self, patterns):
+        """
+        Returns:
+            tuple: Index of the earliest matching pattern and its match, (None, None) if none matches.
+        """
+        start = max(0, self._searched - self.window)
+        best = (None, None)
+        for idx, pattern in enumerate(patterns):
+            match = pattern.search(self.buffer.text, start)
+            if match and (best[1] is None or match.start() < best[1].start()):
+                best = (idx, match)
+
+        self._searched = len(self.buffer)
+        return best
+
+    def expect(self, patterns, timeout=30):
+        """
+        Wait for the first of patterns
+
+        Args:
+            patterns (list): Compiled regular expressions.
+            timeout (float): Time to wait.
+
+        Returns:
+            tuple: Index of the matching pattern, match, text before the match.
+
+        Raises:
+            pexpect.TIMEOUT: If no pattern matched in time.
+        """
+        expires = time.monotonic() + timeout
+        while True:
+            idx, match = self._search(patterns=patterns)
+            if match:
+                before = self.buffer.consume(end=match.end())[:match.start()]
+                self._searched = 0
+                return idx, match, before
+            self._read(expires=expires)
+
+    def stream_until(self, pattern, sink, timeout=30):
+        """
+        Pass the text before pattern to sink as it arrives, without keeping it
+
+        Args:
+            pattern (Pattern): Compiled end marker.
+            sink (function): func(text) called with consecutive chunks of the text before the match.
+            timeout (float): Time to wait for pattern.
+
+        Returns:
+            Match: The end marker match.
+        """
+        expires = time.monotonic() + timeout
+        while True:
+            _, match = self._search(patterns=[pattern])
+            if match:
+                sink(self.buffer.consume(end=match.end())[:match.start()])
+                self._searched = 0
+                return match
+
+            #  Hand over all but a window which may hold the beginning of the marker
+            safe = len(self.buffer) - self.window
+            if safe > 0:
+                sink(self.buffer.consume(end=safe))
+                self._searched = len(self.buffer)
+            self._read(expires=expires)
+
+    def sendline(self, line):
+        """
+        Args:
+            line (str): Line to send.
+        """
+        self.child.sendline(line)
+
+    def exit_code(self, command, timeout=30):
+        """
+        Run command and get its exit code
+
+        The exit code is printed with a nonce marker, so prompts, IPs or other output can not be mistaken for it.
+
+        Args:
+            command (str): Command to run.
+            timeout (float): Time to wait for the command.
+
+        Returns:
+            int: Command exit code.
+        """
+        marker = nonce()
+        self.sendline(f"{command}; echo {split_marker(marker)}_RC:$?")
+        #  The line end marks the last digit, the exit code may arrive split across reads
+        _, match, _ = self.expect(patterns=[re.compile(rf"{marker}_RC:(\d+)\r?\n")], timeout=timeout)
+        return int(match.group(1))
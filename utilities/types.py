@@ -12,6 +12,7 @@ VM = 'VirtualMachine'
 POD = "Pod"
 NODE = 'Node'
 NAMESPACE = 'Namespace'
+EVENT = 'Event'
 
 # VMI / Pod status
 RUNNING = 'Running'
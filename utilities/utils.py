@@ -1,16 +1,48 @@
+import collections
+import datetime
+import functools
+import importlib
 import json
 import logging
-import os
-import shlex
-import subprocess
+import random
+import threading
 import time
 
-from _pytest.mark import ParameterSet
-from autologs.autologs import generate_logs
+from utilities import commands
+from utilities.logs import generate_logs
 
 LOGGER = logging.getLogger(__name__)
 
 
+class LazyModule(object):
+    """
+    Module imported on its first attribute access, keeps heavy imports out of startup.
+
+    Examples:
+        exceptions = LazyModule(name="openshift.dynamic.exceptions")
+
+        try:
+            ...
+        except exceptions.NotFoundError:
+            ...
+    """
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Module name.
+        """
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+pytest_mark = LazyModule(name="_pytest.mark")
+
+
 class TimeoutExpiredError(Exception):
     message = 'Timed Out'
 
@@ -21,24 +53,243 @@ class TimeoutExpiredError(Exception):
         return "%s: %s" % (self.message, repr(self.value))
 
 
+class FixedInterval(object):
+    """
+    Sampling strategy: sleep the same interval between samples.
+    """
+    def __init__(self, sleep):
+        """
+        Args:
+            sleep (float): Sleep interval seconds.
+        """
+        self.sleep = sleep
+
+    def intervals(self):
+        """
+        Yields:
+            float: Seconds to sleep before the next sample.
+        """
+        while True:
+            yield self.sleep
+
+
+class ExponentialBackoff(object):
+    """
+    Sampling strategy: multiply the interval by `factor` after every sample, up to `cap`.
+    """
+    def __init__(self, initial=1, factor=2, cap=30):
+        """
+        Args:
+            initial (float): First sleep interval seconds.
+            factor (float): Interval multiplier.
+            cap (float): Maximum sleep interval seconds.
+        """
+        self.initial = initial
+        self.factor = factor
+        self.cap = cap
+
+    def intervals(self):
+        """
+        Yields:
+            float: Seconds to sleep before the next sample.
+        """
+        sleep = self.initial
+        while True:
+            yield min(sleep, self.cap)
+            sleep *= self.factor
+
+
+class Jittered(object):
+    """
+    Sampling strategy: randomize another strategy intervals so parallel waiters do not poll in lockstep.
+    """
+    def __init__(self, strategy, ratio=0.5):
+        """
+        Args:
+            strategy (object): Sampling strategy to randomize (FixedInterval, ExponentialBackoff...).
+            ratio (float): Part of every interval which is randomized (0 - 1).
+        """
+        self.strategy = strategy
+        self.ratio = ratio
+
+    def intervals(self):
+        """
+        Yields:
+            float: Seconds to sleep before the next sample.
+        """
+        for sleep in self.strategy.intervals():
+            yield sleep * (1 - self.ratio) + random.uniform(0, sleep * self.ratio)
+
+
+class FastThenSlow(object):
+    """
+    Sampling strategy: sample every `fast` seconds during the first `fast_period` seconds, every `slow` after.
+
+    Fits operations which usually finish fast but may take minutes.
+    """
+    def __init__(self, fast=1, fast_period=30, slow=10):
+        """
+        Args:
+            fast (float): Sleep interval seconds during the fast period.
+            fast_period (float): Fast period seconds.
+            slow (float): Sleep interval seconds after the fast period.
+        """
+        self.fast = fast
+        self.fast_period = fast_period
+        self.slow = slow
+
+    def intervals(self):
+        """
+        Yields:
+            float: Seconds to sleep before the next sample.
+        """
+        slept = 0
+        while True:
+            sleep = self.fast if slept < self.fast_period else self.slow
+            slept += sleep
+            yield sleep
+
+
+class Deadline(object):
+    """
+    Time budget shared by nested waits.
+
+    Every TimeoutSampler started inside the `with` block times out no later than the deadline, nested deadlines
+    never extend their parent deadline. The deadline only applies to the thread which entered it, functions run
+    in other threads (thread pools) get it with bind().
+
+    Examples:
+        with Deadline(timeout=600):
+            vmi.wait_for_status(status=types.RUNNING)  # uses part of the 600 seconds
+            wait_for_vm_interfaces(vmi=vmi)  # gets what is left
+
+        with Deadline(timeout=600), ThreadPoolExecutor() as executor:
+            executor.map(Deadline.bind(wait_for_vm), vms)  # every worker waits within the 600 seconds
+    """
+    _local = threading.local()
+
+    def __init__(self, timeout):
+        """
+        Args:
+            timeout (float): Budget seconds.
+        """
+        self.timeout = timeout
+        self.expires = None
+
+    def __enter__(self):
+        parent = Deadline.current()
+        self.expires = time.time() + self.timeout
+        if parent:
+            self.expires = min(self.expires, parent.expires)
+
+        Deadline._stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        Deadline._stack().remove(self)
+
+    def remaining(self):
+        """
+        Returns:
+            float: Seconds left in the budget (0 if expired).
+        """
+        return max(self.expires - time.time(), 0)
+
+    @classmethod
+    def _stack(cls):
+        """
+        Returns:
+            list: Active deadlines of the current thread, innermost last.
+        """
+        if not hasattr(cls._local, "stack"):
+            cls._local.stack = []
+        return cls._local.stack
+
+    @classmethod
+    def bind(cls, func):
+        """
+        Bind a function to the current deadline, to run it in another thread
+
+        Args:
+            func (function): Function to run in other threads.
+
+        Returns:
+            function: func, run under the current deadline in any thread, func itself if there is no deadline.
+        """
+        deadline = cls.current()
+        if deadline is None:
+            return func
+
+        @functools.wraps(func)
+        def _bound(*args, **kwargs):
+            stack = cls._stack()
+            stack.append(deadline)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack.remove(deadline)
+
+        return _bound
+
+    @classmethod
+    def current(cls):
+        """
+        Returns:
+            Deadline: Innermost active deadline of the current thread, None if there is none.
+        """
+        stack = cls._stack()
+        return stack[-1] if stack else None
+
+
+class SamplerStats(object):
+    """
+    TimeoutSampler statistics.
+    """
+    def __init__(self):
+        self.iterations = 0
+        ''' Number of func calls. '''
+        self.elapsed = 0
+        ''' Seconds since sampling started, updated after every sample. '''
+        self.time_to_success = None
+        ''' Seconds until the expected result was sampled, None if it was not. '''
+        self.exceptions = collections.Counter()
+        ''' Number of exceptions raised by func, by exception class name. '''
+        self.last_exception = None
+        ''' Last exception raised by func. '''
+
+    def __repr__(self):
+        return (
+            f"iterations={self.iterations} elapsed={self.elapsed:.1f}s "
+            f"time_to_success={self.time_to_success} exceptions={dict(self.exceptions)}"
+        )
+
+
+#  Programming errors, sampling again can not succeed
+FATAL_EXCEPTIONS = (NameError, SyntaxError, ImportError)
+
+
 class TimeoutSampler(object):
     """
     Samples the function output.
 
     This is a generator object that at first yields the output of function
     `func`. After the yield, it either raises instance of `timeout_exc_cls` or
-    sleeps `sleep` seconds.
+    sleeps the next interval of the sampling strategy.
 
     Yielding the output allows you to handle every value as you wish.
 
+    Exceptions raised by `func` are counted in `stats` and sampling continues,
+    unless they are instances of `fatal_exceptions`, which are raised at once.
+    The timeout is bounded by the enclosing Deadline, if any.
+
     Feel free to set the instance variables.
     """
 
-    def __init__(self, timeout, sleep, func, *func_args, **func_kwargs):
+    def __init__(self, timeout, sleep, func, *func_args, fatal_exceptions=FATAL_EXCEPTIONS, **func_kwargs):
         self.timeout = timeout
         ''' Timeout in seconds. '''
         self.sleep = sleep
-        ''' Sleep interval seconds. '''
+        ''' Sleep interval seconds or sampling strategy (FixedInterval, ExponentialBackoff, Jittered...). '''
 
         self.func = func
         ''' A function to sample. '''
@@ -46,30 +297,53 @@ class TimeoutSampler(object):
         ''' Args for func. '''
         self.func_kwargs = func_kwargs
         ''' Kwargs for func. '''
+        self.fatal_exceptions = fatal_exceptions
+        ''' Exceptions from func which stop the sampling. '''
 
         self.start_time = None
         ''' Time of starting the sampling. '''
         self.last_sample_time = None
         ''' Time of last sample. '''
+        self.stats = SamplerStats()
+        ''' Sampling statistics. '''
 
         self.timeout_exc_cls = TimeoutExpiredError
         ''' Class of exception to be raised.  '''
         self.timeout_exc_args = (self.timeout,)
         ''' An args for __init__ of the timeout exception. '''
 
+    def _strategy(self):
+        """
+        Returns:
+            object: Sampling strategy, a sleep number is a FixedInterval.
+        """
+        return self.sleep if hasattr(self.sleep, "intervals") else FixedInterval(sleep=self.sleep)
+
     def __iter__(self):
         if self.start_time is None:
             self.start_time = time.time()
+
+        timeout = self.timeout
+        deadline = Deadline.current()
+        if deadline:
+            timeout = min(timeout, deadline.expires - self.start_time)
+
+        intervals = self._strategy().intervals()
         while True:
             self.last_sample_time = time.time()
+            self.stats.iterations += 1
             try:
                 yield self.func(*self.func_args, **self.func_kwargs)
-            except Exception:
-                pass
-
-            if self.timeout < (time.time() - self.start_time):
+            except self.fatal_exceptions:
+                raise
+            except Exception as exp:
+                self.stats.exceptions[type(exp).__name__] += 1
+                self.stats.last_exception = exp
+
+            self.stats.elapsed = time.time() - self.start_time
+            if timeout < self.stats.elapsed:
                 raise self.timeout_exc_cls(*self.timeout_exc_args)
-            time.sleep(self.sleep)
+            time.sleep(min(next(intervals), timeout - self.stats.elapsed))
 
     def wait_for_func_status(self, result):
         """
@@ -88,31 +362,35 @@ class TimeoutSampler(object):
         try:
             for res in self:
                 if result == res:
+                    self.stats.time_to_success = time.time() - self.start_time
                     return True
 
         except self.timeout_exc_cls:
-            LOGGER.error("(%s) return incorrect status after timeout", self.func.__name__)
+            LOGGER.error("(%s) return incorrect status after timeout (%s)", self.func.__name__, self.stats)
+            if self.stats.last_exception:
+                LOGGER.error("(%s) last exception: %s", self.func.__name__, self.stats.last_exception)
             return False
 
 
 @generate_logs()
-def run_command(command):
+def run_command(command, timeout=commands.TIMEOUT):
     """
     Run command on local machine.
 
     Args:
-        command (str): Command to run.
+        command (str|list): Command to run, a command line or arguments.
+        timeout (int): Time to wait for the command, it is killed after.
 
     Returns:
-        tuple: True, out if command succeeded, False, err otherwise.
+        tuple: True, out if command exited with 0, False, err (out if no err) otherwise.
     """
-    p = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = p.communicate()
-    if err:
-        LOGGER.error("Failed to run {cmd}. error: {err}".format(cmd=command, err=err))
+    result = commands.run(command=command, timeout=timeout)
+    if not result.ok:
+        err = result.stderr or result.stdout
+        LOGGER.error(f"Failed to run {result.command}. rc: {result.rc} error: {err}")
         return False, err
 
-    return True, out.decode("utf-8")
+    return True, result.stdout
 
 
 @generate_logs()
@@ -128,66 +406,38 @@ def run_command_on_pod(command, pod, container=None):
     Returns:
         tuple: True, out if command succeeded, False, err otherwise.
     """
-    container_name = "-c {container}".format(container=container or "") if container else ""
-    command = "oc exec -i {pod} {container_name} -- {command}".format(
-        pod=pod, container_name=container_name, command=command
-    )
-    return run_command(command=command)
+    container_name = f" -c {container}" if container else ""
+    return run_oc_command(command=f"exec -i {pod}{container_name} -- {command}")
 
 
-def run_virtctl_command(command, namespace=None):
+def run_virtctl_command(command, namespace=None, kubeconfig=None):
     """
     Run virtctl command
 
     Args:
         command (str): Command to run
         namespace (str): Namespace to send to virtctl command
+        kubeconfig (str): Cluster kubeconfig, $KUBECONFIG if not set
 
     Returns:
         tuple: True, out if command succeeded, False, err otherwise.
     """
-    kubeconfig = os.getenv('KUBECONFIG')
-    cmd = f"virtctl {command}"
-    if namespace:
-        cmd += f" -n {namespace}"
+    return run_command(command=commands.virtctl_args(command=command, namespace=namespace, kubeconfig=kubeconfig))
 
-    if kubeconfig:
-        cmd += f" --kubeconfig {kubeconfig}"
 
-    return run_command(command=cmd)
-
-
-def run_oc_command(command, namespace=None):
+def run_oc_command(command, namespace=None, kubeconfig=None):
     """
     Run oc command
 
     Args:
         command (str): Command to run
         namespace (str): Namespace to send to oc command
+        kubeconfig (str): Cluster kubeconfig, $KUBECONFIG if not set
 
     Returns:
         tuple: True, out if command succeeded, False, err otherwise.
     """
-    last_ = None
-    kubeconfig = os.getenv('KUBECONFIG')
-    if " -- " in command:
-        split_cmd = command.split(" -- ")
-        first_ = split_cmd[0]
-        last_ = split_cmd[-1]
-    else:
-        first_ = command
-
-    cmd = f"oc {first_}"
-    if namespace:
-        cmd += f" -n {namespace}"
-
-    if kubeconfig:
-        cmd += f" --kubeconfig {kubeconfig}"
-
-    if last_:
-        cmd += f" -- {last_}"
-
-    return run_command(command=cmd)
+    return run_command(command=commands.oc_args(command=command, namespace=namespace, kubeconfig=kubeconfig))
 
 
 @generate_logs()
@@ -245,10 +495,27 @@ def get_test_parametrize_ids(item, params):
     for i in param_args_values:
         if isinstance(i, list) or isinstance(i, tuple):
             for x in i:
-                if not isinstance(x, ParameterSet):
+                if not isinstance(x, pytest_mark.ParameterSet):
                     continue
 
                 x_values = x.values
                 if tuple(params) == x_values:
                     return param_ids[param_args_values.index(x)]
     return _id
+
+
+def parse_timestamp(value):
+    """
+    Parse a Kubernetes timestamp (creationTimestamp, lastTransitionTime)
+
+    Args:
+        value (str): RFC 3339 UTC timestamp, e.g. 2019-05-01T10:00:00Z.
+
+    Returns:
+        float: Epoch seconds, None if value is empty.
+    """
+    if not value:
+        return None
+
+    parsed = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+    return parsed.replace(tzinfo=datetime.timezone.utc).timestamp()
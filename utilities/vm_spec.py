@@ -0,0 +1,166 @@
+"""
+VM spec builder: process a VM template once, build many VM specs from it with typed hooks.
+"""
+
+import json
+import logging
+
+import yaml
+
+from utilities import utils
+
+LOGGER = logging.getLogger(__name__)
+NAME_SENTINEL = "cnv-tests-vm-name-sentinel"
+CLOUD_CONFIG_HEADER = "#cloud-config"
+
+
+def parse_cloud_config(user_data):
+    """
+    Args:
+        user_data (str): cloud-init userData.
+
+    Returns:
+        dict: cloud-config, empty if user_data is empty.
+    """
+    return yaml.safe_load(user_data or "") or {}
+
+
+def dump_cloud_config(cloud_config):
+    """
+    Args:
+        cloud_config (dict): cloud-config.
+
+    Returns:
+        str: cloud-init userData.
+    """
+    return f"{CLOUD_CONFIG_HEADER}\n{yaml.safe_dump(cloud_config, default_flow_style=False, sort_keys=False)}"
+
+
+class CloudInitRunCmd(object):
+    """
+    Append commands to the cloud-config runcmd, after the template commands.
+    """
+    def __init__(self, commands):
+        """
+        Args:
+            commands (list): Shell commands.
+        """
+        self.commands = list(commands)
+
+    def apply(self, spec, cloud_config):
+        """
+        Args:
+            spec (dict): VM template spec (spec.template.spec).
+            cloud_config (dict): Parsed cloud-config, dumped back to userData after all hooks.
+        """
+        cloud_config.setdefault("runcmd", []).extend(self.commands)
+
+
+class CloudInitSSHKey(object):
+    """
+    Authorize an SSH public key for the default user.
+    """
+    def __init__(self, public_key):
+        """
+        Args:
+            public_key (str): Public key (authorized_keys format).
+        """
+        self.public_key = public_key
+
+    def apply(self, spec, cloud_config):
+        """
+        Args:
+            spec (dict): VM template spec (spec.template.spec).
+            cloud_config (dict): Parsed cloud-config, dumped back to userData after all hooks.
+        """
+        cloud_config.setdefault("ssh_authorized_keys", []).append(self.public_key)
+
+
+class MultusNetwork(object):
+    """
+    Attach the VM to a secondary multus network.
+    """
+    def __init__(self, name, network_name=None, binding="bridge"):
+        """
+        Args:
+            name (str): Interface and network name in the VM spec.
+            network_name (str): NetworkAttachmentDefinition name, default is name.
+            binding (str): Interface binding method (bridge, masquerade, sriov...).
+        """
+        self.name = name
+        self.network_name = network_name or name
+        self.binding = binding
+
+    def apply(self, spec, cloud_config):
+        """
+        Args:
+            spec (dict): VM template spec (spec.template.spec).
+            cloud_config (dict): Parsed cloud-config, dumped back to userData after all hooks.
+        """
+        spec["domain"]["devices"]["interfaces"].append({"name": self.name, self.binding: {}})
+        spec["networks"].append({"name": self.name, "multus": {"networkName": self.network_name}})
+
+
+class VMSpecBuilder(object):
+    """
+    Build VM specs from a template processed once.
+
+    The template is processed with a name sentinel and kept serialized, a build replaces the sentinel and
+    parses the result, so building hundreds of specs costs one `oc process`. The cloud-init volume position and
+    its parsed cloud-config are resolved once.
+
+    Examples:
+        builder = VMSpecBuilder(template="tests/manifests/network/vm-template-fedora-multus.yaml",
+                                MULTUS_NETWORK="ovs-vlan-net")
+        vm_dict = builder.build(
+            name="vm-fedora-1",
+            hooks=[CloudInitRunCmd(commands=["ip link set mtu 1450 eth1"]), MultusNetwork(name="ovs-net-bond")]
+        )
+    """
+    def __init__(self, template=None, spec=None, **params):
+        """
+        Args:
+            template (str): Template file, processed with params and NAME set to the sentinel.
+            spec (dict): Already processed VM dict with NAME_SENTINEL as name (instead of template).
+            params (dict): Template parameters.
+        """
+        if spec is None:
+            spec = utils.get_json_from_template(file_=template, NAME=NAME_SENTINEL, **params)
+            assert spec, f"Failed to process template {template}"
+
+        self._compiled = json.dumps(spec)
+        volumes = spec["spec"]["template"]["spec"].get("volumes", [])
+        self._cloud_init_idx = next((idx for idx, i in enumerate(volumes) if "cloudInitNoCloud" in i), None)
+        self._cloud_config = None
+        if self._cloud_init_idx is not None:
+            user_data = volumes[self._cloud_init_idx]["cloudInitNoCloud"].get("userData")
+            self._cloud_config = json.dumps(parse_cloud_config(user_data=user_data))
+
+    def build(self, name, hooks=None):
+        """
+        Build one VM spec
+
+        Args:
+            name (str): VM name.
+            hooks (list): Hooks (CloudInitRunCmd, MultusNetwork...) applied in order.
+
+        Returns:
+            dict: VM dict.
+        """
+        vm = json.loads(self._compiled.replace(NAME_SENTINEL, name))
+        if not hooks:
+            return vm
+
+        spec = vm["spec"]["template"]["spec"]
+        cloud_init = None
+        cloud_config = {}
+        if self._cloud_init_idx is not None:
+            cloud_init = spec["volumes"][self._cloud_init_idx]["cloudInitNoCloud"]
+            cloud_config = json.loads(self._cloud_config.replace(NAME_SENTINEL, name))
+
+        for hook in hooks:
+            hook.apply(spec=spec, cloud_config=cloud_config)
+
+        if cloud_init is not None:
+            cloud_init["userData"] = dump_cloud_config(cloud_config=cloud_config)
+        return vm